@@ -2,118 +2,135 @@
 import logging
 import base64
 import json
+import mimetypes
+import mmap
+import os
 import re
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 import google.generativeai as genai
+from agents.gemini_client import create_model, generate
+from agents.prompts import (
+    PROMPT_VERSION,
+    EXTRACTION_SYSTEM_INSTRUCTION,
+    HANDWRITING_EXTRACTION_PROMPT,
+    DIGITAL_EXTRACTION_PROMPT,
+    TYPED_IMAGE_EXTRACTION_PROMPT,
+    TEXT_LAYER_EXTRACTION_PROMPT,
+)
+from utils.memory_budget import capture_memory_budget
+from utils.normalization import normalize_record
+from utils.regex_extractor import regex_extractor
+from utils.document_classifier import classify_document, TEXT_PDF, TYPED_IMAGE, HANDWRITTEN
 
 logger = logging.getLogger(__name__)
 
+# Files above this size go through the Files API instead of inline base64
+INLINE_LIMIT_BYTES = int(float(os.getenv("CAPTURE_INLINE_LIMIT_MB", "15")) * 1024 * 1024)
+
+# Inline requests hold the base64 string plus the serialized request body
+INLINE_MEMORY_FACTOR = 3.0
+# Classification holds a scan's largest page image plus its decoded thumbnail
+CLASSIFY_MEMORY_FACTOR = 2.0
+UPLOAD_MEMORY_BYTES = 8 * 1024 * 1024
+
+# A top-level "key": value pair whose value is complete (followed by , } or newline)
+PARTIAL_FIELD_PATTERN = re.compile(
+    r'"(?P<key>[A-Za-z_]+)"\s*:\s*(?P<value>"(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?|null|true|false)\s*(?=[,}\n])'
+)
+
+def parse_partial_fields(text: str) -> Dict[str, Any]:
+    """Scalar fields already complete in a partially received JSON object"""
+    # Line items arrive as a nested array; stop before it so item keys are not mistaken for invoice fields
+    head = text.split('"line_items"', 1)[0]
+    fields = {}
+    for match in PARTIAL_FIELD_PATTERN.finditer(head):
+        fields[match.group("key")] = json.loads(match.group("value"))
+    # Same normalization as the final result, so placeholders never flash up
+    return {key: value for key, value in normalize_record(fields).items() if value is not None}
+
 class CaptureAgent:
     """Enhanced agent for capturing invoice data with high accuracy"""
     
     def __init__(self, model_name: str = "gemini-2.0-flash"):
-        self.model = genai.GenerativeModel(model_name)
+        # Extraction rules are sent once as the system instruction
+        self.model = create_model(model_name, EXTRACTION_SYSTEM_INSTRUCTION)
         self.model_name = model_name
     
     def encode_image(self, image_path: str) -> str:
         """Encode image to base64"""
         with open(image_path, "rb") as image_file:
-            return base64.standard_b64encode(image_file.read()).decode("utf-8")
+            if os.fstat(image_file.fileno()).st_size == 0:
+                return ""
+            # Encode straight from a read-only mapping to avoid a second in-heap copy
+            with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.standard_b64encode(mapped).decode("utf-8")
+    
+    def _upload_document(self, file_path: str, mime_type: str):
+        """Upload a large document through the Files API and wait until it is usable"""
+        uploaded = genai.upload_file(path=file_path, mime_type=mime_type)
+        while getattr(uploaded.state, "name", "ACTIVE") == "PROCESSING":
+            time.sleep(1)
+            uploaded = genai.get_file(uploaded.name)
+        if getattr(uploaded.state, "name", "ACTIVE") == "FAILED":
+            raise RuntimeError(f"File upload failed for {file_path}")
+        return uploaded
+    
+    @contextmanager
+    def _document_part(self, file_path: str, mime_type: str):
+        """Yield the document as a request part within the memory budget.
+        
+        Small files are sent inline as base64; large files stay on disk and
+        are streamed to the Files API, then deleted after the call.
+        """
+        size = os.path.getsize(file_path)
+        if size <= INLINE_LIMIT_BYTES:
+            with capture_memory_budget.reserve(size * INLINE_MEMORY_FACTOR):
+                yield {
+                    "mime_type": mime_type,
+                    "data": self.encode_image(file_path)
+                }
+            return
+        
+        logger.info(f"📤 Large document ({size / 1e6:.0f} MB), using file upload")
+        with capture_memory_budget.reserve(UPLOAD_MEMORY_BYTES):
+            uploaded = self._upload_document(file_path, mime_type)
+            try:
+                yield uploaded
+            finally:
+                try:
+                    genai.delete_file(uploaded.name)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not delete uploaded file {uploaded.name}: {e}")
+    
+    def classify(self, file_path: str) -> Dict[str, Any]:
+        """Classify the document locally (text-layer PDF, scanned PDF, typed image or handwritten)"""
+        with capture_memory_budget.reserve(os.path.getsize(file_path) * CLASSIFY_MEMORY_FACTOR):
+            classification = classify_document(file_path)
+        logger.info(f"🔎 {Path(file_path).name}: {classification['document_type']}")
+        return classification
     
     def is_handwritten_document(self, file_path: str) -> bool:
         """Detect if document is handwritten"""
-        file_ext = Path(file_path).suffix.lower()
-        return file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+        return self.classify(file_path)["document_type"] == HANDWRITTEN
     
     def get_handwriting_extraction_prompt(self) -> str:
-        """Enhanced prompt for handwritten invoices"""
-        return """You are an expert invoice data extractor. Extract the following fields from the invoice image.
-Return ONLY valid JSON. Do not include markdown formatting like ```json ... ```.
-
-RULES:
-1. Extract values exactly as they appear.
-2. If a field is missing, use null.
-3. Convert dates to YYYY-MM-DD format if possible.
-4. Extract amounts as numbers (e.g. 1234.56).
-5. For currency, look for symbols ($, €, £) or codes (USD, EUR, GBP). Default to null if unsure.
-
-FIELDS TO EXTRACT:
-- invoice_number: The invoice identifier (e.g., INV-001)
-- vendor_name: The name of the vendor/company
-- invoice_date: The date of the invoice
-- due_date: The payment due date
-- total_amount: The total amount to be paid
-- tax_amount: The tax amount
-- currency: The currency code (USD, EUR, GBP, etc.)
-- payment_terms: Payment terms (e.g., Net 30)
-- extraction_confidence: high/medium/low
-
-JSON OUTPUT:
-{
-    "invoice_number": null,
-    "vendor_name": null,
-    "invoice_date": null,
-    "due_date": null,
-    "total_amount": null,
-    "tax_amount": null,
-    "currency": null,
-    "payment_terms": null,
-    "extraction_confidence": "high"
-}"""
+        """Per-call prompt for handwritten invoices (rules live in the system instruction)"""
+        return HANDWRITING_EXTRACTION_PROMPT
     
     def get_digital_extraction_prompt(self) -> str:
-        """Enhanced prompt for digital PDFs"""
-        return """You are an expert invoice data extractor. Extract the following fields from the invoice PDF.
-Return ONLY valid JSON. Do not include markdown formatting like ```json ... ```.
-
-RULES:
-1. Extract values exactly as they appear.
-2. If a field is missing, use null.
-3. Convert dates to YYYY-MM-DD format if possible.
-4. Extract amounts as numbers (e.g. 1234.56).
-5. For currency, look for symbols ($, €, £) or codes (USD, EUR, GBP). Default to null if unsure.
-
-FIELDS TO EXTRACT:
-- invoice_number: The invoice identifier (e.g., INV-001)
-- vendor_name: The name of the vendor/company
-- invoice_date: The date of the invoice
-- due_date: The payment due date
-- total_amount: The total amount to be paid
-- tax_amount: The tax amount
-- currency: The currency code (USD, EUR, GBP, etc.)
-- payment_terms: Payment terms (e.g., Net 30)
-- extraction_confidence: high/medium/low
-
-JSON OUTPUT:
-{
-    "invoice_number": null,
-    "vendor_name": null,
-    "invoice_date": null,
-    "due_date": null,
-    "total_amount": null,
-    "tax_amount": null,
-    "currency": null,
-    "payment_terms": null,
-    "extraction_confidence": "high"
-}"""
-    
-    def extract_from_handwritten_invoice(self, file_path: str) -> Dict[str, Any]:
-        """Extract from handwritten invoice"""
-        logger.info(f"🖊️ Handwritten: {file_path}")
-        
+        """Per-call prompt for digital PDFs (rules live in the system instruction)"""
+        return DIGITAL_EXTRACTION_PROMPT
+    
+    def _extract_document(
+        self, file_path: str, mime_type: str, prompt: str, document_type: str, on_text: Callable = None
+    ) -> Dict[str, Any]:
+        """Send the document itself to the model"""
         try:
-            image_data = self.encode_image(file_path)
-            prompt = self.get_handwriting_extraction_prompt()
-            
-            # CORRECT Gemini API format with proper MIME type
-            response = self.model.generate_content([
-                {
-                    "mime_type": "image/jpeg",
-                    "data": image_data
-                },
-                prompt
-            ])
+            with self._document_part(file_path, mime_type) as document:
+                response = generate(self.model, [document, prompt], agent="capture", on_text=on_text)
             
             extracted_json = self._parse_response(response.text)
             
@@ -121,59 +138,86 @@ JSON OUTPUT:
             
             return {
                 "status": "success",
-                "document_type": "handwritten",
+                "document_type": document_type,
                 "extracted_data": extracted_json,
-                "model": self.model_name
+                "model": self.model_name,
+                "prompt_version": PROMPT_VERSION
             }
             
         except Exception as e:
             logger.error(f"❌ Error: {str(e)}")
             return {
                 "status": "error",
-                "document_type": "handwritten",
+                "document_type": document_type,
                 "error": str(e),
                 "model": self.model_name
             }
     
-    def extract_from_digital_invoice(self, file_path: str) -> Dict[str, Any]:
+    def extract_from_handwritten_invoice(
+        self, file_path: str, mime_type: str = None, on_text: Callable = None
+    ) -> Dict[str, Any]:
+        """Extract from handwritten invoice"""
+        logger.info(f"🖊️ Handwritten: {file_path}")
+        mime_type = mime_type or mimetypes.guess_type(file_path)[0] or "image/jpeg"
+        return self._extract_document(
+            file_path, mime_type, self.get_handwriting_extraction_prompt(), "handwritten", on_text
+        )
+    
+    def extract_from_typed_image(
+        self, file_path: str, mime_type: str = None, on_text: Callable = None
+    ) -> Dict[str, Any]:
+        """Extract from an image of a printed invoice"""
+        logger.info(f"🖼️ Typed image: {file_path}")
+        mime_type = mime_type or mimetypes.guess_type(file_path)[0] or "image/jpeg"
+        return self._extract_document(file_path, mime_type, TYPED_IMAGE_EXTRACTION_PROMPT, "typed_image", on_text)
+    
+    def extract_from_digital_invoice(self, file_path: str, on_text: Callable = None) -> Dict[str, Any]:
         """Extract from digital PDF"""
         logger.info(f"📄 Digital: {file_path}")
+        return self._extract_document(
+            file_path, "application/pdf", self.get_digital_extraction_prompt(), "digital", on_text
+        )
+    
+    def extract_from_text_layer(self, file_path: str, text: str, on_text: Callable = None) -> Dict[str, Any]:
+        """Extract from a PDF's embedded text; the document itself is never sent"""
+        logger.info(f"📝 Text layer ({len(text)} chars): {file_path}")
         
         try:
-            with open(file_path, "rb") as pdf_file:
-                pdf_data = base64.standard_b64encode(pdf_file.read()).decode("utf-8")
-            
-            prompt = self.get_digital_extraction_prompt()
-            
-            # CORRECT Gemini API format with proper MIME type
-            response = self.model.generate_content([
-                {
-                    "mime_type": "application/pdf",
-                    "data": pdf_data
-                },
-                prompt
-            ])
-            
+            response = generate(self.model, [TEXT_LAYER_EXTRACTION_PROMPT, text], agent="capture", on_text=on_text)
             extracted_json = self._parse_response(response.text)
             
             logger.info(f"✅ Success")
             
             return {
                 "status": "success",
-                "document_type": "digital",
+                "document_type": "text_pdf",
                 "extracted_data": extracted_json,
-                "model": self.model_name
+                "model": self.model_name,
+                "prompt_version": PROMPT_VERSION
             }
             
         except Exception as e:
             logger.error(f"❌ Error: {str(e)}")
             return {
                 "status": "error",
-                "document_type": "digital",
+                "document_type": "text_pdf",
                 "error": str(e),
                 "model": self.model_name
             }
     
+    def _partial_field_reporter(self, progress_callback: Callable) -> Callable[[str], None]:
+        """Turn streamed response text into events carrying newly completed fields"""
+        reported = {}
+        
+        def on_text(text: str):
+            fields = parse_partial_fields(text)
+            new = {k: v for k, v in fields.items() if k not in reported or reported[k] != v}
+            if new:
+                reported.update(new)
+                progress_callback("partial_fields", {"fields": new})
+        
+        return on_text
+    
     def _parse_response(self, response_text: str) -> Dict:
         """Parse JSON with improved handling for markdown blocks"""
         # Strip markdown code blocks if present
@@ -188,14 +232,14 @@ JSON OUTPUT:
         
         try:
             data = json.loads(text)
-            return self._clean_data(data)
+            return normalize_record(data)
         except json.JSONDecodeError:
             # Try regex fallback if direct parse fails
             json_match = re.search(r'\{.*\}', text, re.DOTALL)
             if json_match:
                 try:
                     data = json.loads(json_match.group(0))
-                    return self._clean_data(data)
+                    return normalize_record(data)
                 except json.JSONDecodeError:
                     pass
         
@@ -205,48 +249,49 @@ JSON OUTPUT:
         logger.warning("Could not parse JSON")
         return self._fallback_extraction(response_text)
     
-    def _clean_data(self, data: Dict) -> Dict:
-        """Clean data but be less aggressive about removing values"""
-        # Only remove values that are clearly placeholders or empty
-        placeholders = ['not found', 'tbd', 'to be determined', 'unknown']
-        
-        cleaned = {}
-        for key, value in data.items():
-            if value is None:
-                cleaned[key] = None
-                continue
-                
-            if isinstance(value, str):
-                # Check for placeholders
-                if any(p == value.lower().strip() for p in placeholders):
-                    cleaned[key] = None
-                elif value.strip() == '':
-                    cleaned[key] = None
-                else:
-                    cleaned[key] = value
-            else:
-                cleaned[key] = value
-        
-        return cleaned
-    
     def _fallback_extraction(self, text: str) -> Dict:
-        """Fallback extraction"""
-        return {
-            "invoice_number": None,
-            "vendor_name": None,
-            "invoice_date": None,
-            "due_date": None,
-            "total_amount": None,
-            "tax_amount": None,
-            "currency": "USD",
+        """Fallback extraction: whatever the local regex scan finds in the raw response"""
+        found = regex_extractor.extract_fields(text or "")
+        return normalize_record({
+            "invoice_number": found.get("invoice_number"),
+            "vendor_name": found.get("vendor_name"),
+            "invoice_date": found.get("invoice_date"),
+            "due_date": found.get("due_date"),
+            "total_amount": found.get("total_amount"),
+            "tax_amount": found.get("tax_amount"),
+            "currency": found.get("currency"),
+            "payment_terms": found.get("payment_terms"),
+            "line_items": [],
             "extraction_confidence": "low"
-        }
+        })
     
-    def capture(self, invoice_path: str) -> Dict[str, Any]:
-        """Main capture method"""
+    def capture(self, invoice_path: str, progress_callback: Callable = None) -> Dict[str, Any]:
+        """Main capture method.
+        
+        With progress_callback(event, data) the model output is streamed and
+        fields are reported as "partial_fields" events as soon as they parse.
+        """
         logger.info(f"🔄 Capturing: {invoice_path}")
         
-        if self.is_handwritten_document(invoice_path):
-            return self.extract_from_handwritten_invoice(invoice_path)
+        # Cheapest path that can read the document
+        classification = self.classify(invoice_path)
+        document_type = classification["document_type"]
+        on_text = None
+        if progress_callback is not None:
+            progress_callback("capture_started", {"document_type": document_type})
+            on_text = self._partial_field_reporter(progress_callback)
+        
+        if document_type == TEXT_PDF:
+            result = self.extract_from_text_layer(invoice_path, classification["text"], on_text)
+        elif document_type == TYPED_IMAGE:
+            result = self.extract_from_typed_image(invoice_path, classification["mime_type"], on_text)
+        elif document_type == HANDWRITTEN:
+            result = self.extract_from_handwritten_invoice(invoice_path, classification["mime_type"], on_text)
         else:
-            return self.extract_from_digital_invoice(invoice_path)
+            result = self.extract_from_digital_invoice(invoice_path, on_text)
+        result["classification"] = {"document_type": document_type, "features": classification["features"]}
+        return result
+
+
+# Name used by the api package and the test scripts
+InvoiceCaptureAgent = CaptureAgent
@@ -1,31 +1,228 @@
 import google.generativeai as genai
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import os
 import json
+import re
 from dotenv import load_dotenv
 import logging
+from agents.gemini_client import create_model, generate
+from agents.prompts import EXCEPTION_SYSTEM_INSTRUCTION, compact_json
+from utils.vendor_master import VendorMaster
+from utils.fx_rates import get_fx_table
 
 load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+HIGH_AMOUNT_THRESHOLD = float(os.getenv("EXCEPTION_HIGH_AMOUNT", "50000"))
+CFO_AMOUNT_THRESHOLD = float(os.getenv("EXCEPTION_CFO_AMOUNT", "500000"))
+EXCEPTION_BATCH_SIZE = int(os.getenv("EXCEPTION_BATCH_SIZE", "25"))
+
+SEVERITY_ORDER = {"LOW": 0, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+
+# Routine issue types resolved locally without a model call
+EXCEPTION_RULES = {
+    "MISSING_DUE_DATE": {
+        "exception_type": "MISSING_DATA", "severity": "LOW", "assigned_to": "AP_CLERK",
+        "action_required": "Confirm due date from payment terms or vendor", "escalation_needed": False,
+    },
+    "MISSING_INVOICE_DATE": {
+        "exception_type": "MISSING_DATA", "severity": "LOW", "assigned_to": "AP_CLERK",
+        "action_required": "Confirm invoice date with vendor", "escalation_needed": False,
+    },
+    "MISSING_INVOICE_NUMBER": {
+        "exception_type": "MISSING_DATA", "severity": "MEDIUM", "assigned_to": "AP_CLERK",
+        "action_required": "Obtain invoice number before payment", "escalation_needed": False,
+    },
+    "MISSING_AMOUNT": {
+        "exception_type": "MISSING_DATA", "severity": "HIGH", "assigned_to": "AP_CLERK",
+        "action_required": "Re-capture invoice total manually", "escalation_needed": False,
+    },
+    "MISSING_VENDOR": {
+        "exception_type": "MISSING_DATA", "severity": "MEDIUM", "assigned_to": "AP_CLERK",
+        "action_required": "Identify vendor before routing", "escalation_needed": False,
+    },
+    "NEW_VENDOR": {
+        "exception_type": "NEW_VENDOR", "severity": "MEDIUM", "assigned_to": "VENDOR_MANAGEMENT",
+        "action_required": "Verify vendor and add to vendor master", "escalation_needed": False,
+    },
+    "HIGH_AMOUNT": {
+        "exception_type": "HIGH_AMOUNT", "severity": "HIGH", "assigned_to": "FINANCE_MANAGER",
+        "action_required": "Secondary approval required", "escalation_needed": False,
+    },
+    "FX_UNAVAILABLE": {
+        "exception_type": "FX_UNAVAILABLE", "severity": "MEDIUM", "assigned_to": "AP_CLERK",
+        "action_required": "Confirm currency and FX rate before approval", "escalation_needed": False,
+    },
+    "DUPLICATE_INVOICE": {
+        "exception_type": "DUPLICATE", "severity": "HIGH", "assigned_to": "AP_SUPERVISOR",
+        "action_required": "Hold payment and compare with original invoice", "escalation_needed": False,
+    },
+}
+
+
+def _stated_amount(invoice_data: Dict[str, Any]) -> Optional[float]:
+    """Invoice total as stated on the invoice, in its own currency"""
+    amount = invoice_data.get("total_amount", invoice_data.get("amount_total"))
+    try:
+        return float(amount) if amount not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _invoice_amount(invoice_data: Dict[str, Any]) -> Optional[float]:
+    """Invoice total in the base currency; None if missing or it cannot be converted"""
+    amount = _stated_amount(invoice_data)
+    if amount is None:
+        return None
+    return get_fx_table().convert(amount, invoice_data.get("currency"), invoice_data.get("invoice_date"))
+
+
 class ExceptionHandlerAgent:
-    def __init__(self):
+    def __init__(self, vendor_master: VendorMaster = None):
         self.model_name = os.getenv("DEFAULT_MODEL", "gemini-2.0-flash-exp")
+        self.vendor_master = vendor_master or VendorMaster()
         logger.info(f"✅ Initializing Exception Handler")
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = create_model(self.model_name, EXCEPTION_SYSTEM_INSTRUCTION)
         logger.info("✅ Exception Handler created")
-    
+
+    def detect_vendor_issues(self, invoice_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flag vendors that are not in the vendor master"""
+        vendor_name = invoice_data.get("vendor_name")
+        match = self.vendor_master.resolve(vendor_name)
+        if match["is_new_vendor"]:
+            return [{"type": "NEW_VENDOR", "severity": "MEDIUM", "vendor_name": vendor_name}]
+        if match["match_type"] == "none":
+            return [{"type": "MISSING_VENDOR", "severity": "MEDIUM"}]
+        return []
+
+    def detect_issues(self, invoice_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Detect routine issues locally from the extracted fields"""
+        issues = []
+        for field in ("invoice_number", "invoice_date", "due_date"):
+            if not invoice_data.get(field):
+                issues.append({"type": f"MISSING_{field.upper()}"})
+
+        amount = _invoice_amount(invoice_data)
+        if _stated_amount(invoice_data) is None:
+            issues.append({"type": "MISSING_AMOUNT"})
+        elif amount is None:
+            # Same outcome as routing_agent.route_by_amount: no rate, no threshold check
+            issues.append({"type": "FX_UNAVAILABLE", "currency": invoice_data.get("currency")})
+        elif amount >= HIGH_AMOUNT_THRESHOLD:
+            issues.append({"type": "HIGH_AMOUNT", "amount": amount})
+
+        issues.extend(self.detect_vendor_issues(invoice_data))
+        return issues
+
+    def classify_locally(
+        self, invoice_data: Dict[str, Any], issues: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Split issues into rule-classified exceptions and ambiguous leftovers"""
+        resolved, ambiguous = [], []
+        for issue in issues:
+            rule = EXCEPTION_RULES.get(str(issue.get("type", "")).upper())
+            if rule is None:
+                ambiguous.append(issue)
+                continue
+            exception = dict(rule, issue_type=issue["type"].upper())
+            if exception["issue_type"] == "HIGH_AMOUNT":
+                amount = _invoice_amount(invoice_data) or 0.0
+                if amount >= CFO_AMOUNT_THRESHOLD:
+                    exception.update(severity="CRITICAL", assigned_to="CFO", escalation_needed=True)
+            resolved.append(exception)
+        return resolved, ambiguous
+
+    def _summarize(self, exceptions: List[Dict[str, Any]], source: str) -> Dict[str, Any]:
+        severity = max((e.get("severity", "MEDIUM") for e in exceptions),
+                       key=lambda s: SEVERITY_ORDER.get(str(s).upper(), 1), default="LOW")
+        return {
+            "exceptions": exceptions,
+            "severity": severity,
+            "escalation_needed": any(e.get("escalation_needed") for e in exceptions),
+            "source": source,
+        }
+
     def handle(self, invoice_data: Dict[str, Any], issues: List[Dict[str, Any]]) -> Dict[str, Any]:
         try:
             logger.info(f"⚠️  Handling exceptions")
-            prompt = f"""Handle exceptions for: {json.dumps(invoice_data)}
-Issues: {json.dumps(issues)}
-Return: exception_type, severity, assigned_to, action_required, escalation_needed"""
-            
-            response = self.model.generate_content(prompt)
-            return {"status": "success", "exception_handling": response.text}
+            return self.handle_batch([(invoice_data, issues)])[0]
         except Exception as e:
             logger.error(f"❌ Error: {e}")
-            return {"status": "error", "error": str(e)}
\ No newline at end of file
+            return {"status": "error", "error": str(e)}
+
+    def handle_batch(
+        self,
+        items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+        batch_size: int = EXCEPTION_BATCH_SIZE
+    ) -> List[Dict[str, Any]]:
+        """Triage many invoices: rules first, then one model call per batch of ambiguous cases"""
+        local_results = []
+        pending = []
+        for i, (invoice_data, issues) in enumerate(items):
+            resolved, ambiguous = self.classify_locally(invoice_data, issues)
+            local_results.append(resolved)
+            if ambiguous:
+                pending.append((i, invoice_data, ambiguous))
+
+        logger.info(f"⚠️  Triage: {len(items) - len(pending)} resolved locally, {len(pending)} need the model")
+
+        model_results: Dict[int, List[Dict[str, Any]]] = {}
+        errors: Dict[int, str] = {}
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            try:
+                model_results.update(self._classify_with_model(chunk))
+            except Exception as e:
+                logger.error(f"❌ Batch triage error: {e}")
+                for i, _, _ in chunk:
+                    errors[i] = str(e)
+
+        results = []
+        for i, resolved in enumerate(local_results):
+            if i in errors:
+                results.append({"status": "error", "error": errors[i]})
+                continue
+            from_model = model_results.get(i, [])
+            source = "rules" if not from_model else ("model" if not resolved else "rules+model")
+            results.append({
+                "status": "success",
+                "exception_handling": self._summarize(resolved + from_model, source),
+            })
+        return results
+
+    def _classify_with_model(
+        self, chunk: List[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Classify the ambiguous issues of several invoices in one model call"""
+        cases = [
+            {"id": i, "invoice": {k: v for k, v in invoice_data.items() if v not in (None, "")}, "issues": ambiguous}
+            for i, invoice_data, ambiguous in chunk
+        ]
+        prompt = f"Cases: {compact_json(cases)}"
+
+        response = generate(self.model, prompt, agent="exception")
+        text = response.text.strip()
+        match = re.search(r'\[.*\]', text, re.DOTALL)
+        parsed = json.loads(match.group(0) if match else text)
+
+        results: Dict[int, List[Dict[str, Any]]] = {i: [] for i, _, _ in chunk}
+        for entry in parsed:
+            # Models often echo the ID as a string
+            try:
+                case_id = int(entry.pop("id", None))
+            except (TypeError, ValueError):
+                continue
+            if case_id in results:
+                results[case_id].append(entry)
+
+        # Cases the model skipped still need a human
+        for i, _, ambiguous in chunk:
+            if not results[i]:
+                results[i] = [{
+                    "exception_type": "UNCLASSIFIED", "severity": "MEDIUM", "assigned_to": "AP_SUPERVISOR",
+                    "action_required": "Manual review", "escalation_needed": False,
+                    "issue_type": [str(issue.get("type")) for issue in ambiguous],
+                }]
+        return results
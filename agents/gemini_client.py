@@ -0,0 +1,154 @@
+"""Shared Gemini client helpers - model construction, context caching and usage tracking"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, List, Optional
+import google.generativeai as genai
+from agents.prompts import PROMPT_VERSION
+from utils.token_usage import record_usage
+from utils.adaptive_limiter import model_limiter
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL_MINUTES = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_MINUTES", "60"))
+
+
+def _is_not_found(error: BaseException) -> bool:
+    return type(error).__name__ in ("NotFound", "PermissionDenied") or getattr(error, "code", None) == 404
+
+
+class ContextCachedModel:
+    """A model bound to cached content that is kept alive while the model is in use.
+
+    Cached content expires after its TTL, but agents live as long as the
+    process. Once three quarters of the TTL have passed, the next call
+    extends it; a cache that expired anyway (idle process, clock skew) is
+    recreated, and a call that fails because its cache is gone is retried
+    once on a new one. delete_context_caches() removes them at shutdown.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str, ttl_minutes: int = CONTEXT_CACHE_TTL_MINUTES):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self._lock = threading.Lock()
+        self._cached = None
+        self._model = None
+        self._refresh_at = 0.0
+        self._create()
+
+    def _create(self):
+        from google.generativeai import caching
+        self._cached = caching.CachedContent.create(
+            model=self.model_name,
+            display_name=f"invoice-agent-{PROMPT_VERSION}",
+            system_instruction=self.system_instruction,
+            ttl=self.ttl,
+        )
+        self._model = genai.GenerativeModel.from_cached_content(cached_content=self._cached)
+        self._refresh_at = time.monotonic() + self.ttl.total_seconds() * 0.75
+
+    def _current_model(self):
+        with self._lock:
+            if time.monotonic() >= self._refresh_at:
+                try:
+                    self._cached.update(ttl=self.ttl)
+                    self._refresh_at = time.monotonic() + self.ttl.total_seconds() * 0.75
+                except Exception as e:
+                    logger.info(f"ℹ️ Recreating context cache for {self.model_name}: {e}")
+                    self._create()
+            return self._model
+
+    def generate_content(self, contents, **kwargs):
+        model = self._current_model()
+        try:
+            return model.generate_content(contents, **kwargs)
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            logger.info(f"ℹ️ Context cache for {self.model_name} is gone; recreating: {e}")
+            with self._lock:
+                if self._model is model:
+                    self._create()
+                model = self._model
+            return model.generate_content(contents, **kwargs)
+
+    def delete(self):
+        with self._lock:
+            cached, self._cached = self._cached, None
+        if cached is not None:
+            try:
+                cached.delete()
+            except Exception as e:
+                logger.debug(f"Could not delete context cache for {self.model_name}: {e}")
+
+
+_context_cached_models: List[ContextCachedModel] = []
+
+
+def delete_context_caches():
+    """Delete the cached content created by this process"""
+    while _context_cached_models:
+        _context_cached_models.pop().delete()
+
+
+atexit.register(delete_context_caches)
+
+
+def create_model(model_name: str, system_instruction: Optional[str] = None):
+    """Create a model with a static system instruction.
+
+    With GEMINI_CONTEXT_CACHE=1 the instruction is stored as cached content
+    so it is not re-billed on every call (see ContextCachedModel). The
+    backend only caches prompts above a minimum size and for versioned
+    model names; when caching is not available the plain model is returned.
+    """
+    if system_instruction and CONTEXT_CACHE_ENABLED:
+        try:
+            model = ContextCachedModel(model_name, system_instruction)
+            _context_cached_models.append(model)
+            logger.info(f"✅ Using cached context for {model_name}")
+            return model
+        except Exception as e:
+            logger.info(f"ℹ️ Context caching unavailable for {model_name}: {e}")
+
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+def generate(
+    model,
+    contents: Any,
+    agent: str,
+    on_text: Optional[Callable[[str], None]] = None,
+    **kwargs
+):
+    """Call generate_content and record the token usage of the response.
+
+    With on_text the response is streamed and on_text is called with the
+    text received so far after every chunk; the returned response is fully
+    resolved either way.
+    
+    Calls from all agents share one adaptive concurrency limit, which grows
+    while latency is flat and backs off on 429s and timeouts.
+    """
+    with model_limiter.slot():
+        if on_text is None:
+            response = model.generate_content(contents, **kwargs)
+        else:
+            response = model.generate_content(contents, stream=True, **kwargs)
+            received = ""
+            for chunk in response:
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    # Chunks carrying only metadata or a finish reason have no text
+                    continue
+                if piece:
+                    received += piece
+                    on_text(received)
+    record_usage(agent, getattr(model, "model_name", "unknown"), response, PROMPT_VERSION)
+    return response
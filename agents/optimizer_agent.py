@@ -1,9 +1,11 @@
 import google.generativeai as genai
 from typing import Dict, Any
 import os
-import json
 from dotenv import load_dotenv
 import logging
+from agents.gemini_client import create_model, generate
+from agents.prompts import OPTIMIZATION_SYSTEM_INSTRUCTION, compact_json
+from utils.fx_rates import get_fx_table, to_base_currency
 
 load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -14,17 +16,17 @@ class OptimizationAgent:
         self.model_name = os.getenv("DEFAULT_MODEL", "gemini-2.0-flash-exp")
         logger.info(f"✅ Initializing Optimization Agent")
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = create_model(self.model_name, OPTIMIZATION_SYSTEM_INSTRUCTION)
         logger.info("✅ Optimization Agent created")
     
     def optimize(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             logger.info(f"💰 Optimizing payment")
-            prompt = f"""Optimize payment for: {json.dumps(invoice_data)}
-Parse payment terms, calculate discount ROI, recommend optimal payment date
-Return: discount_available, savings_opportunity, recommended_payment_date"""
+            invoice_data = dict(invoice_data, amount_base=to_base_currency(invoice_data),
+                                base_currency=get_fx_table().base_currency)
+            prompt = f"Invoice: {compact_json(invoice_data)}"
             
-            response = self.model.generate_content(prompt)
+            response = generate(self.model, prompt, agent="optimization")
             return {"status": "success", "payment_optimization": response.text}
         except Exception as e:
             logger.error(f"❌ Error: {e}")
@@ -1,7 +1,14 @@
 """Orchestrator - Routes invoices through processing stages"""
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional
 from agents.capture_agent import CaptureAgent
+from utils.vendor_master import VendorMaster
+from utils.token_usage import usage_scope, summarize_usage
+from utils.line_items import reconcile_invoice
+from agents.routing_agent import route_by_amount
+from utils.date_normalizer import date_normalizer, invoice_payment_schedule
+from utils.file_hash import compute_file_hash
+from utils.stage_journal import StageJournal, CAPTURE
 import json
 
 logger = logging.getLogger(__name__)
@@ -9,47 +16,177 @@ logger = logging.getLogger(__name__)
 class InvoiceOrchestrator:
     """Main orchestrator for processing invoices"""
     
-    def __init__(self, model_name: str = "gemini-2.0-flash"):
+    def __init__(self, model_name: str = "gemini-2.0-flash", vendor_master: VendorMaster = None):
         self.capture_agent = CaptureAgent(model_name)
+        self.vendor_master = vendor_master or VendorMaster()
         self.model_name = model_name
         logger.info(f"✅ Initializing Invoice Orchestrator with model: {model_name}")
         logger.info(f"✅ Orchestrator created")
     
-    def process_invoice(self, pdf_path: str, vendor_name: str = "Unknown") -> Dict[str, Any]:
-        """Process invoice through stages"""
+    def _emit(self, progress_callback: Optional[Callable], event: str, data: Dict[str, Any]):
+        """Report a stage to the caller; a failing listener never fails the invoice"""
+        if progress_callback is None:
+            return
+        try:
+            progress_callback(event, data)
+        except Exception as e:
+            logger.warning(f"⚠️ Progress callback failed on {event}: {e}")
+    
+    def capture_stage(self, pdf_path: str, emit: Optional[Callable] = None) -> Dict[str, Any]:
+        """Model extraction; the only stage that costs tokens"""
+        with usage_scope() as usage:
+            capture_result = self.capture_agent.capture(pdf_path, progress_callback=emit)
+        
+        extracted_data = capture_result.get('extracted_data', {})
+        if isinstance(extracted_data, str):
+            try:
+                extracted_data = json.loads(extracted_data)
+            except:
+                extracted_data = {}
+        
+        return {
+            "status": capture_result.get('status'),
+            "error": capture_result.get('error'),
+            "extracted_data": extracted_data,
+            "document_type": capture_result.get('document_type'),
+            "prompt_version": capture_result.get('prompt_version'),
+            "token_usage": summarize_usage(usage),
+        }
+    
+    def build_fields(self, extracted_data: Dict[str, Any], vendor_name: str = "Unknown") -> Dict[str, Any]:
+        """Resolve the vendor and normalize extracted fields"""
+        # Resolve the vendor against the master (caller hint as fallback)
+        extracted_vendor = extracted_data.get('vendor_name') or vendor_name
+        vendor_hint = vendor_name if vendor_name != "Unknown" else None
+        vendor_match = self.vendor_master.resolve(extracted_data.get('vendor_name') or vendor_hint)
+        
+        # Dates are parsed with the format this vendor usually uses
+        vendor_key = vendor_match["vendor_id"] or vendor_match["normalized_name"] or None
+        invoice_date = extracted_data.get('invoice_date')
+        due_date = extracted_data.get('due_date')
+        
+        fields = {
+            "invoice_number": extracted_data.get('invoice_number'),
+            "vendor_name": extracted_vendor,
+            "invoice_date": date_normalizer.normalize(invoice_date, vendor_key) or invoice_date,
+            "due_date": date_normalizer.normalize(due_date, vendor_key) or due_date,
+            "total_amount": extracted_data.get('total_amount'),
+            "tax_amount": extracted_data.get('tax_amount'),
+            "currency": extracted_data.get('currency'),
+            "payment_terms": extracted_data.get('payment_terms'),
+            "line_items": extracted_data.get('line_items') or [],
+            "extraction_confidence": extracted_data.get('extraction_confidence', 'unknown')
+        }
+        return {"fields": fields, "vendor_match": vendor_match, "vendor_key": vendor_key}
+    
+    def validation_stage(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        # Arithmetic checks are local; no model call needed
+        reconciliation = reconcile_invoice(fields)
+        if reconciliation["status"] == "mismatch":
+            logger.warning(f"⚠️ Line items do not reconcile: difference {reconciliation['difference']}")
+        return {"line_items": reconciliation}
+    
+    def routing_stage(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return route_by_amount(fields)
+    
+    def _run_stage(
+        self,
+        journal: Optional[StageJournal],
+        document_key: Optional[str],
+        stage: str,
+        run: Callable[[], Dict[str, Any]],
+        replayed: List[str]
+    ) -> Dict[str, Any]:
+        """Replay a stage from the journal, or run it and journal a successful output"""
+        if journal is not None:
+            output = journal.get(document_key, stage)
+            if output is not None:
+                replayed.append(stage)
+                return output
+        output = run()
+        # Failed captures are not journaled, so a resume retries them
+        if journal is not None and output.get("status") == "success":
+            journal.record(document_key, stage, output)
+        return output
+    
+    def process_invoice(
+        self,
+        pdf_path: str,
+        vendor_name: str = "Unknown",
+        progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        journal: Optional[StageJournal] = None,
+        document_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Process invoice through stages.
+        
+        progress_callback(event, data), if given, is called from this thread
+        as each stage finishes: capture_started, partial_fields (while the
+        model streams), capture_done, validation_done and routing_decided.
+        
+        With a journal, a successful capture is recorded under document_key
+        (default: the file's content hash) and replayed instead of calling
+        the model again. Validation and routing are local and cheap, so
+        they always run. A failed capture returns an error result.
+        """
         logger.info(f"🔄 Processing: {pdf_path}")
+        emit = (lambda event, data: self._emit(progress_callback, event, data)) if progress_callback else None
+        if journal is not None and document_key is None:
+            document_key = compute_file_hash(pdf_path)
+        replayed: List[str] = []
         
         try:
-            # Use CaptureAgent to extract data
-            capture_result = self.capture_agent.capture(pdf_path)
+            capture = self._run_stage(
+                journal, document_key, CAPTURE,
+                lambda: self.capture_stage(pdf_path, emit), replayed
+            )
+            if capture.get('status') != "success":
+                logger.error(f"❌ Capture failed: {capture.get('error')}")
+                return {
+                    "status": "error",
+                    "invoice_path": pdf_path,
+                    "error": capture.get('error') or "Capture failed",
+                    "document_type": capture.get('document_type'),
+                    "model_used": self.model_name,
+                    "token_usage": capture.get('token_usage'),
+                }
+            
+            resolved = self.build_fields(capture.get('extracted_data') or {}, vendor_name)
+            fields, vendor_match = resolved["fields"], resolved["vendor_match"]
+            
+            self._emit(progress_callback, "capture_done", {
+                "document_type": capture.get('document_type'),
+                "vendor_id": vendor_match["vendor_id"],
+                "fields": fields
+            })
             
-            extracted_data = capture_result.get('extracted_data', {})
+            validation = self.validation_stage(fields)
+            self._emit(progress_callback, "validation_done", validation)
             
-            if isinstance(extracted_data, str):
-                try:
-                    extracted_data = json.loads(extracted_data)
-                except:
-                    extracted_data = {}
+            routing = self.routing_stage(fields)
+            self._emit(progress_callback, "routing_decided", routing)
             
             # Build clean response
             result = {
                 "status": "success",
                 "invoice_path": pdf_path,
                 "vendor": vendor_name,
-                "result": json.dumps({
-                    "invoice_number": extracted_data.get('invoice_number'),
-                    "vendor_name": extracted_data.get('vendor_name') or vendor_name,
-                    "invoice_date": extracted_data.get('invoice_date'),
-                    "due_date": extracted_data.get('due_date'),
-                    "total_amount": extracted_data.get('total_amount'),
-                    "tax_amount": extracted_data.get('tax_amount'),
-                    "currency": extracted_data.get('currency', 'USD'),
-                    "payment_terms": extracted_data.get('payment_terms'),
-                    "extraction_confidence": extracted_data.get('extraction_confidence', 'unknown')
-                }),
+                "vendor_id": vendor_match["vendor_id"],
+                "vendor_match": vendor_match,
+                "result": fields,
+                "stages": {
+                    "validation": validation,
+                    "routing": routing,
+                    "optimization": invoice_payment_schedule(fields, resolved["vendor_key"]),
+                },
                 "model_used": self.model_name,
+                "document_type": capture.get('document_type'),
+                "prompt_version": capture.get('prompt_version'),
+                "token_usage": capture.get('token_usage') if CAPTURE not in replayed else summarize_usage([]),
                 "processing_time": "2 seconds"
             }
+            if replayed:
+                result["replayed_stages"] = replayed
+                logger.info(f"♻️ Replayed from journal: {', '.join(replayed)}")
             
             logger.info(f"✅ Success")
             return result
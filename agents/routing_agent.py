@@ -1,31 +1,54 @@
 import google.generativeai as genai
 from typing import Dict, Any
 import os
-import json
 from dotenv import load_dotenv
 import logging
+from agents.gemini_client import create_model, generate
+from agents.prompts import ROUTING_SYSTEM_INSTRUCTION, compact_json
+from utils.fx_rates import get_fx_table, to_base_currency
 
 load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bounds in the base currency, checked in order
+ROUTING_THRESHOLDS = [
+    (5000, "AUTO_APPROVE", "SYSTEM"),
+    (50000, "MANAGER", "DEPARTMENT_MANAGER"),
+    (500000, "FINANCE", "FINANCE_DIRECTOR"),
+    (float("inf"), "CFO", "CFO"),
+]
+
+def route_by_amount(invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Route on the base-currency amount without a model call"""
+    base_currency = get_fx_table().base_currency
+    amount_base = to_base_currency(invoice_data)
+    if amount_base is None:
+        # Unknown amount or currency: a person has to look at it
+        return {"routing_decision": "MANUAL_REVIEW", "approver": "AP_CLERK",
+                "amount_base": None, "base_currency": base_currency}
+    for limit, decision, approver in ROUTING_THRESHOLDS:
+        if amount_base < limit:
+            return {"routing_decision": decision, "approver": approver,
+                    "amount_base": amount_base, "base_currency": base_currency}
+
 class RoutingAgent:
     def __init__(self):
         self.model_name = os.getenv("DEFAULT_MODEL", "gemini-2.0-flash-exp")
         logger.info(f"✅ Initializing Routing Agent")
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = create_model(self.model_name, ROUTING_SYSTEM_INSTRUCTION)
         logger.info("✅ Routing Agent created")
     
     def route(self, invoice_data: Dict[str, Any], validation_result: Dict[str, Any]) -> Dict[str, Any]:
         try:
             logger.info(f"🔄 Routing invoice")
-            prompt = f"""Route invoice based on: {json.dumps(invoice_data)}
-Validation: {json.dumps(validation_result)}
-Rules: <$5K AUTO, $5-50K MANAGER, $50-500K FINANCE, >$500K CFO
-Return: routing_decision, approver, priority"""
+            invoice_data = dict(invoice_data, amount_base=to_base_currency(invoice_data),
+                                base_currency=get_fx_table().base_currency)
+            prompt = f"""Invoice: {compact_json(invoice_data)}
+Validation: {compact_json(validation_result)}"""
             
-            response = self.model.generate_content(prompt)
+            response = generate(self.model, prompt, agent="routing")
             return {"status": "success", "routing_decision": response.text}
         except Exception as e:
             logger.error(f"❌ Error: {e}")
@@ -1,9 +1,10 @@
 import google.generativeai as genai
 from typing import Dict, Any
 import os
-import json
 from dotenv import load_dotenv
 import logging
+from agents.gemini_client import create_model, generate
+from agents.prompts import VALIDATION_SYSTEM_INSTRUCTION, compact_json
 
 load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -14,17 +15,15 @@ class ValidationAgent:
         self.model_name = os.getenv("DEFAULT_MODEL", "gemini-2.0-flash-exp")
         logger.info(f"✅ Initializing Validation Agent")
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = create_model(self.model_name, VALIDATION_SYSTEM_INSTRUCTION)
         logger.info("✅ Validation Agent created")
     
     def validate(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             logger.info(f"✅ Validating invoice")
-            prompt = f"""Validate this invoice data: {json.dumps(extracted_data)}
-Check: completeness, format, calculations, duplicates, fraud signals
-Return: status (PASS/REVIEW/FAIL), confidence, flags"""
+            prompt = f"Invoice: {compact_json(extracted_data)}"
             
-            response = self.model.generate_content(prompt)
+            response = generate(self.model, prompt, agent="validation")
             return {"status": "success", "validation_result": response.text}
         except Exception as e:
             logger.error(f"❌ Error: {e}")
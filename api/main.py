@@ -1,11 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Optional, Tuple
 import uvicorn
+import asyncio
+import hashlib
+import json
 import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from functools import partial
 from dotenv import load_dotenv
 import logging
 
+# Allow `python api/main.py` to import the agents/utils packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.single_flight import SingleFlight, IdempotencyCache
+from utils.job_store import JobStore
+from utils.invoice_store import InvoiceStore
+from utils.admission import AdmissionController, QueueFullError
+from utils.profiler import request_profiler
+from utils.response_formats import render
+
 # Load environment variables
 load_dotenv()
 
@@ -23,6 +43,305 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Concurrent identical uploads share one pipeline run
+invoice_flights = SingleFlight()
+idempotency_cache = IdempotencyCache(
+    max_entries=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+)
+
+# Bounded concurrency and wait queues per endpoint; overflow gets a fast 429
+admission = {
+    "process": AdmissionController(
+        "process",
+        max_concurrent=int(os.getenv("PROCESS_MAX_CONCURRENT", "8")),
+        max_queue=int(os.getenv("PROCESS_MAX_QUEUE", "32"))
+    ),
+    "batch": AdmissionController(
+        "batch",
+        max_concurrent=int(os.getenv("BATCH_MAX_CONCURRENT", "2")),
+        max_queue=int(os.getenv("BATCH_MAX_QUEUE", "4"))
+    ),
+}
+
+def queue_full_response(error: QueueFullError) -> HTTPException:
+    logger.warning(f"🚦 Rejecting request: {error} (retry after {error.retry_after}s)")
+    return HTTPException(
+        status_code=429,
+        detail=f"Server busy: {error.name} queue is full",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+# Upload endpoints and the queue that admits them
+ADMISSION_ROUTES = {
+    "/api/v1/invoices/process": "process",
+    "/api/v1/invoices/process/stream": "process",
+    "/api/v1/invoices/batch": "batch",
+}
+
+@app.middleware("http")
+async def reject_when_full(request: Request, call_next):
+    """Answer 429 before the upload is read.
+    
+    FastAPI parses the multipart body before the endpoint runs, so this
+    check has to happen first. Idempotent replays are let through; they do
+    not take a slot.
+    """
+    name = ADMISSION_ROUTES.get(request.url.path)
+    idempotency_key = request.headers.get("Idempotency-Key")
+    replay = idempotency_key is not None and idempotency_cache.get(idempotency_key) is not None
+    if request.method == "POST" and name and not replay:
+        try:
+            admission[name].check()
+        except QueueFullError as qe:
+            error = queue_full_response(qe)
+            return JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=error.headers)
+    return await call_next(request)
+
+# Job status is shared by all worker processes through SQLite
+job_store = JobStore()
+in_flight_jobs: set = set()
+
+# Every processed invoice is recorded in the indexed result store
+invoice_store = InvoiceStore()
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+
+# Uploads are spooled to disk in chunks rather than read into memory
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+def get_orchestrator():
+    """Create the orchestrator on first use"""
+    global _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            from agents.orchestrator import InvoiceOrchestrator
+            _orchestrator = InvoiceOrchestrator()
+    return _orchestrator
+
+# Set once warm-up finishes; /ready answers 503 until then
+WARMUP_MODEL_PING = os.getenv("WARMUP_MODEL_PING", "1") == "1"
+WARMUP_PING_TIMEOUT = float(os.getenv("WARMUP_PING_TIMEOUT", "10"))
+readiness = {"ready": False, "error": None, "steps": {}}
+
+def warm_up_local_paths():
+    """Run each local stage once on a tiny sample so imports, compiled patterns and caches are loaded"""
+    from PIL import Image
+    from utils.fx_rates import get_fx_table
+    from utils.date_normalizer import date_normalizer, invoice_payment_schedule
+    from utils.line_items import reconcile_invoice
+    from utils.normalization import normalize_record
+    from utils.regex_extractor import regex_extractor
+    from utils.document_classifier import image_features
+    
+    sample = {
+        "invoice_date": "2025-01-02", "due_date": None, "payment_terms": "2/10 Net 30",
+        "total_amount": 110.0, "tax_amount": 10.0, "currency": "USD",
+        "line_items": [{"description": "warm-up", "quantity": 1, "unit_price": 100.0, "line_total": 100.0}],
+    }
+    get_fx_table().convert(sample["total_amount"], sample["currency"], sample["invoice_date"])
+    date_normalizer.normalize("01/02/2025")
+    invoice_payment_schedule(sample)
+    reconcile_invoice(sample)
+    normalize_record({"total_amount": "$1,000.00", "vendor_name": "Not Found"})
+    regex_extractor.extract("Invoice #: INV-0001\nTotal: 100.00")
+    image_features(Image.new("RGB", (64, 64), "white"))
+
+def warm_up() -> dict:
+    """Build model clients, open connections and stores, and load local caches.
+    
+    Returns per-step timings. Only a failure to build the orchestrator is
+    fatal; a failed model ping (e.g. no network yet) is reported and the
+    connection is opened by the first request instead.
+    """
+    steps = {}
+    
+    def step(name, fn, fatal=False):
+        started = time.perf_counter()
+        try:
+            fn()
+            steps[name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            steps[name] = {"ok": False, "ms": round((time.perf_counter() - started) * 1000, 1), "error": str(e)}
+            logger.warning(f"⚠️ Warm-up step {name} failed: {e}")
+            if fatal:
+                raise
+    
+    step("orchestrator", get_orchestrator, fatal=True)
+    if WARMUP_MODEL_PING:
+        # count_tokens is not billed, but it resolves auth and opens the connection pool
+        step("model_connection", lambda: get_orchestrator().capture_agent.model.count_tokens(
+            "warm-up", request_options={"timeout": WARMUP_PING_TIMEOUT, "retry": None}
+        ))
+    step("stores", lambda: (invoice_store.query(limit=1), job_store.get("warm-up")))
+    step("local_paths", warm_up_local_paths)
+    return steps
+
+async def run_warm_up():
+    started = time.perf_counter()
+    try:
+        readiness["steps"] = await run_in_threadpool(warm_up)
+        readiness["ready"] = True
+        logger.info(f"✅ Warm-up finished in {time.perf_counter() - started:.1f}s; ready for traffic")
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.error(f"❌ Warm-up failed; staying unready: {e}", exc_info=True)
+
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    """Stream an upload to a temp file in chunks, hashing as it goes"""
+    ext = os.path.splitext(file.filename)[1].lower()
+    digest = hashlib.sha256()
+    # Unique temp file so uploads with the same filename never collide
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+        temp_path = f.name
+    logger.info(f"✅ File saved to: {temp_path}")
+    return temp_path, digest.hexdigest()
+
+def formatted_response(
+    payload: dict,
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    records_key: Optional[str] = None,
+    headers: Optional[dict] = None
+) -> Response:
+    """Encode a payload in the format the client asked for (JSON, msgpack, NDJSON, Arrow)"""
+    body, format_headers = render(payload, accept, accept_encoding, records_key)
+    media_type = format_headers.pop("Content-Type")
+    return Response(content=body, media_type=media_type, headers={**format_headers, **(headers or {})})
+
+def remove_upload(temp_path: str):
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+
+# Job writes started where awaiting is not possible (cancellation); drained at shutdown
+pending_job_writes: set = set()
+
+def write_job_later(fn, *args, **kwargs):
+    """Run a job store write on the thread pool without blocking the event loop"""
+    future = asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+    pending_job_writes.add(future)
+    future.add_done_callback(job_write_done)
+    return future
+
+def job_write_done(future):
+    pending_job_writes.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"❌ Job store write failed: {future.exception()}")
+
+def finish_job(job_id: str, flight: asyncio.Task):
+    """Record the outcome of a run whose request was cancelled while it carried on (thread pool)"""
+    in_flight_jobs.discard(job_id)
+    if flight.cancelled():
+        job_store.fail(job_id, "Worker shut down before the invoice finished", status="interrupted")
+    elif flight.exception() is not None:
+        job_store.fail(job_id, str(flight.exception()))
+    else:
+        job_store.complete(job_id, flight.result())
+
+async def run_invoice_pipeline(
+    temp_path: str,
+    filename: str,
+    vendor_name: Optional[str],
+    content_hash: str,
+    progress_callback=None,
+    profile: bool = False
+) -> dict:
+    """Run a saved upload through the orchestrator, coalescing duplicates.
+    
+    progress_callback only sees stage events when this request leads the
+    flight; a coalesced duplicate just receives the shared result. With
+    profile (or when sampled), a profiling report is stored with the result.
+    """
+    flight_key = f"{content_hash}:{vendor_name or ''}"
+    job_id = uuid.uuid4().hex
+    
+    async def execute():
+        trigger = request_profiler.trigger(profile)
+        result, profile_report = await run_in_threadpool(
+            request_profiler.run, trigger,
+            get_orchestrator().process_invoice, temp_path, vendor_name or "Unknown", progress_callback
+        )
+        result.update({"invoice_path": filename, "content_hash": content_hash})
+        record = await run_in_threadpool(invoice_store.save_result, result)
+        result.update({
+            "invoice_id": record["invoice_id"],
+            "possible_duplicates": record["duplicates"]
+        })
+        if profile_report is not None:
+            result["profile_id"] = await run_in_threadpool(
+                invoice_store.save_profile, record["invoice_id"], profile_report
+            )
+            # Sampled reports are only stored; asked-for ones are also returned
+            if trigger == "request":
+                result["profile"] = profile_report
+        return result
+    
+    await run_in_threadpool(job_store.create, job_id, filename, content_hash)
+    in_flight_jobs.add(job_id)
+    flight = None
+    try:
+        flight, shared = invoice_flights.start(flight_key, execute)
+        # shield() so a cancelled request does not cancel the shared run
+        result = await asyncio.shield(flight)
+        await run_in_threadpool(job_store.complete, job_id, result)
+    except asyncio.CancelledError:
+        if flight is not None:
+            # Client gone: the shared run carries on and its outcome is this job's
+            flight.add_done_callback(lambda finished: write_job_later(finish_job, job_id, finished))
+        else:
+            # Awaiting is not possible here, and the job must not stay "processing"
+            in_flight_jobs.discard(job_id)
+            write_job_later(
+                job_store.fail, job_id, "Request was cancelled before the invoice finished", status="interrupted"
+            )
+        raise
+    except Exception as e:
+        in_flight_jobs.discard(job_id)
+        await run_in_threadpool(job_store.fail, job_id, str(e))
+        raise
+    in_flight_jobs.discard(job_id)
+    
+    if shared:
+        logger.info(f"🔁 Coalesced duplicate upload: {filename}")
+    
+    response = dict(result)
+    response.update({
+        "job_id": job_id,
+        "filename": filename,
+        "content_hash": content_hash,
+        "coalesced": shared
+    })
+    return response
+
+async def process_batch_files(files: list) -> list:
+    """Process the files of a batch request one after another"""
+    results = []
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            results.append({
+                "filename": file.filename,
+                "status": "error",
+                "error": "Only PDF files are supported"
+            })
+            continue
+        
+        temp_path, content_hash = await save_upload(file)
+        try:
+            results.append(await run_invoice_pipeline(temp_path, file.filename, None, content_hash))
+        finally:
+            remove_upload(temp_path)
+    return results
+
 # ============================================================================
 # ROOT ENDPOINT - This fixes the "Not Found" error
 # ============================================================================
@@ -37,10 +356,14 @@ async def root():
         "description": "AI-powered invoice processing using Google ADK agents",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "docs": "/docs",
             "process_invoice": "/api/v1/invoices/process",
+            "process_invoice_stream": "/api/v1/invoices/process/stream",
             "batch_process": "/api/v1/invoices/batch",
-            "invoice_status": "/api/v1/invoices/{invoice_id}/status"
+            "invoice_status": "/api/v1/invoices/{invoice_id}/status",
+            "invoice_profile": "/api/v1/invoices/{invoice_id}/profile",
+            "invoice_query": "/api/v1/invoices"
         },
         "documentation": "Visit /docs for interactive API documentation"
     }
@@ -51,13 +374,46 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up (see /ready for whether it should get traffic)"""
     return {
         "status": "healthy",
+        "ready": readiness["ready"],
         "service": "Invoice Processing Agent",
         "version": "1.0.0"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once warm-up has finished, 503 before that or if it failed"""
+    body = {
+        "status": "ready" if readiness["ready"] else ("failed" if readiness["error"] else "warming_up"),
+        "steps": readiness["steps"],
+        "error": readiness["error"],
+    }
+    return JSONResponse(content=body, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/api/v1/metrics/queues")
+async def queue_metrics():
+    """Queue depth, in-flight count and wait times per endpoint"""
+    return {name: controller.snapshot() for name, controller in admission.items()}
+
+@app.get("/api/v1/metrics/tokens")
+async def token_metrics():
+    """Model token usage since startup, broken down by agent"""
+    from utils.token_usage import tracker
+    return tracker.snapshot()
+
+@app.get("/api/v1/metrics/model-limit")
+async def model_limit_metrics():
+    """Current adaptive concurrency limit for model calls"""
+    from utils.adaptive_limiter import model_limiter
+    return model_limiter.snapshot()
+
+@app.get("/api/v1/metrics/profiling")
+async def profiling_metrics():
+    """Profiling mode and how many requests were profiled"""
+    return request_profiler.snapshot()
+
 # ============================================================================
 # INVOICE PROCESSING ENDPOINTS
 # ============================================================================
@@ -65,7 +421,11 @@ async def health_check():
 @app.post("/api/v1/invoices/process")
 async def process_invoice(
     file: UploadFile = File(...),
-    vendor_name: Optional[str] = None
+    vendor_name: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    profile: Optional[str] = Header(None, alias="X-Profile"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding")
 ):
     """
     Process a single invoice PDF through the agent pipeline.
@@ -73,6 +433,10 @@ async def process_invoice(
     Args:
         file: Invoice PDF file
         vendor_name: Optional vendor name for context
+        idempotency_key: Optional client key; retries with the same key
+            replay the original response instead of reprocessing
+        profile: X-Profile: <PROFILE_TOKEN> returns a cProfile/tracemalloc report with the result
+        accept / accept_encoding: JSON (default) or msgpack, optionally gzip/zstd
         
     Returns:
         Processing results with all agent decisions
@@ -87,28 +451,44 @@ async def process_invoice(
                 detail="Only PDF files are supported"
             )
         
-        # Save uploaded file temporarily
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        logger.info(f"✅ File saved to: {temp_path}")
+        # The queue may have filled while the body was uploading; don't copy and hash it then
+        if not (idempotency_key and idempotency_cache.get(idempotency_key) is not None):
+            admission["process"].check()
         
-        # TODO: Import and use orchestrator
-        # from agents.orchestrator import InvoiceOrchestrator
-        # orchestrator = InvoiceOrchestrator()
-        # result = orchestrator.process_invoice(temp_path, vendor_name)
-        
-        # For now, return mock response
-        return {
-            "status": "success",
-            "message": "Invoice processing endpoint is working",
-            "filename": file.filename,
-            "vendor_name": vendor_name,
-            "note": "Agent processing will be implemented here"
-        }
+        temp_path, content_hash = await save_upload(file)
+        try:
+            fingerprint = f"{content_hash}:{vendor_name or ''}"
+            
+            # Replays are answered without taking a queue slot
+            if idempotency_key:
+                cached = idempotency_cache.get(idempotency_key)
+                if cached is not None:
+                    cached_fingerprint, cached_response = cached
+                    if cached_fingerprint != fingerprint:
+                        raise HTTPException(
+                            status_code=422,
+                            detail="Idempotency-Key was already used with a different request"
+                        )
+                    logger.info(f"🔁 Replaying response for Idempotency-Key {idempotency_key}")
+                    return formatted_response(
+                        cached_response, accept, accept_encoding, headers={"Idempotent-Replayed": "true"}
+                    )
+            
+            async with admission["process"].slot():
+                response = await run_invoice_pipeline(
+                    temp_path, file.filename, vendor_name, content_hash, profile=wants_profile(profile)
+                )
+            
+            # Only successful runs are replayable; failures may be retried
+            if idempotency_key and response.get("status") == "success":
+                idempotency_cache.put(idempotency_key, fingerprint, response)
+            
+            return formatted_response(response, accept, accept_encoding)
+        finally:
+            remove_upload(temp_path)
         
+    except QueueFullError as qe:
+        raise queue_full_response(qe)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -118,44 +498,118 @@ async def process_invoice(
             detail=f"Error processing invoice: {str(e)}"
         )
 
+def wants_profile(header_value: Optional[str]) -> bool:
+    # Only clients holding PROFILE_TOKEN may switch profiling on
+    return request_profiler.requested(header_value)
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/v1/invoices/process/stream")
+async def process_invoice_stream(
+    file: UploadFile = File(...),
+    vendor_name: Optional[str] = None,
+    profile: Optional[str] = Header(None, alias="X-Profile")
+):
+    """
+    Process a single invoice PDF and stream progress as Server-Sent Events.
+    
+    Events: uploaded, capture_started, partial_fields (extracted fields as
+    the model streams them), capture_done, validation_done, routing_decided,
+    then complete with the same body as /api/v1/invoices/process, or error.
+    """
+    logger.info(f"📡 Streaming invoice: {file.filename}")
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are supported"
+        )
+    try:
+        admission["process"].check()
+    except QueueFullError as qe:
+        raise queue_full_response(qe)
+    
+    temp_path, content_hash = await save_upload(file)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def progress(event: str, data: dict):
+        # Called from the orchestrator's worker thread
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+    
+    async def pipeline():
+        async with admission["process"].slot():
+            return await run_invoice_pipeline(
+                temp_path, file.filename, vendor_name, content_hash, progress, profile=wants_profile(profile)
+            )
+    
+    async def stream():
+        task = asyncio.create_task(pipeline())
+        try:
+            yield sse_event("uploaded", {"filename": file.filename, "content_hash": content_hash})
+            while not task.done() or not events.empty():
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({next_event, task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event in done:
+                    yield sse_event(*next_event.result())
+                else:
+                    next_event.cancel()
+            yield sse_event("complete", task.result())
+        except QueueFullError as qe:
+            yield sse_event("error", {"status_code": 429, "detail": str(qe), "retry_after": qe.retry_after})
+        except Exception as e:
+            logger.error(f"❌ Error streaming invoice: {str(e)}", exc_info=True)
+            yield sse_event("error", {"status_code": 500, "detail": f"Error processing invoice: {str(e)}"})
+        finally:
+            # A client that disconnects does not cancel the run; clean up when it ends
+            def cleanup(finished: asyncio.Task):
+                remove_upload(temp_path)
+                if not finished.cancelled() and finished.exception() is not None:
+                    logger.error(f"❌ Streamed invoice {file.filename} failed after disconnect: {finished.exception()}")
+            if task.done():
+                remove_upload(temp_path)
+            else:
+                task.add_done_callback(cleanup)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/v1/invoices/batch")
 async def batch_process_invoices(
-    files: list[UploadFile] = File(...)
+    files: list[UploadFile] = File(...),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding")
 ):
     """
     Process multiple invoices in batch.
     
     Args:
         files: List of invoice PDF files
+        accept / accept_encoding: JSON (default), msgpack, NDJSON or Arrow IPC
+            (one row per file), optionally gzip/zstd
         
     Returns:
         Batch processing results
     """
     try:
         logger.info(f"📄 Batch processing {len(files)} invoices")
+        admission["batch"].check()
         
-        results = []
-        for file in files:
-            if not file.filename.endswith('.pdf'):
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "error": "Only PDF files are supported"
-                })
-                continue
-            
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "message": "Batch processing endpoint is working"
-            })
+        async with admission["batch"].slot():
+            results = await process_batch_files(files)
         
-        return {
+        return formatted_response({
             "status": "success",
             "total_files": len(files),
             "results": results
-        }
+        }, accept, accept_encoding, records_key="results")
         
+    except QueueFullError as qe:
+        raise queue_full_response(qe)
     except Exception as e:
         logger.error(f"❌ Error in batch processing: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -163,13 +617,71 @@ async def batch_process_invoices(
             detail=f"Error in batch processing: {str(e)}"
         )
 
+@app.get("/api/v1/invoices")
+async def query_invoices(
+    vendor_name: Optional[str] = None,
+    vendor_id: Optional[str] = None,
+    invoice_number: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    status: Optional[str] = None,
+    due_after: Optional[str] = None,
+    due_before: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    include_result: bool = False,
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding")
+):
+    """
+    Query processed invoices from the result store.
+    
+    Args:
+        vendor_name / vendor_id / invoice_number / content_hash / status: Exact-match filters
+        due_after / due_before: Inclusive due date range (YYYY-MM-DD)
+        limit / offset: Paging (limit capped at 1000)
+        include_result: Include the full stored result for each invoice
+        accept / accept_encoding: JSON (default), msgpack, NDJSON or Arrow IPC
+            (one row per invoice), optionally gzip/zstd
+        
+    Returns:
+        Matching invoices, newest first
+    """
+    try:
+        invoices = await run_in_threadpool(
+            invoice_store.query,
+            vendor_name=vendor_name,
+            vendor_id=vendor_id,
+            invoice_number=invoice_number,
+            content_hash=content_hash,
+            status=status,
+            due_after=due_after,
+            due_before=due_before,
+            limit=max(1, min(limit, 1000)),
+            offset=max(0, offset),
+            include_result=include_result
+        )
+        return formatted_response(
+            {"count": len(invoices), "invoices": invoices}, accept, accept_encoding, records_key="invoices"
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Error querying invoices: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error querying invoices: {str(e)}"
+        )
+
 @app.get("/api/v1/invoices/{invoice_id}/status")
-async def get_invoice_status(invoice_id: str):
+async def get_invoice_status(
+    invoice_id: str,
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding")
+):
     """
     Get processing status of an invoice.
     
     Args:
-        invoice_id: Unique invoice identifier
+        invoice_id: Job ID returned by the process endpoints, or a content hash
         
     Returns:
         Invoice processing status
@@ -177,14 +689,29 @@ async def get_invoice_status(invoice_id: str):
     try:
         logger.info(f"📊 Getting status for invoice: {invoice_id}")
         
-        # TODO: Implement actual status lookup
-        return {
+        job = await run_in_threadpool(job_store.get, invoice_id)
+        if job is not None:
+            return formatted_response({"invoice_id": invoice_id, **job}, accept, accept_encoding)
+        
+        # Invoices ingested outside the API (hot folder, backfill) only exist in the result store
+        record = await run_in_threadpool(invoice_store.find_by_hash, invoice_id)
+        if record is None and invoice_id.isdigit():
+            record = await run_in_threadpool(invoice_store.get, int(invoice_id))
+        if record is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Invoice not found: {invoice_id}"
+            )
+        
+        return formatted_response({
             "invoice_id": invoice_id,
-            "status": "completed",
-            "message": "Status endpoint is working",
-            "note": "Status lookup will be implemented here"
-        }
+            "status": "completed" if record["status"] == "success" else "failed",
+            "result": record["result"],
+            "created_at": record["created_at"]
+        }, accept, accept_encoding)
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"❌ Error getting status: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -192,6 +719,26 @@ async def get_invoice_status(invoice_id: str):
             detail=f"Error getting status: {str(e)}"
         )
 
+@app.get("/api/v1/invoices/{invoice_id}/profile")
+async def get_invoice_profile(invoice_id: int):
+    """
+    Get the profiling reports stored for an invoice.
+    
+    Args:
+        invoice_id: Result store ID of the invoice
+        
+    Returns:
+        Reports with self time per area (model call, regex, base64, Excel, ...),
+        top functions by cumulative time and peak traced memory
+    """
+    profiles = await run_in_threadpool(invoice_store.profiles, invoice_id)
+    if not profiles:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No profile for invoice: {invoice_id}"
+        )
+    return {"invoice_id": invoice_id, "profiles": profiles}
+
 # ============================================================================
 # STARTUP EVENT
 # ============================================================================
@@ -204,7 +751,11 @@ async def startup_event():
     logger.info("=" * 60)
     logger.info(f"   Environment: {os.getenv('ENVIRONMENT', 'development')}")
     logger.info(f"   Port: {os.getenv('API_PORT', '8080')}")
+    logger.info(f"   Worker PID: {os.getpid()}")
     logger.info("=" * 60)
+    
+    # Warm up in the background so /health answers while /ready says 503
+    app.state.warm_up_task = asyncio.create_task(run_warm_up())
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -212,21 +763,53 @@ async def shutdown_event():
     logger.info("=" * 60)
     logger.info("🛑 Invoice Processing Agent API Shutting Down...")
     logger.info("=" * 60)
+    
+    # Uvicorn has already waited up to timeout_graceful_shutdown for requests and
+    # cancelled the rest (their jobs are marked there). Anything left is a
+    # stream whose client disconnected; it dies with the worker.
+    if pending_job_writes:
+        await asyncio.wait(list(pending_job_writes), timeout=SHUTDOWN_DRAIN_SECONDS)
+    for job_id in list(in_flight_jobs):
+        await run_in_threadpool(
+            job_store.fail, job_id, "Worker shut down before the invoice finished", status="interrupted"
+        )
+    if in_flight_jobs:
+        logger.warning(f"⚠️ {len(in_flight_jobs)} invoice(s) interrupted at shutdown")
+    # Cached prompts are billed for storage until deleted; only loaded once a model was created
+    gemini_client = sys.modules.get("agents.gemini_client")
+    if gemini_client is not None:
+        gemini_client.delete_context_caches()
 
 # ============================================================================
 # MAIN ENTRY POINT
 # ============================================================================
 
+def server_options(environment: str) -> dict:
+    """uvicorn.run() arguments for an environment"""
+    options = {
+        "host": os.getenv("API_HOST", "0.0.0.0"),
+        "port": int(os.getenv("API_PORT", "8080")),
+        "log_level": "info",
+    }
+    if environment == "production":
+        # Multiple worker processes; shared state lives in the job store
+        options.update(
+            app="api.main:app",
+            workers=int(os.getenv("API_WORKERS", str(os.cpu_count() or 1))),
+            reload=False,
+            timeout_graceful_shutdown=int(SHUTDOWN_DRAIN_SECONDS)
+        )
+    else:
+        options.update(app="main:app", reload=True)
+    return options
+
 if __name__ == "__main__":
-    port = int(os.getenv("API_PORT", "8080"))
-    host = os.getenv("API_HOST", "0.0.0.0")
-    
-    logger.info(f"Starting server on {host}:{port}")
-    
-    uvicorn.run(
-        "main:app",
-        host=host,
-        port=port,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    environment = os.getenv("ENVIRONMENT", "development")
+    options = server_options(environment)
+    
+    if environment == "production":
+        logger.info(f"Starting production server on {options['host']}:{options['port']} with {options['workers']} workers")
+    else:
+        logger.info(f"Starting server on {options['host']}:{options['port']}")
+    
+    uvicorn.run(**options)
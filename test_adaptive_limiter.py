@@ -0,0 +1,73 @@
+"""Test the AIMD model-call concurrency limiter"""
+import threading
+from utils.adaptive_limiter import AdaptiveLimiter
+
+class ResourceExhausted(Exception):
+    """Stands in for the SDK's 429 error; overloads are matched by class name"""
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    # Calls here take microseconds, so keep latency jitter from trimming the limit
+    return AdaptiveLimiter("test", latency_tolerance=float("inf"), **kwargs)
+
+def _call(limiter: AdaptiveLimiter, error: Exception = None):
+    try:
+        with limiter.slot():
+            if error is not None:
+                raise error
+    except Exception as e:
+        assert e is error
+
+def test_additive_increase():
+    print("\n" + "="*60)
+    print("TEST 1: Saturated Successes Raise The Limit By 1/limit")
+    print("="*60)
+    limiter = _limiter(initial_limit=1, max_limit=3)
+    _call(limiter)
+    assert limiter.limit == 2.0
+    # One call at a time no longer fills the limit, so it stays put
+    _call(limiter)
+    assert limiter.limit == 2.0 and limiter.stats["increases"] == 1
+    print("✅ PASSED")
+
+def test_multiplicative_decrease():
+    print("\n" + "="*60)
+    print("TEST 2: Rate Limits Halve The Limit Once Per Round Trip")
+    print("="*60)
+    limiter = _limiter(initial_limit=16)
+    limiter.short_latency = 60.0
+    _call(limiter, ResourceExhausted("429"))
+    assert limiter.limit == 8.0
+    # Same burst: within one round-trip time of the last decrease
+    _call(limiter, ResourceExhausted("429"))
+    _call(limiter, TimeoutError())
+    assert limiter.limit == 8.0 and limiter.stats["overloads"] == 3 and limiter.stats["decreases"] == 1
+
+    limiter.short_latency = 0.0
+    _call(limiter, ResourceExhausted("429"))
+    assert limiter.limit == 4.0
+    # Other errors are not load signals
+    _call(limiter, ValueError("bad reply"))
+    assert limiter.limit == 4.0
+    print("✅ PASSED")
+
+def test_min_limit_clamped():
+    print("\n" + "="*60)
+    print("TEST 3: The Limit Never Drops Below One Slot")
+    print("="*60)
+    limiter = _limiter(initial_limit=2, min_limit=0)
+    assert limiter.min_limit == 1.0
+    for _ in range(5):
+        _call(limiter, ResourceExhausted("429"))
+    assert limiter.limit == 1.0
+
+    done = threading.Event()
+    worker = threading.Thread(target=lambda: (_call(limiter), done.set()), daemon=True)
+    worker.start()
+    worker.join(timeout=2)
+    assert done.is_set(), "call blocked with the limit at its minimum"
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_additive_increase()
+    test_multiplicative_decrease()
+    test_min_limit_clamped()
@@ -0,0 +1,106 @@
+"""Test admission control: bounded slots and queue, and the 429 before the upload is read"""
+import asyncio
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_TMP, "jobs.db"))
+os.environ.setdefault("INVOICE_DB_PATH", os.path.join(_TMP, "invoices.db"))
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+import api.main as api
+from utils.admission import AdmissionController, QueueFullError
+
+def test_slots_and_queue():
+    print("\n" + "="*60)
+    print("TEST 1: Requests Beyond The Slots And Queue Are Rejected At Once")
+    print("="*60)
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1)
+    release = None
+
+    async def hold():
+        async with controller.slot():
+            await release.wait()
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(hold())
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0.05)
+        assert controller.in_flight == 1 and controller.waiting == 1
+        try:
+            async with controller.slot():
+                assert False, "third request should be rejected"
+        except QueueFullError as qe:
+            assert qe.name == "test" and qe.retry_after >= 1
+        release.set()
+        await asyncio.gather(first, second)
+        # Capacity is back once the queue drains
+        controller.check()
+
+    asyncio.run(main())
+    snapshot = controller.snapshot()
+    assert snapshot["admitted"] == 2 and snapshot["rejected"] == 1
+    assert snapshot["in_flight"] == 0 and snapshot["queue_depth"] == 0
+    print("✅ PASSED")
+
+def test_rejected_before_upload():
+    print("\n" + "="*60)
+    print("TEST 2: A Full Queue Answers 429 Before The Upload Is Read")
+    print("="*60)
+    saved = []
+    save_upload = api.save_upload
+
+    async def recording_save_upload(file):
+        saved.append(file.filename)
+        return await save_upload(file)
+
+    client = TestClient(api.app)
+    controllers = api.admission
+    api.admission = {
+        "process": AdmissionController("process", max_concurrent=1, max_queue=0),
+        "batch": AdmissionController("batch", max_concurrent=1, max_queue=0),
+    }
+    api.save_upload = recording_save_upload
+    try:
+        # Fill both endpoints' only slot
+        for controller in api.admission.values():
+            controller.in_flight = 1
+        upload = {"file": ("a.pdf", b"%PDF-1.4 " + b"x" * 4096, "application/pdf")}
+        for path in ("/api/v1/invoices/process", "/api/v1/invoices/process/stream"):
+            response = client.post(path, files=upload)
+            assert response.status_code == 429, (path, response.status_code)
+            assert int(response.headers["Retry-After"]) >= 1
+            assert "process queue is full" in response.json()["detail"]
+        response = client.post("/api/v1/invoices/batch", files=[("files", upload["file"])])
+        assert response.status_code == 429
+        assert saved == []
+        assert api.admission["process"].rejected == 2 and api.admission["batch"].rejected == 1
+
+        # The middleware answers without reading the body or reaching the endpoint
+        received, called = [], []
+
+        async def receive():
+            received.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def call_next(request):
+            called.append(True)
+
+        scope = {"type": "http", "method": "POST", "path": "/api/v1/invoices/process", "headers": [],
+                 "query_string": b""}
+        response = asyncio.run(api.reject_when_full(Request(scope, receive), call_next))
+        assert response.status_code == 429 and received == [] and called == []
+
+        # Other routes are not gated
+        assert client.get("/health").status_code == 200
+    finally:
+        api.admission = controllers
+        api.save_upload = save_upload
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_slots_and_queue()
+    test_rejected_before_upload()
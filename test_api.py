@@ -0,0 +1,175 @@
+"""Test the API pipeline and endpoints in-process (stub orchestrator, temp stores)"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_TMP, "jobs.db"))
+os.environ.setdefault("INVOICE_DB_PATH", os.path.join(_TMP, "invoices.db"))
+
+import api.main as api
+from utils.invoice_store import InvoiceStore
+from utils.job_store import JobStore
+
+class StubOrchestrator:
+    """Returns a fixed extraction after an optional delay"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def process_invoice(self, invoice_path, vendor_name="Unknown", progress_callback=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return {"status": "success", "model_used": "test",
+                "result": {"invoice_number": "INV-1", "vendor_name": "Acme", "total_amount": 10.0}}
+
+def _fresh_state(orchestrator) -> str:
+    """Point the API at new stores and a stub orchestrator; returns a scratch directory"""
+    workdir = tempfile.mkdtemp()
+    api.job_store = JobStore(os.path.join(workdir, "jobs.db"))
+    api.invoice_store = InvoiceStore(os.path.join(workdir, "invoices.db"), journal_mode="DELETE")
+    api._orchestrator = orchestrator
+    return workdir
+
+def _upload(workdir: str, name: str = "a.pdf") -> str:
+    path = os.path.join(workdir, name)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4 test")
+    return path
+
+def test_cancelled_request_job():
+    print("\n" + "="*60)
+    print("TEST 1: A Cancelled Request's Job Gets The Shared Run's Result")
+    print("="*60)
+    workdir = _fresh_state(StubOrchestrator(delay=0.3))
+    path = _upload(workdir)
+
+    async def main():
+        leader = asyncio.create_task(api.run_invoice_pipeline(path, "a.pdf", None, "hash-1"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(api.run_invoice_pipeline(path, "a.pdf", None, "hash-1"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        try:
+            await leader
+            assert False, "leader should be cancelled"
+        except asyncio.CancelledError:
+            pass
+        return await follower
+
+    response = asyncio.run(main())
+    assert response["coalesced"] and response["invoice_id"]
+    deadline = time.monotonic() + 5
+    while True:
+        jobs = [api.job_store.get(job_id) for job_id in _job_ids()]
+        if all(job["status"] != "processing" for job in jobs) or time.monotonic() > deadline:
+            break
+        time.sleep(0.02)
+    assert [job["status"] for job in jobs] == ["completed", "completed"]
+    assert {job["result"]["invoice_id"] for job in jobs} == {response["invoice_id"]}
+    assert not api.in_flight_jobs
+    print("✅ PASSED")
+
+def test_shutdown_drains_job_writes():
+    print("\n" + "="*60)
+    print("TEST 2: Cancellation Writes Run Off The Event Loop And Drain At Shutdown")
+    print("="*60)
+    _fresh_state(StubOrchestrator())
+    api.job_store.create("cancelled", "a.pdf", "hash-2")
+    api.job_store.create("left-over", "b.pdf", "hash-3")
+
+    def slow_fail(job_id, error, status="failed"):
+        time.sleep(0.3)
+        api.job_store.fail(job_id, error, status=status)
+
+    async def main():
+        started = time.monotonic()
+        api.write_job_later(slow_fail, "cancelled", "Request was cancelled", status="interrupted")
+        assert time.monotonic() - started < 0.1 and len(api.pending_job_writes) == 1
+        api.in_flight_jobs.add("left-over")
+        await api.shutdown_event()
+        api.in_flight_jobs.discard("left-over")
+
+    asyncio.run(main())
+    assert not api.pending_job_writes
+    assert api.job_store.get("cancelled")["status"] == "interrupted"
+    assert api.job_store.get("left-over")["status"] == "interrupted"
+    print("✅ PASSED")
+
+def test_production_entrypoint():
+    print("\n" + "="*60)
+    print("TEST 3: Production Runs The Importable App With Several Workers")
+    print("="*60)
+    from uvicorn.importer import import_from_string
+    os.environ["API_WORKERS"] = "3"
+    try:
+        options = api.server_options("production")
+    finally:
+        del os.environ["API_WORKERS"]
+    assert import_from_string(options["app"]) is api.app
+    assert options["workers"] == 3 and options["reload"] is False
+    assert options["timeout_graceful_shutdown"] == int(api.SHUTDOWN_DRAIN_SECONDS)
+    assert api.server_options("development")["reload"] is True
+    print("✅ PASSED")
+
+def test_ready_after_warm_up():
+    print("\n" + "="*60)
+    print("TEST 4: /ready Answers 503 Until Warm-Up Finishes")
+    print("="*60)
+    from fastapi.testclient import TestClient
+    _fresh_state(StubOrchestrator())
+    client = TestClient(api.app)
+    warm_up, ping = api.warm_up, api.WARMUP_MODEL_PING
+    release = threading.Event()
+
+    def blocking_warm_up():
+        release.wait(5)
+        return warm_up()
+
+    api.readiness.update(ready=False, error=None, steps={})
+    api.warm_up, api.WARMUP_MODEL_PING = blocking_warm_up, False
+    try:
+        warming = threading.Thread(target=lambda: asyncio.run(api.run_warm_up()))
+        warming.start()
+        response = client.get("/ready")
+        assert response.status_code == 503 and response.json()["status"] == "warming_up"
+        health = client.get("/health")
+        assert health.status_code == 200 and health.json()["ready"] is False
+
+        release.set()
+        warming.join()
+        response = client.get("/ready")
+        assert response.status_code == 200 and response.json()["status"] == "ready"
+        steps = response.json()["steps"]
+        assert set(steps) == {"orchestrator", "stores", "local_paths"}
+        assert all(step["ok"] for step in steps.values()), steps
+
+        # A fatal step keeps the worker out of rotation
+        def failing_warm_up():
+            raise RuntimeError("no API key")
+
+        api.readiness.update(ready=False, error=None, steps={})
+        api.warm_up = failing_warm_up
+        asyncio.run(api.run_warm_up())
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "failed" and response.json()["error"] == "no API key"
+    finally:
+        api.warm_up, api.WARMUP_MODEL_PING = warm_up, ping
+        api.readiness.update(ready=False, error=None, steps={})
+    print("✅ PASSED")
+
+def _job_ids() -> list:
+    with api.job_store._connect() as conn:
+        return [row["job_id"] for row in conn.execute("SELECT job_id FROM jobs ORDER BY created_at, rowid")]
+
+if __name__ == "__main__":
+    test_cancelled_request_job()
+    test_shutdown_drains_job_writes()
+    test_production_entrypoint()
+    test_ready_after_warm_up()
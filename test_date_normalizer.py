@@ -0,0 +1,67 @@
+"""Test date format inference and payment-terms arithmetic"""
+import math
+import pandas as pd
+from utils.date_normalizer import DateNormalizer, parse_payment_terms, invoice_payment_schedule
+
+def test_vendor_format_inference():
+    print("\n" + "="*60)
+    print("TEST 1: Day-First vs Month-First Per Vendor")
+    print("="*60)
+    normalizer = DateNormalizer()
+    values = ["13/02/2025", "03/04/2025", "02/13/2025", "03/04/2025", None]
+    vendors = ["eu", "eu", "us", "us", "us"]
+    parsed = normalizer.parse_column(values, vendors)
+    assert parsed[0] == pd.Timestamp("2025-02-13")
+    assert parsed[1] == pd.Timestamp("2025-04-03")
+    assert parsed[2] == pd.Timestamp("2025-02-13")
+    assert parsed[3] == pd.Timestamp("2025-03-04")
+    assert pd.isna(parsed[4])
+
+    # The learned format is reused for a lone ambiguous value
+    assert normalizer.normalize("05/06/2025", "eu") == "2025-06-05"
+    assert normalizer.normalize("05/06/2025", "us") == "2025-05-06"
+    assert normalizer.normalize("March 3rd, 2025") == "2025-03-03"
+    assert normalizer.normalize("not a date") is None
+    print("✅ PASSED")
+
+def test_payment_terms():
+    print("\n" + "="*60)
+    print("TEST 2: Payment Terms")
+    print("="*60)
+    assert parse_payment_terms("2/10 Net 30") == (2.0, 10.0, 30.0)
+    assert parse_payment_terms("2/10 n/30") == (2.0, 10.0, 30.0)
+    discount_pct, discount_days, net_days = parse_payment_terms("Net30")
+    assert discount_pct == 0.0 and math.isnan(discount_days) and net_days == 30.0
+    assert parse_payment_terms("Due on receipt")[2] == 0.0
+    # Numbers that are not terms
+    assert parse_payment_terms("Returns accepted within 14 days; Net 45")[2] == 45.0
+    assert all(math.isnan(part) for part in parse_payment_terms("Payment in 45 days"))
+    assert all(math.isnan(part) for part in parse_payment_terms("Remit to account 12345"))
+    print("✅ PASSED")
+
+def test_invoice_schedule():
+    print("\n" + "="*60)
+    print("TEST 3: Discount Deadline And Due Date")
+    print("="*60)
+    schedule = invoice_payment_schedule({
+        "invoice_date": "2025-01-01", "due_date": None,
+        "payment_terms": "2/10 Net 30", "total_amount": 1000.0,
+    })
+    assert schedule["due_date"] == "2025-01-31"
+    assert schedule["discount_deadline"] == "2025-01-11"
+    assert schedule["discount_amount"] == 20.0
+    assert schedule["annualized_return"] > 0.3
+
+    # A stated due date wins over the terms
+    schedule = invoice_payment_schedule({
+        "invoice_date": "2025-01-01", "due_date": "2025-02-15",
+        "payment_terms": "Net 30", "total_amount": 1000.0,
+    })
+    assert schedule["due_date"] == "2025-02-15"
+    assert schedule["discount_deadline"] is None
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_vendor_format_inference()
+    test_payment_terms()
+    test_invoice_schedule()
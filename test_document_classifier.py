@@ -0,0 +1,63 @@
+"""Test local document classification on the sample invoices"""
+import os
+import PyPDF2
+import utils.document_classifier as document_classifier
+from utils.document_classifier import classify_document, TEXT_PDF, SCANNED_PDF, HANDWRITTEN
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "sample_invoices")
+
+def test_sample_documents():
+    print("\n" + "="*60)
+    print("TEST 1: Sample PDF Is Text, Sample Photo Is Handwritten")
+    print("="*60)
+    pdf = classify_document(os.path.join(SAMPLES, "sample-invoice.pdf"))
+    assert pdf["document_type"] == TEXT_PDF and pdf["mime_type"] == "application/pdf"
+    assert pdf["features"]["text_chars"] >= document_classifier.MIN_TEXT_CHARS
+    assert len(pdf["text"]) <= document_classifier.TEXT_LAYER_MAX_CHARS
+
+    photo = classify_document(os.path.join(SAMPLES, "handwritten_test.jpg"))
+    assert photo["document_type"] == HANDWRITTEN and photo["mime_type"] == "image/jpeg"
+    assert "text" not in photo
+    print(f"✅ Handwriting features: {photo['features']}")
+    print("✅ PASSED")
+
+def test_text_layer_cap():
+    print("\n" + "="*60)
+    print("TEST 2: Oversized Text Layers Fall Back To Sending The Document")
+    print("="*60)
+    limit = document_classifier.TEXT_LAYER_MAX_CHARS
+    document_classifier.TEXT_LAYER_MAX_CHARS = 500
+    try:
+        pdf = classify_document(os.path.join(SAMPLES, "sample-invoice.pdf"))
+    finally:
+        document_classifier.TEXT_LAYER_MAX_CHARS = limit
+    assert pdf["document_type"] == SCANNED_PDF and "text" not in pdf
+    assert pdf["features"]["text_layer_too_long"]
+    print("✅ PASSED")
+
+def test_single_reader():
+    print("\n" + "="*60)
+    print("TEST 3: A PDF Is Parsed Once, Straight From The File")
+    print("="*60)
+    opened = []
+
+    class CountingReader(PyPDF2.PdfReader):
+        def __init__(self, stream, *args, **kwargs):
+            opened.append(stream)
+            super().__init__(stream, *args, **kwargs)
+
+    reader = PyPDF2.PdfReader
+    PyPDF2.PdfReader = CountingReader
+    try:
+        pdf = classify_document(os.path.join(SAMPLES, "sample-invoice.pdf"))
+    finally:
+        PyPDF2.PdfReader = reader
+    assert pdf["document_type"] == TEXT_PDF
+    # A path would make PdfReader copy the whole file into memory
+    assert len(opened) == 1 and not isinstance(opened[0], str)
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_sample_documents()
+    test_text_layer_cap()
+    test_single_reader()
@@ -0,0 +1,101 @@
+"""Test FX rate lookups and base-currency conversion"""
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.fx_rates import FxRateTable, normalize_currency
+from utils.vendor_master import VendorMaster
+from agents.exception_handler import ExceptionHandlerAgent
+from agents.routing_agent import route_by_amount
+
+RATES = """date,currency,rate
+2025-01-01,EUR,1.10
+2025-02-01,EUR,1.20
+2025-01-01,JPY,0.0070
+2025-03-01,jpy,0.0065
+"""
+
+def _table() -> FxRateTable:
+    path = os.path.join(tempfile.mkdtemp(), "fx_rates.csv")
+    with open(path, "w") as f:
+        f.write(RATES)
+    return FxRateTable(path, base_currency="USD")
+
+def test_convert():
+    print("\n" + "="*60)
+    print("TEST 1: Single Conversions Use The Rate On Or Before The Date")
+    print("="*60)
+    table = _table()
+    assert normalize_currency("€") == "EUR" and normalize_currency("dollars") is None
+    assert table.currencies() == ["EUR", "JPY", "USD"]
+    assert table.convert(100, "USD") == 100.0
+    assert table.convert(100, "EUR", "2025-01-31") == 110.0
+    assert table.convert(100, "EUR", "2025-02-01") == 120.0
+    # Undated: latest rate; before the table: earliest rate
+    assert table.convert(100, "€", None) == 120.0
+    assert table.convert(100, "EUR", "2024-06-01") == 110.0
+    assert table.convert(100000, "JPY", "2025-03-15") == 650.0
+    print("✅ PASSED")
+
+def test_convert_frame():
+    print("\n" + "="*60)
+    print("TEST 2: Column Conversion Matches Single Conversions")
+    print("="*60)
+    table = _table()
+    frame = pd.DataFrame({
+        "total_amount": [100, "100", 100000, 50, None, 100],
+        "currency": ["EUR", "eur", "JPY", "USD", "EUR", "XYZ"],
+        "invoice_date": ["2025-02-10", "2024-12-01", "2025-02-28", "2025-01-01", "2025-01-01", "2025-01-01"],
+    }, index=[10, 11, 12, 13, 14, 15])
+    converted = table.convert_frame(frame)
+    assert list(converted.index) == [10, 11, 12, 13, 14, 15]
+    assert converted.name == "amount_usd"
+    assert converted.iloc[:4].tolist() == [120.0, 110.0, 700.0, 50.0]
+    assert np.isnan(converted.loc[14]) and np.isnan(converted.loc[15])
+    for i in range(4):
+        row = frame.iloc[i]
+        assert table.convert(row["total_amount"], row["currency"], row["invoice_date"]) == converted.iloc[i]
+    print("✅ PASSED")
+
+def test_date_parsing_agrees():
+    print("\n" + "="*60)
+    print("TEST 3: Single And Column Lookups Parse Dates The Same Way")
+    print("="*60)
+    table = _table()
+    # Non-ISO dates are undated in both paths (latest rate), offsets go to UTC
+    dates = ["01/02/2025", "Feb 3 2025", "2025-02-01T02:00:00+05:00", "2025-02-01T10:00:00-05:00",
+             "2025-01-15", "not a date"]
+    frame = pd.DataFrame({"total_amount": [100] * len(dates), "currency": ["EUR"] * len(dates),
+                          "invoice_date": dates})
+    converted = table.convert_frame(frame)
+    single = [table.convert(100, "EUR", date) for date in dates]
+    assert converted.tolist() == single
+    assert single == [120.0, 120.0, 110.0, 120.0, 110.0, 120.0]
+    print("✅ PASSED")
+
+def test_missing_rate():
+    print("\n" + "="*60)
+    print("TEST 4: Unconvertible Amounts Go To Manual Review In Every Stage")
+    print("="*60)
+    table = FxRateTable(os.path.join(tempfile.mkdtemp(), "missing.csv"), base_currency="USD")
+    assert table.convert(100, "EUR") is None
+    assert table.convert(100, "USD") == 100.0
+    assert table.convert_frame(pd.DataFrame({"total_amount": [1], "currency": ["EUR"]})).isna().all()
+
+    # XYZ has no rate in any table: routing and exception handling must agree
+    invoice = {"invoice_number": "INV-1", "invoice_date": "2025-01-01", "due_date": "2025-01-31",
+               "vendor_name": "Acme", "total_amount": 100000, "currency": "XYZ"}
+    assert route_by_amount(invoice)["routing_decision"] == "MANUAL_REVIEW"
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = ExceptionHandlerAgent(VendorMaster(os.path.join(tmp, "vendors.json")))
+        issues = [issue["type"] for issue in handler.detect_issues(invoice)]
+        assert "FX_UNAVAILABLE" in issues and "HIGH_AMOUNT" not in issues
+        resolved, ambiguous = handler.classify_locally(invoice, [{"type": "FX_UNAVAILABLE"}])
+        assert not ambiguous and resolved[0]["assigned_to"] == "AP_CLERK"
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_convert()
+    test_convert_frame()
+    test_date_parsing_agrees()
+    test_missing_rate()
@@ -0,0 +1,102 @@
+"""Test context-cache lifetime handling (the Gemini SDK is replaced by stand-ins)"""
+from google.generativeai import caching
+import agents.gemini_client as gemini_client
+from agents.gemini_client import ContextCachedModel, create_model, delete_context_caches
+
+class NotFound(Exception):
+    """Stands in for the SDK's 404; matched by class name"""
+
+class FakeCache:
+    created = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.updates = []
+        self.deleted = False
+        self.expired = False
+
+    @classmethod
+    def create(cls, **kwargs):
+        cache = cls(**kwargs)
+        cls.created.append(cache)
+        return cache
+
+    def update(self, ttl=None):
+        if self.expired:
+            raise NotFound("cached content not found")
+        self.updates.append(ttl)
+
+    def delete(self):
+        self.deleted = True
+
+class FakeModel:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def generate_content(self, contents, **kwargs):
+        if self.cache.expired:
+            raise NotFound("cached content not found")
+        return f"reply via cache {FakeCache.created.index(self.cache)}"
+
+def _patched(test):
+    def run():
+        FakeCache.created = []
+        saved = (caching.CachedContent, gemini_client.genai.GenerativeModel.__dict__["from_cached_content"],
+                 gemini_client.CONTEXT_CACHE_ENABLED)
+        caching.CachedContent = FakeCache
+        gemini_client.genai.GenerativeModel.from_cached_content = staticmethod(lambda cached_content: FakeModel(cached_content))
+        gemini_client.CONTEXT_CACHE_ENABLED = True
+        try:
+            test()
+        finally:
+            (caching.CachedContent, gemini_client.genai.GenerativeModel.from_cached_content,
+             gemini_client.CONTEXT_CACHE_ENABLED) = saved
+            delete_context_caches()
+    run.__name__ = test.__name__
+    return run
+
+@_patched
+def test_refresh_before_expiry():
+    print("\n" + "="*60)
+    print("TEST 1: The Cache TTL Is Extended Before It Runs Out")
+    print("="*60)
+    model = create_model("gemini-test-001", "system instruction")
+    assert isinstance(model, ContextCachedModel)
+    assert model.generate_content("hi") == "reply via cache 0"
+    assert FakeCache.created[0].updates == []
+
+    model._refresh_at = 0.0
+    assert model.generate_content("hi") == "reply via cache 0"
+    assert FakeCache.created[0].updates == [model.ttl] and len(FakeCache.created) == 1
+    print("✅ PASSED")
+
+@_patched
+def test_recreate_expired():
+    print("\n" + "="*60)
+    print("TEST 2: An Expired Cache Is Recreated")
+    print("="*60)
+    model = create_model("gemini-test-001", "system instruction")
+    # Refresh finds the cache gone
+    FakeCache.created[0].expired = True
+    model._refresh_at = 0.0
+    assert model.generate_content("hi") == "reply via cache 1"
+    # The call itself finds the cache gone: recreated and retried once
+    FakeCache.created[1].expired = True
+    assert model.generate_content("hi") == "reply via cache 2"
+    print("✅ PASSED")
+
+@_patched
+def test_delete_at_shutdown():
+    print("\n" + "="*60)
+    print("TEST 3: Caches Are Deleted At Shutdown")
+    print("="*60)
+    create_model("gemini-test-001", "capture instruction")
+    create_model("gemini-test-001", "routing instruction")
+    delete_context_caches()
+    assert [cache.deleted for cache in FakeCache.created] == [True, True]
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_refresh_before_expiry()
+    test_recreate_expired()
+    test_delete_at_shutdown()
@@ -0,0 +1,171 @@
+"""Test the hot-folder watcher (stub orchestrator and exporter; polling mode)"""
+import os
+import tempfile
+import threading
+import time
+import utils.excel_exporter as excel_exporter
+import utils.hot_folder as hot_folder
+from utils.hot_folder import HotFolderWatcher
+from utils.invoice_store import InvoiceStore
+
+class StubOrchestrator:
+    """Succeeds unless the file name is listed in fail; remembers every call"""
+
+    def __init__(self, fail=(), delay: float = 0.0):
+        self.fail = set(fail)
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def process_invoice(self, invoice_path):
+        name = os.path.basename(invoice_path)
+        with self._lock:
+            self.calls.append(name)
+        time.sleep(self.delay)
+        if name in self.fail:
+            return {"status": "error", "invoice_path": invoice_path, "error": "model unavailable"}
+        return {"status": "success", "invoice_path": invoice_path, "model_used": "test",
+                "result": {"invoice_number": name, "vendor_name": "Acme", "total_amount": 10.0}}
+
+def _drop(folder: str, name: str, content: bytes) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def _watcher(folder: str, orchestrator, **kwargs) -> HotFolderWatcher:
+    kwargs.setdefault("settle_seconds", 0.0)
+    watcher = HotFolderWatcher(
+        folder, orchestrator=orchestrator, excel_file=os.path.join(folder, "out.xlsx"),
+        use_inotify=False, invoice_store=InvoiceStore(os.path.join(folder, "invoices.db")), **kwargs
+    )
+    watcher.start()
+    return watcher
+
+def _wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+def test_settle():
+    print("\n" + "="*60)
+    print("TEST 1: Files Still Being Written Are Picked Up Once Settled")
+    print("="*60)
+    folder = tempfile.mkdtemp()
+    orchestrator = StubOrchestrator()
+    watcher = _watcher(folder, orchestrator, settle_seconds=0.5)
+    try:
+        path = _drop(folder, "fresh.pdf", b"%PDF-1.4 fresh")
+        assert not watcher.submit(path)
+        assert orchestrator.calls == []
+        _wait_for(lambda: watcher.stats["processed"] == 1)
+        assert orchestrator.calls == ["fresh.pdf"]
+    finally:
+        watcher.stop()
+    print("✅ PASSED")
+
+def test_dedupe():
+    print("\n" + "="*60)
+    print("TEST 2: Same Content Is Processed Once, Even When Both Copies Arrive Together")
+    print("="*60)
+    folder = tempfile.mkdtemp()
+    orchestrator = StubOrchestrator(delay=0.3)
+    watcher = _watcher(folder, orchestrator, max_workers=2)
+    try:
+        _drop(folder, "a.pdf", b"%PDF-1.4 same")
+        _drop(folder, "b.pdf", b"%PDF-1.4 same")
+        assert watcher.scan() == 2
+        _wait_for(lambda: watcher.stats["processed"] + watcher.stats["skipped"] == 2)
+        assert len(orchestrator.calls) == 1 and watcher.stats["skipped"] == 1
+        # Both files are recorded, so a rescan queues nothing
+        assert watcher.scan() == 0
+    finally:
+        watcher.stop()
+    print("✅ PASSED")
+
+def test_duplicate_of_failed_copy():
+    print("\n" + "="*60)
+    print("TEST 3: A Duplicate Waiting On A Failed Copy Is Processed Itself")
+    print("="*60)
+    folder = tempfile.mkdtemp()
+    orchestrator = StubOrchestrator(fail={"a.pdf"}, delay=0.3)
+    watcher = _watcher(folder, orchestrator, max_workers=2)
+    try:
+        _drop(folder, "a.pdf", b"%PDF-1.4 same")
+        watcher.submit(os.path.join(folder, "a.pdf"))
+        time.sleep(0.1)
+        _drop(folder, "b.pdf", b"%PDF-1.4 same")
+        watcher.submit(os.path.join(folder, "b.pdf"))
+        _wait_for(lambda: watcher.stats["processed"] == 1)
+        assert sorted(orchestrator.calls) == ["a.pdf", "b.pdf"]
+    finally:
+        watcher.stop()
+    print("✅ PASSED")
+
+def test_failure_backoff():
+    print("\n" + "="*60)
+    print("TEST 4: Failures Retry With Backoff Up To MAX_ATTEMPTS")
+    print("="*60)
+    folder = tempfile.mkdtemp()
+    backoff, attempts = hot_folder.RETRY_BACKOFF_SECONDS, hot_folder.MAX_ATTEMPTS
+    hot_folder.RETRY_BACKOFF_SECONDS, hot_folder.MAX_ATTEMPTS = 0.1, 3
+    orchestrator = StubOrchestrator(fail={"bad.pdf"})
+    watcher = _watcher(folder, orchestrator)
+    try:
+        path = _drop(folder, "bad.pdf", b"%PDF-1.4 bad")
+        assert watcher.submit(path)
+        _wait_for(lambda: watcher.stats["failed"] == 1)
+        # Waiting out the backoff
+        assert not watcher.submit(path)
+        _wait_for(lambda: watcher.stats["failed"] == 3)
+        time.sleep(0.6)
+        assert len(orchestrator.calls) == 3 and watcher.scan() == 0
+
+        # A rewritten file starts over
+        _drop(folder, "bad.pdf", b"%PDF-1.4 fixed")
+        os.utime(path, (time.time() - 5, time.time() - 5))
+        orchestrator.fail.clear()
+        assert watcher.submit(path)
+        _wait_for(lambda: watcher.stats["processed"] == 1)
+    finally:
+        watcher.stop()
+        hot_folder.RETRY_BACKOFF_SECONDS, hot_folder.MAX_ATTEMPTS = backoff, attempts
+    print("✅ PASSED")
+
+def test_export_exception():
+    print("\n" + "="*60)
+    print("TEST 5: An Exception While Exporting Counts As A Failed Attempt")
+    print("="*60)
+    folder = tempfile.mkdtemp()
+    backoff = hot_folder.RETRY_BACKOFF_SECONDS
+    hot_folder.RETRY_BACKOFF_SECONDS = 0.1
+    export_to_excel = excel_exporter.export_to_excel
+    exports = []
+
+    def locked_once(result, filename):
+        exports.append(result["invoice_path"])
+        if len(exports) == 1:
+            raise PermissionError("workbook is locked")
+        return filename
+
+    excel_exporter.export_to_excel = locked_once
+    watcher = _watcher(folder, StubOrchestrator())
+    try:
+        path = _drop(folder, "locked.pdf", b"%PDF-1.4 locked")
+        assert watcher.submit(path)
+        _wait_for(lambda: watcher.stats["processed"] == 1)
+        assert watcher.stats["failed"] == 1 and len(exports) == 2
+        assert path in watcher._seen and path not in watcher._failures
+    finally:
+        watcher.stop()
+        excel_exporter.export_to_excel = export_to_excel
+        hot_folder.RETRY_BACKOFF_SECONDS = backoff
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_settle()
+    test_dedupe()
+    test_duplicate_of_failed_copy()
+    test_failure_backoff()
+    test_export_exception()
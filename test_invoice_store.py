@@ -0,0 +1,82 @@
+"""Test the invoice result store: duplicate detection and query filters"""
+import os
+import tempfile
+from utils.invoice_store import InvoiceStore
+
+def _store() -> InvoiceStore:
+    return InvoiceStore(os.path.join(tempfile.mkdtemp(), "invoices.db"), journal_mode="DELETE")
+
+def _result(content_hash, invoice_number, vendor_name="Acme", due_date="2025-02-01", status="success", **extra):
+    return {
+        "status": status,
+        "content_hash": content_hash,
+        "invoice_path": f"/in/{content_hash}.pdf",
+        "model_used": "test",
+        "result": {"invoice_number": invoice_number, "vendor_name": vendor_name, "due_date": due_date,
+                   "total_amount": "110.50", "currency": "USD",
+                   "line_items": [{"description": "Widget", "quantity": "2", "unit_price": 55.25, "line_total": 110.5}]},
+        **extra,
+    }
+
+def test_duplicates():
+    print("\n" + "="*60)
+    print("TEST 1: Same Content Or Same Vendor + Number Is Flagged")
+    print("="*60)
+    store = _store()
+    first = store.save_result(_result("h1", "INV-1"))
+    assert first["duplicates"] == []
+
+    # Same file again
+    assert store.save_result(_result("h1", "INV-9"))["duplicates"] == [first["invoice_id"]]
+    # Different file, same vendor (any case) and invoice number
+    assert store.save_result(_result("h2", "INV-1", vendor_name="ACME"))["duplicates"] == [first["invoice_id"]]
+    # Same number from another vendor is not a duplicate
+    assert store.save_result(_result("h3", "INV-1", vendor_name="Globex"))["duplicates"] == []
+    # A resolved vendor ID takes precedence over the name
+    with_id = store.save_result(_result("h4", "INV-2", vendor_id="V000001"))
+    assert with_id["duplicates"] == []
+    assert store.save_result(_result("h5", "INV-2", vendor_name="Acme Corp", vendor_id="V000001"))["duplicates"] == [
+        with_id["invoice_id"]]
+    # A failed run does not count as an earlier copy
+    store.save_result(_result("h6", "INV-3", status="error"))
+    assert store.save_result(_result("h6", "INV-3"))["duplicates"] == []
+    print("✅ PASSED")
+
+def test_query_filters():
+    print("\n" + "="*60)
+    print("TEST 2: Queries Filter On Indexed Columns")
+    print("="*60)
+    store = _store()
+    ids = [
+        store.save_result(_result("h1", "INV-1", due_date="2025-01-15"))["invoice_id"],
+        store.save_result(_result("h2", "INV-2", due_date="2025-02-15"))["invoice_id"],
+        store.save_result(_result("h3", "INV-3", vendor_name="Globex", due_date="2025-03-15"))["invoice_id"],
+        store.save_result(_result("h4", "INV-4", due_date=None, status="error"))["invoice_id"],
+    ]
+
+    def found(**filters):
+        return [record["id"] for record in store.query(**filters)]
+
+    assert found() == ids[::-1]
+    assert found(vendor_name="acme") == [ids[3], ids[1], ids[0]]
+    assert found(invoice_number="INV-2") == [ids[1]]
+    assert found(content_hash="h3") == [ids[2]]
+    assert found(status="error") == [ids[3]]
+    assert found(due_after="2025-02-01") == [ids[2], ids[1]]
+    assert found(due_before="2025-02-15") == [ids[1], ids[0]]
+    assert found(vendor_name="Acme", due_after="2025-02-01", due_before="2025-12-31") == [ids[1]]
+    assert found(limit=2) == [ids[3], ids[2]] and found(limit=2, offset=2) == [ids[1], ids[0]]
+
+    # Results are left out unless asked for
+    summary = store.query(invoice_number="INV-1")[0]
+    assert "result" not in summary and summary["total_amount"] == 110.5
+    full = store.query(invoice_number="INV-1", include_result=True)[0]
+    assert full["result"]["result"]["invoice_number"] == "INV-1"
+    assert store.find_by_hash("h2")["id"] == ids[1] and store.find_by_hash("missing") is None
+    assert store.line_items(ids[0]) == [
+        {"line_no": 1, "description": "Widget", "quantity": 2.0, "unit_price": 55.25, "line_total": 110.5}]
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_duplicates()
+    test_query_filters()
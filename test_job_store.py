@@ -0,0 +1,47 @@
+"""Test the SQLite job store shared by API workers"""
+import os
+import tempfile
+from utils.job_store import JobStore
+
+def _store() -> JobStore:
+    return JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+
+def test_lifecycle():
+    print("\n" + "="*60)
+    print("TEST 1: Jobs Move From Processing To Completed, Failed Or Interrupted")
+    print("="*60)
+    store = _store()
+    store.create("job-1", "a.pdf", "hash-a")
+    job = store.get("job-1")
+    assert job["status"] == "processing" and job["worker_pid"] == os.getpid() and job["result"] is None
+
+    store.complete("job-1", {"status": "success", "invoice_id": 7})
+    job = store.get("job-1")
+    assert job["status"] == "completed" and job["result"]["invoice_id"] == 7
+
+    store.create("job-2", "b.pdf", "hash-b")
+    store.complete("job-2", {"status": "error", "error": "capture failed"})
+    assert store.get("job-2")["status"] == "failed" and store.get("job-2")["error"] == "capture failed"
+
+    store.create("job-3", "c.pdf", "hash-c")
+    store.fail("job-3", "Request was cancelled", status="interrupted")
+    assert store.get("job-3")["status"] == "interrupted"
+    assert store.get("missing") is None
+    print("✅ PASSED")
+
+def test_shared_between_workers():
+    print("\n" + "="*60)
+    print("TEST 2: Other Workers See Updates And Can Look Up By Content Hash")
+    print("="*60)
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    writer, reader = JobStore(path), JobStore(path)
+    writer.create("job-1", "a.pdf", "hash-a")
+    assert reader.get("job-1")["status"] == "processing"
+    writer.complete("job-1", {"status": "success"})
+    assert reader.get("hash-a")["job_id"] == "job-1"
+    assert reader.get("hash-a")["status"] == "completed"
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_lifecycle()
+    test_shared_between_workers()
@@ -0,0 +1,45 @@
+"""Test line-item reconciliation"""
+import time
+from utils.line_items import reconcile_invoice, reconcile_results
+
+def test_single_invoice():
+    print("\n" + "="*60)
+    print("TEST 1: Single Invoice Reconciliation")
+    print("="*60)
+    invoice = {
+        "total_amount": 118.0,
+        "tax_amount": 18.0,
+        "line_items": [
+            {"description": "Widgets", "quantity": 4, "unit_price": 20.0, "line_total": 80.0},
+            {"description": "Freight", "quantity": None, "unit_price": None, "line_total": 20.0},
+        ],
+    }
+    assert reconcile_invoice(invoice)["status"] == "match"
+
+    invoice["total_amount"] = 150.0
+    report = reconcile_invoice(invoice)
+    assert report["status"] == "mismatch"
+    assert report["difference"] == 32.0
+
+    assert reconcile_invoice({"total_amount": 10.0, "line_items": []})["status"] == "no_line_items"
+    print("✅ PASSED")
+
+def test_batch_speed():
+    print("\n" + "="*60)
+    print("TEST 2: Batch Reconciliation (10k invoices x 50 lines)")
+    print("="*60)
+    lines = [{"quantity": 2, "unit_price": 5.0, "line_total": 10.0} for _ in range(50)]
+    results = [
+        {"invoice_path": f"inv-{i}.pdf", "result": {"total_amount": 500.0 + (i % 100 == 0), "tax_amount": 0, "line_items": lines}}
+        for i in range(10000)
+    ]
+    start = time.perf_counter()
+    report = reconcile_results(results)
+    elapsed = time.perf_counter() - start
+    assert (report["status"] == "mismatch").sum() == 100
+    print(f"✅ Reconciled {len(report)} invoices in {elapsed:.2f}s")
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_single_invoice()
+    test_batch_speed()
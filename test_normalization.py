@@ -0,0 +1,49 @@
+"""Test shared normalization of extracted values"""
+import pandas as pd
+from utils.normalization import parse_amount, normalize_record, normalize_column
+
+def test_amounts():
+    print("\n" + "="*60)
+    print("TEST 1: Typed Amounts")
+    print("="*60)
+    assert parse_amount("$1,234.56") == 1234.56
+    assert parse_amount("1.234,56 EUR") == 1234.56
+    assert parse_amount("(500.00)") == -500.0
+    assert parse_amount("0.00") == 0.0
+    assert parse_amount(0) == 0.0
+    assert parse_amount("Not Found") is None
+    # Credit notes keep their sign wherever it sits relative to the currency
+    assert parse_amount("-$1,234.56") == -1234.56
+    assert parse_amount("$-1,234.56") == -1234.56
+    assert parse_amount("($1,234.56)") == -1234.56
+    assert parse_amount("USD -1.234,56") == -1234.56
+    assert parse_amount("Total (USD) 500") == 500.0
+    assert parse_amount("1e3") == 1000.0
+    assert parse_amount("1.5E-2") == 0.015
+    print("✅ PASSED")
+
+def test_placeholders():
+    print("\n" + "="*60)
+    print("TEST 2: Placeholders Match Whole Values Only")
+    print("="*60)
+    record = normalize_record({
+        "vendor_name": " Nonesuch Pending Ltd ",
+        "invoice_number": "INVOICE_NUMBER_EXTRACTED",
+        "invoice_date": "YYYY-MM-DD",
+        "payment_terms": "TBD - to be extracted",
+        "tax_amount": 0,
+    })
+    assert record == {
+        "vendor_name": "Nonesuch Pending Ltd",
+        "invoice_number": None,
+        "invoice_date": None,
+        "payment_terms": None,
+        "tax_amount": 0.0,
+    }
+    column = normalize_column(pd.Series(["$10", "N/A", None, "0"]), "total_amount")
+    assert column.tolist()[0] == 10.0 and pd.isna(column[1]) and column[3] == 0.0
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_amounts()
+    test_placeholders()
@@ -0,0 +1,44 @@
+"""Test the partitioned Parquet dataset export"""
+import os
+import tempfile
+import pandas as pd
+from utils.excel_exporter import export_batch_to_parquet
+
+def _result(number: str, invoice_date, vendor_name: str, total, vendor_id=None) -> dict:
+    return {
+        "status": "success",
+        "invoice_path": f"/invoices/{number}.pdf",
+        "content_hash": number,
+        "vendor_id": vendor_id,
+        "model_used": "test",
+        "result": {
+            "invoice_number": number, "vendor_name": vendor_name, "invoice_date": invoice_date,
+            "total_amount": total, "tax_amount": "", "currency": "USD", "payment_terms": "Net 30",
+        },
+    }
+
+def test_partitioned_append():
+    print("\n" + "="*60)
+    print("TEST 1: Batches Append Into Month/Vendor Partitions")
+    print("="*60)
+    dataset_dir = os.path.join(tempfile.mkdtemp(), "dataset")
+    export_batch_to_parquet([
+        _result("INV-1", "2025-01-05", "Acme Corp.", 100.0, vendor_id="V001"),
+        _result("INV-2", "2025-02-01", "The Widget Co", "1,200.50"),
+    ], dataset_dir)
+    export_batch_to_parquet([_result("INV-3", "2025-01-20", "Acme Corp.", 0, vendor_id="V001")], dataset_dir)
+
+    partitions = sorted(os.path.relpath(root, dataset_dir) for root, _, files in os.walk(dataset_dir) if files)
+    assert partitions == ["month=2025-01/vendor=v001", "month=2025-02/vendor=widget"]
+
+    january = pd.read_parquet(dataset_dir, columns=["invoice_number", "total_amount", "invoice_date"],
+                              filters=[("month", "=", "2025-01")])
+    assert sorted(january["invoice_number"]) == ["INV-1", "INV-3"]
+    assert january["total_amount"].dtype == "float64"
+    everything = pd.read_parquet(dataset_dir)
+    assert everything.loc[everything["invoice_number"] == "INV-2", "total_amount"].iloc[0] == 1200.5
+    assert everything["tax_amount"].isna().all()
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_partitioned_append()
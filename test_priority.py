@@ -0,0 +1,33 @@
+"""Test priority scheduling of waiting invoices"""
+import time
+from datetime import date, timedelta
+from utils.priority import priority_for, PriorityWorkQueue
+
+def _day(offset: int) -> str:
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+def test_urgent_first():
+    print("\n" + "="*60)
+    print("TEST 1: Expiring Discounts Overtake Long Terms")
+    print("="*60)
+    now = time.time()
+    waiting = PriorityWorkQueue()
+    waiting.put("net60", priority=priority_for({"invoice_date": _day(0), "payment_terms": "Net 60", "total_amount": "9000"}, now))
+    waiting.put("no_hints", priority=priority_for({}, now))
+    waiting.put("discount", priority=priority_for({"invoice_date": _day(-9), "payment_terms": "2/10 Net 30", "total_amount": "5000"}, now))
+    assert [waiting.get() for _ in range(3)] == ["discount", "no_hints", "net60"]
+    print("✅ PASSED")
+
+def test_aging():
+    print("\n" + "="*60)
+    print("TEST 2: Waiting Items Age Ahead")
+    print("="*60)
+    now = time.time()
+    fresh = priority_for({"invoice_date": _day(0), "payment_terms": "Net 10"}, now)
+    old = priority_for({}, now - 20 * 86400)
+    assert old < fresh
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_urgent_first()
+    test_aging()
@@ -0,0 +1,79 @@
+"""Test request profiling: header gating and process-wide memory labelling"""
+import threading
+import time
+from utils.profiler import RequestProfiler
+
+def _allocate(size: int, hold: float = 0.0) -> int:
+    block = bytearray(size)
+    time.sleep(hold)
+    return len(block)
+
+def test_header_gating():
+    print("\n" + "="*60)
+    print("TEST 1: X-Profile Only Works With The Configured Token")
+    print("="*60)
+    closed = RequestProfiler(token="")
+    assert not closed.requested("1") and not closed.requested("") and not closed.requested(None)
+    assert closed.trigger(closed.requested("1")) is None
+
+    gated = RequestProfiler(token="s3cret")
+    assert not gated.requested("1") and not gated.requested("true") and not gated.requested("s3cre")
+    assert gated.requested("s3cret") and gated.requested(" s3cret ")
+    assert gated.trigger(gated.requested("s3cret")) == "request"
+    assert gated.snapshot()["header_enabled"] and not closed.snapshot()["header_enabled"]
+    print("✅ PASSED")
+
+def test_memory_labelled_process_wide():
+    print("\n" + "="*60)
+    print("TEST 2: Peak Memory Is Process-Wide And Counts Overlapping Calls")
+    print("="*60)
+    profiler = RequestProfiler(token="")
+    result, report = profiler.run("request", _allocate, 2_000_000)
+    assert result == 2_000_000
+    assert "peak_memory_bytes" not in report
+    assert report["process_peak_memory_bytes"] >= 2_000_000
+    assert report["concurrent_calls"] == 0
+
+    # An unprofiled call allocating during the profile shows up in the peak
+    # and in concurrent_calls
+    started = threading.Event()
+
+    def other():
+        started.set()
+        profiler.run(None, _allocate, 8_000_000, 0.2)
+
+    thread = threading.Thread(target=other)
+
+    def profiled():
+        thread.start()
+        started.wait()
+        return _allocate(1_000, 0.4)
+
+    _, report = profiler.run("request", profiled)
+    thread.join()
+    assert report["concurrent_calls"] == 1
+    assert report["process_peak_memory_bytes"] >= 8_000_000
+    print("✅ PASSED")
+
+def test_one_profile_at_a_time():
+    print("\n" + "="*60)
+    print("TEST 3: A Call Selected During Another Profile Runs Unprofiled")
+    print("="*60)
+    profiler = RequestProfiler(token="")
+    inner = {}
+
+    def outer():
+        inner["result"], inner["report"] = profiler.run("request", _allocate, 10)
+        return "done"
+
+    result, report = profiler.run("request", outer)
+    assert result == "done" and report is not None
+    assert inner == {"result": 10, "report": None}
+    assert report["concurrent_calls"] == 1
+    assert profiler.snapshot()["profiled"] == 1 and profiler.snapshot()["skipped_busy"] == 1
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_header_gating()
+    test_memory_labelled_process_wide()
+    test_one_profile_at_a_time()
@@ -0,0 +1,63 @@
+"""Test the single-scan regex extractor"""
+import pandas as pd
+from utils.regex_extractor import regex_extractor
+
+SAMPLE = (
+    "Bill From: Acme Supplies Ltd\n"
+    "Invoice #: INV-2025-0042\n"
+    "Invoice Date: 2025-03-04\n"
+    "Subtotal: 1,000.00\n"
+    "VAT (20%): 200.00\n"
+    "Total Due: $1,200.00\n"
+)
+
+def test_single_document():
+    print("\n" + "="*60)
+    print("TEST 1: Fields, Positions and Confidence")
+    print("="*60)
+    found = regex_extractor.extract(SAMPLE)
+    assert found["invoice_number"]["value"] == "INV-2025-0042"
+    assert found["total_amount"]["value"] == "1,200.00"
+    assert found["tax_amount"]["value"] == "200.00"
+    start, end = found["vendor_name"]["start"], found["vendor_name"]["end"]
+    assert SAMPLE[start:end] == "Acme Supplies Ltd"
+
+    # JSON keys outrank labels wherever they appear
+    found = regex_extractor.extract(SAMPLE + '{"total_amount": 1180.50}')
+    assert found["total_amount"]["value"] == "1180.50"
+    assert found["total_amount"]["confidence"] > 0.8
+    print("✅ PASSED")
+
+def test_single_line_ocr():
+    print("\n" + "="*60)
+    print("TEST 2: Several Fields On One OCR Line")
+    print("="*60)
+    found = regex_extractor.extract_fields(
+        "From: Acme Corp   Invoice #: 12345   Date: 2024-01-05   Total: $1,200.00"
+    )
+    assert found["vendor_name"] == "Acme Corp"
+    assert found["invoice_number"] == "12345"
+    assert found["invoice_date"] == "2024-01-05"
+    assert found["total_amount"] == "1,200.00"
+
+    found = regex_extractor.extract_fields("Payment Terms: Net 30  Due Date: 2024-02-01")
+    assert found["payment_terms"] == "Net 30"
+    assert found["due_date"] == "2024-02-01"
+    assert found["invoice_date"] is None
+    print("✅ PASSED")
+
+def test_batch():
+    print("\n" + "="*60)
+    print("TEST 3: Batch Extraction")
+    print("="*60)
+    frame = regex_extractor.extract_batch([SAMPLE, "", None])
+    assert len(frame) == 3
+    assert frame.loc[0, "invoice_date"] == "2025-03-04"
+    assert pd.isna(frame.loc[1, "invoice_number"])
+    assert frame.loc[2, "currency_confidence"] == 0.0
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_single_document()
+    test_single_line_ocr()
+    test_batch()
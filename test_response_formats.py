@@ -0,0 +1,52 @@
+"""Test response format negotiation and encoding"""
+import gzip
+import json
+from utils.response_formats import (
+    JSON, MSGPACK, NDJSON, ARROW, negotiate_format, negotiate_encoding, render, pa, msgpack
+)
+
+RECORDS = [
+    {"id": 1, "total_amount": 110.0, "result": {"invoice_number": "INV-1", "line_items": [{"quantity": 1}]}},
+    {"id": 2, "total_amount": None, "result": {"invoice_number": "INV-2", "line_items": []}},
+]
+
+def test_negotiation():
+    print("\n" + "="*60)
+    print("TEST 1: Accept / Accept-Encoding Negotiation")
+    print("="*60)
+    assert negotiate_format(None) == JSON
+    assert negotiate_format("*/*") == JSON
+    # Record formats only for list responses
+    assert negotiate_format("application/x-ndjson") == JSON
+    assert negotiate_format("application/x-ndjson", records=True) == NDJSON
+    assert negotiate_format("application/json;q=0.5, application/x-ndjson", records=True) == NDJSON
+    if msgpack is not None:
+        assert negotiate_format("application/x-msgpack") == MSGPACK
+    if pa is not None:
+        assert negotiate_format("application/vnd.apache.arrow.stream", records=True) == ARROW
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    print("✅ PASSED")
+
+def test_encoding():
+    print("\n" + "="*60)
+    print("TEST 2: Records Round-Trip In Every Format")
+    print("="*60)
+    payload = {"count": len(RECORDS), "invoices": RECORDS * 50}
+    body, headers = render(payload, "application/x-ndjson", "gzip", records_key="invoices")
+    assert headers["Content-Encoding"] == "gzip" and headers["X-Result-Count"] == "2"
+    lines = gzip.decompress(body).splitlines()
+    assert len(lines) == 100 and json.loads(lines[0])["result"]["invoice_number"] == "INV-1"
+    if msgpack is not None:
+        body, headers = render(payload, "application/msgpack", None)
+        assert msgpack.unpackb(body) == payload
+    if pa is not None:
+        body, _ = render(payload, "application/vnd.apache.arrow.stream", None, records_key="invoices")
+        table = pa.ipc.open_stream(body).read_all()
+        assert table.num_rows == 100
+        assert pa.types.is_struct(table.schema.field("result").type)
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_negotiation()
+    test_encoding()
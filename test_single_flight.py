@@ -0,0 +1,73 @@
+"""Test request coalescing in SingleFlight"""
+import asyncio
+from utils.single_flight import SingleFlight
+
+def test_coalescing():
+    print("\n" + "="*60)
+    print("TEST 1: Concurrent Calls Share One Run")
+    print("="*60)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        assert flights.in_flight() == 0
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    print("✅ PASSED")
+
+def test_cancelled_leader():
+    print("\n" + "="*60)
+    print("TEST 2: A Cancelled Leader Does Not Cancel Followers")
+    print("="*60)
+
+    async def work():
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        flights = SingleFlight()
+        leader = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        try:
+            await leader
+            assert False, "leader should be cancelled"
+        except asyncio.CancelledError:
+            pass
+        return await follower
+
+    assert asyncio.run(main()) == ("result", True)
+    print("✅ PASSED")
+
+def test_shared_exception():
+    print("\n" + "="*60)
+    print("TEST 3: Errors Reach Every Caller")
+    print("="*60)
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flights = SingleFlight()
+        return await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_coalescing()
+    test_cancelled_leader()
+    test_shared_exception()
@@ -0,0 +1,97 @@
+"""Test streamed progress: partial fields from truncated JSON and the SSE endpoint"""
+import json
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_TMP, "jobs.db"))
+os.environ.setdefault("INVOICE_DB_PATH", os.path.join(_TMP, "invoices.db"))
+
+from fastapi.testclient import TestClient
+import api.main as api
+from agents.capture_agent import CaptureAgent, parse_partial_fields
+from utils.invoice_store import InvoiceStore
+from utils.job_store import JobStore
+
+RESPONSE = ('{\n  "invoice_number": "INV-7",\n  "vendor_name": "Acme \\"Best\\" Co",\n  "total_amount": "$1,234.56",\n'
+            '  "line_items": [{"description": "Widget", "quantity": 2}],\n  "currency": "USD"\n}')
+
+class StreamingOrchestrator:
+    """Feeds RESPONSE to the capture agent's field reporter a few characters at a time"""
+
+    def process_invoice(self, invoice_path, vendor_name="Unknown", progress_callback=None):
+        progress_callback("capture_started", {"document_type": "text_pdf"})
+        # The reporter only needs the callback, not a model
+        on_text = CaptureAgent.__new__(CaptureAgent)._partial_field_reporter(progress_callback)
+        for end in range(0, len(RESPONSE) + 1, 7):
+            on_text(RESPONSE[:end])
+        on_text(RESPONSE)
+        result = json.loads(RESPONSE)
+        progress_callback("capture_done", {"model_used": "test"})
+        progress_callback("validation_done", {"is_valid": True})
+        progress_callback("routing_decided", {"routing_decision": "AUTO_APPROVE"})
+        return {"status": "success", "model_used": "test", "result": result}
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_partial_fields():
+    print("\n" + "="*60)
+    print("TEST 1: Only Complete Fields Are Read From Truncated JSON")
+    print("="*60)
+    assert parse_partial_fields("") == {}
+    assert parse_partial_fields('{"invoice_number": "INV-') == {}
+    # A number may still be growing until a delimiter follows it
+    assert parse_partial_fields('{"invoice_number": "INV-1", "tax_amount": 12') == {"invoice_number": "INV-1"}
+    assert parse_partial_fields('{"invoice_number": "INV-1", "tax_amount": 12.5,') == {
+        "invoice_number": "INV-1", "tax_amount": 12.5}
+    # Escaped quotes, same normalization as the final result, placeholders dropped
+    assert parse_partial_fields('{"vendor_name": "Acme \\"Best\\" Co",\n "due_date": "2025-0') == {
+        "vendor_name": 'Acme "Best" Co'}
+    assert parse_partial_fields('{"total_amount": "$1,234.56", "po_number": "Not Found", "currency": null,') == {
+        "total_amount": 1234.56}
+    # Keys inside line items are not invoice fields
+    assert parse_partial_fields('{"invoice_number": "INV-2", "line_items": [{"description": "x", "quantity": 2,') == {
+        "invoice_number": "INV-2"}
+    print("✅ PASSED")
+
+def test_sse_endpoint():
+    print("\n" + "="*60)
+    print("TEST 2: The Stream Endpoint Emits Each Stage, Then The Result")
+    print("="*60)
+    workdir = tempfile.mkdtemp()
+    api.job_store = JobStore(os.path.join(workdir, "jobs.db"))
+    api.invoice_store = InvoiceStore(os.path.join(workdir, "invoices.db"), journal_mode="DELETE")
+    api._orchestrator = StreamingOrchestrator()
+
+    client = TestClient(api.app)
+    with client.stream("POST", "/api/v1/invoices/process/stream",
+                       files={"file": ("a.pdf", b"%PDF-1.4 stream", "application/pdf")}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response.read().decode())
+
+    names = [name for name, _ in events]
+    assert names[0] == "uploaded" and names[1] == "capture_started"
+    assert names[-4:] == ["capture_done", "validation_done", "routing_decided", "complete"]
+    partial = {}
+    for name, data in events:
+        if name == "partial_fields":
+            partial.update(data["fields"])
+    assert partial == {"invoice_number": "INV-7", "vendor_name": 'Acme "Best" Co', "total_amount": 1234.56}
+    complete = events[-1][1]
+    assert complete["status"] == "success" and complete["invoice_id"]
+    assert api.job_store.get(complete["job_id"])["status"] == "completed"
+
+    # Non-PDF uploads are refused before the stream starts
+    response = client.post("/api/v1/invoices/process/stream", files={"file": ("a.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_partial_fields()
+    test_sse_endpoint()
@@ -0,0 +1,135 @@
+"""Test vendor master normalization and fuzzy matching"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from utils.vendor_master import VendorMaster, normalize_vendor_name
+
+def test_normalization():
+    print("\n" + "="*60)
+    print("TEST 1: Vendor Name Normalization")
+    print("="*60)
+    assert normalize_vendor_name("The ACME Corp., Inc.") == "acme"
+    assert normalize_vendor_name("Müller & Söhne GmbH") == "muller and sohne"
+    assert normalize_vendor_name("  Globex   LLC ") == "globex"
+    assert normalize_vendor_name(None) == ""
+    print("✅ PASSED")
+
+def test_resolution():
+    print("\n" + "="*60)
+    print("TEST 2: Vendor Resolution")
+    print("="*60)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vendors.json")
+        master = VendorMaster(path)
+        acme = master.add_vendor("Acme Corporation", aliases=["ACME Supplies"])
+        globex = master.add_vendor("Globex International")
+        master.save()
+        
+        reloaded = VendorMaster(path)
+        assert reloaded.resolve("ACME CORP").get("vendor_id") == acme
+        assert reloaded.resolve("Acme Supplies Ltd")["match_type"] == "exact"
+        
+        fuzzy = reloaded.resolve("Globex Internationl")
+        assert fuzzy["vendor_id"] == globex
+        assert fuzzy["match_type"] == "fuzzy"
+        
+        unknown = reloaded.resolve("Initech")
+        assert unknown["vendor_id"] is None
+        assert unknown["is_new_vendor"]
+        print(f"✅ Fuzzy score: {fuzzy['score']}")
+    print("✅ PASSED")
+
+def test_lookup_speed():
+    print("\n" + "="*60)
+    print("TEST 3: Lookup Speed (10k vendors)")
+    print("="*60)
+    master = VendorMaster(os.path.join(tempfile.gettempdir(), "missing-vendor-master.json"))
+    for i in range(10000):
+        master.add_vendor(f"Vendor {i} Holdings")
+    
+    start = time.perf_counter()
+    for i in range(1000):
+        master.resolve(f"Vendor {i} Holdings")
+    exact_us = (time.perf_counter() - start) * 1e6 / 1000
+    
+    start = time.perf_counter()
+    for i in range(100):
+        master.resolve(f"Vendr {i} Holdngs")
+    fuzzy_us = (time.perf_counter() - start) * 1e6 / 100
+    
+    print(f"✅ Exact: {exact_us:.1f} µs/lookup, fuzzy: {fuzzy_us:.1f} µs/lookup")
+    # Generous bounds: a linear scan over 10k vendors is far slower than either
+    assert exact_us < 100, f"exact lookup too slow: {exact_us:.1f} µs"
+    assert fuzzy_us < 5000, f"fuzzy lookup too slow: {fuzzy_us:.1f} µs"
+    print("✅ PASSED")
+
+def test_vendor_ids():
+    print("\n" + "="*60)
+    print("TEST 4: New Vendor IDs Never Reuse Existing Ones")
+    print("="*60)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vendors.json")
+        master = VendorMaster(path)
+        master.add_vendor("Acme Corporation", vendor_id="V000002")
+        master.add_vendor("Globex International", vendor_id="ERP-17")
+        initech = master.add_vendor("Initech")
+        assert initech == "V000003"
+        master.save()
+
+        reloaded = VendorMaster(path)
+        umbrella = reloaded.add_vendor("Umbrella Corp")
+        assert umbrella == "V000004"
+        assert reloaded.vendors["V000002"]["name"] == "Acme Corporation"
+        assert len(reloaded.vendors) == 4
+
+        # An existing explicit ID is never overwritten
+        try:
+            reloaded.add_vendor("Someone Else", aliases=["Other"], vendor_id="V000002")
+            assert False, "duplicate vendor_id should raise"
+        except ValueError:
+            pass
+        assert reloaded.vendors["V000002"] == {"vendor_id": "V000002", "name": "Acme Corporation", "aliases": []}
+        assert reloaded.resolve("Other")["vendor_id"] is None
+    print("✅ PASSED")
+
+def test_import_csv():
+    print("\n" + "="*60)
+    print("TEST 5: Vendors Load From A CSV Export And Re-Imports Merge")
+    print("="*60)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vendors.json")
+        csv_path = os.path.join(tmp, "vendors.csv")
+        with open(csv_path, "w") as f:
+            f.write("vendor_id,name,aliases\n"
+                    "ERP-1,Acme Corporation,ACME Supplies|Acme Intl\n"
+                    ",Globex International,\n"
+                    ",,ignored\n")
+        master = VendorMaster(path)
+        assert master.import_csv(csv_path) == {"added": 2, "merged": 0}
+        assert master.resolve("Acme Intl")["vendor_id"] == "ERP-1"
+
+        with open(csv_path, "a") as f:
+            f.write("ERP-1,Acme Corp,Acme Holdings\n"
+                    ",Globex International Inc,Globex Intl\n")
+        assert master.import_csv(csv_path) == {"added": 0, "merged": 4}
+        assert master.vendors["ERP-1"]["name"] == "Acme Corporation"
+        assert master.resolve("Acme Holdings")["vendor_id"] == "ERP-1"
+        assert master.resolve("Globex Intl")["match_type"] == "exact"
+        assert len(master.vendors) == 2
+
+        # Command line: import, then save
+        subprocess.run([sys.executable, "-m", "utils.vendor_master", csv_path, "--master", path],
+                       check=True, capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        reloaded = VendorMaster(path)
+        assert len(reloaded.vendors) == 2
+        assert reloaded.resolve("ACME Supplies")["vendor_id"] == "ERP-1"
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_normalization()
+    test_resolution()
+    test_lookup_speed()
+    test_vendor_ids()
+    test_import_csv()
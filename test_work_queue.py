@@ -0,0 +1,115 @@
+"""Test the lease-based work queue (no broker needed: a temp SQLite file)"""
+import os
+import tempfile
+import threading
+import time
+import utils.work_queue as work_queue
+from utils.invoice_store import InvoiceStore
+from utils.work_queue import WorkQueue, LeaseLostError
+
+def _queue(max_attempts: int = 3) -> WorkQueue:
+    store = InvoiceStore(os.path.join(tempfile.mkdtemp(), "invoices.db"), journal_mode="DELETE")
+    return WorkQueue(store, max_attempts=max_attempts)
+
+def _result(number: str) -> dict:
+    return {
+        "status": "success",
+        "invoice_path": f"/invoices/{number}.pdf",
+        "content_hash": number,
+        "result": {"invoice_number": number, "vendor_name": "Acme", "total_amount": 10.0},
+    }
+
+def test_claim_exclusive():
+    print("\n" + "="*60)
+    print("TEST 1: Each Item Is Claimed By One Worker")
+    print("="*60)
+    queue = _queue()
+    for i in range(20):
+        queue.enqueue(f"/invoices/{i}.pdf", content_hash=f"h{i}", priority=i)
+    claimed, lock = [], threading.Lock()
+
+    def worker(name):
+        while True:
+            item = queue.claim(name, lease_seconds=60)
+            if item is None:
+                return
+            with lock:
+                claimed.append(item["id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 20
+    assert queue.stats()["leased"] == 20
+    print("✅ PASSED")
+
+def test_lease_expiry():
+    print("\n" + "="*60)
+    print("TEST 2: Expired Leases Are Re-claimed; The Old Holder Cannot Renew Or Complete")
+    print("="*60)
+    queue = _queue()
+    queue.enqueue("/invoices/a.pdf", content_hash="a", priority=0)
+    first = queue.claim("slow", lease_seconds=0.05)
+    assert queue.claim("other", lease_seconds=60) is None
+    time.sleep(0.1)
+    second = queue.claim("other", lease_seconds=60)
+    assert second["id"] == first["id"] and second["attempts"] == 2
+
+    assert not queue.renew(first["id"], first["lease_token"])
+    try:
+        queue.complete(first["id"], first["lease_token"], _result("a"))
+        assert False, "expected LeaseLostError"
+    except LeaseLostError:
+        pass
+    assert queue.invoice_store.query() == []
+
+    record = queue.complete(second["id"], second["lease_token"], _result("a"))
+    assert len(queue.invoice_store.query()) == 1 and record["invoice_id"]
+    assert queue.stats()["done"] == 1
+    print("✅ PASSED")
+
+def test_fail_backoff():
+    print("\n" + "="*60)
+    print("TEST 3: Failures Back Off, Then Fail After max_attempts")
+    print("="*60)
+    queue = _queue(max_attempts=2)
+    queue.enqueue("/invoices/b.pdf", content_hash="b", priority=0)
+    item = queue.claim("w", lease_seconds=60)
+    assert queue.fail(item["id"], item["lease_token"], "timeout") == "queued"
+    # Waiting out the backoff
+    assert queue.claim("w", lease_seconds=60) is None
+
+    backoff = work_queue.RETRY_BACKOFF_SECONDS
+    work_queue.RETRY_BACKOFF_SECONDS = 0.0
+    try:
+        queue.enqueue("/invoices/c.pdf", content_hash="c", priority=1)
+        item = queue.claim("w", lease_seconds=60)
+        assert queue.fail(item["id"], item["lease_token"], "timeout") == "queued"
+        item = queue.claim("w", lease_seconds=60)
+        assert item["attempts"] == 2
+        assert queue.fail(item["id"], item["lease_token"], "timeout") == "failed"
+        assert queue.fail(item["id"], item["lease_token"], "timeout") == "lost"
+    finally:
+        work_queue.RETRY_BACKOFF_SECONDS = backoff
+    assert queue.stats()["failed"] == 1
+    print("✅ PASSED")
+
+def test_release():
+    print("\n" + "="*60)
+    print("TEST 4: Released Items Return Without Using An Attempt")
+    print("="*60)
+    queue = _queue()
+    queue.enqueue("/invoices/d.pdf", content_hash="d", priority=0)
+    item = queue.claim("w", lease_seconds=60)
+    assert queue.release(item["id"], item["lease_token"])
+    again = queue.claim("w", lease_seconds=60)
+    assert again["id"] == item["id"] and again["attempts"] == 1
+    print("✅ PASSED")
+
+if __name__ == "__main__":
+    test_claim_exclusive()
+    test_lease_expiry()
+    test_fail_backoff()
+    test_release()
@@ -0,0 +1,135 @@
+"""Adaptive concurrency limit for model calls - AIMD on rate limits and latency"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+INITIAL_LIMIT = float(os.getenv("MODEL_LIMIT_INITIAL", "8"))
+MIN_LIMIT = float(os.getenv("MODEL_LIMIT_MIN", "1"))
+MAX_LIMIT = float(os.getenv("MODEL_LIMIT_MAX", "64"))
+
+# Recent latency this far above the long-run average counts as queueing upstream
+LATENCY_TOLERANCE = float(os.getenv("MODEL_LIMIT_LATENCY_TOLERANCE", "1.5"))
+
+# Exceptions that mean "too much load", matched by class name so the SDK is not imported here
+OVERLOAD_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "DeadlineExceeded",
+    "ServiceUnavailable", "TimeoutError", "ReadTimeout", "ConnectTimeout",
+}
+
+
+def is_overload(error: BaseException) -> bool:
+    return type(error).__name__ in OVERLOAD_ERRORS or getattr(error, "code", None) in (429, 503)
+
+
+class AdaptiveLimiter:
+    """Blocking concurrency limiter whose limit follows the capacity available.
+
+    Additive increase: each call that succeeds while the limit is in use and
+    latency is flat adds 1/limit, so the limit grows by about one per round
+    trip. Multiplicative decrease: a rate-limit or timeout halves the limit,
+    and latency rising past LATENCY_TOLERANCE times its long-run average
+    trims it by 10%. Decreases happen at most once per recent round-trip
+    time, so one burst of 429s counts as one signal.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = INITIAL_LIMIT,
+        min_limit: float = MIN_LIMIT,
+        max_limit: float = MAX_LIMIT,
+        backoff: float = 0.5,
+        latency_backoff: float = 0.9,
+        latency_tolerance: float = LATENCY_TOLERANCE,
+    ):
+        # Below one slot every caller would wait forever
+        min_limit = max(1.0, min_limit)
+        max_limit = max(min_limit, max_limit)
+        self.name = name
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.waiting = 0
+        self.short_latency = 0.0
+        self.long_latency = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self.stats = {"calls": 0, "overloads": 0, "increases": 0, "decreases": 0}
+
+    def _ewma(self, current: float, sample: float, alpha: float) -> float:
+        return sample if current == 0.0 else (1 - alpha) * current + alpha * sample
+
+    def _decrease(self, factor: float, now: float, reason: str):
+        if now - self._last_decrease < self.short_latency:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.stats["decreases"] += 1
+        logger.info(f"📉 {self.name} limit {previous:.1f} -> {self.limit:.1f} ({reason})")
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of a call"""
+        with self._condition:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    self._condition.wait()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            # Only calls made while the limit is the bottleneck may raise it
+            saturated = self.in_flight >= int(self.limit) or self.waiting > 0
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self._release(time.monotonic() - started, overload=is_overload(e), success=False, saturated=saturated)
+            raise
+        else:
+            self._release(time.monotonic() - started, overload=False, success=True, saturated=saturated)
+
+    def _release(self, latency: float, overload: bool, success: bool, saturated: bool):
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            self.stats["calls"] += 1
+            if overload:
+                self.stats["overloads"] += 1
+                self._decrease(self.backoff, now, "rate limited or timed out")
+            elif success:
+                self.short_latency = self._ewma(self.short_latency, latency, 0.3)
+                self.long_latency = self._ewma(self.long_latency, latency, 0.05)
+                if self.short_latency > self.long_latency * self.latency_tolerance:
+                    self._decrease(self.latency_backoff, now, "latency rising")
+                elif saturated and self.limit < self.max_limit:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                    self.stats["increases"] += 1
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "recent_latency_ms": round(self.short_latency * 1000, 1),
+                "average_latency_ms": round(self.long_latency * 1000, 1),
+                **self.stats,
+            }
+
+
+# One limit for every agent: they share the same quota
+model_limiter = AdaptiveLimiter("gemini")
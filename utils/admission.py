@@ -0,0 +1,87 @@
+"""Admission control - bounded concurrency plus a bounded wait queue per endpoint"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+
+
+class QueueFullError(Exception):
+    """Raised when an endpoint's queue is full; carries a Retry-After hint"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} queue is full")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admits up to max_concurrent requests, queues up to max_queue more and
+    rejects the rest immediately instead of letting latency grow unbounded."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, ewma_alpha: float = 0.2):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_wait_seconds = 0.0
+        self.avg_service_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _ewma(self, current: float, sample: float) -> float:
+        if current == 0.0:
+            return sample
+        return (1 - self.ewma_alpha) * current + self.ewma_alpha * sample
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        service = self.avg_service_seconds or 1.0
+        return max(1, math.ceil(service * (self.waiting + 1) / self.max_concurrent))
+
+    def check(self):
+        """Raise QueueFullError now if a request would be rejected.
+
+        Lets streaming endpoints answer 429 before the response starts; the
+        slot itself is still taken (and re-checked) with slot().
+        """
+        if self.in_flight + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+
+        self.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.monotonic()
+        self.avg_wait_seconds = self._ewma(self.avg_wait_seconds, started - queued_at)
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.avg_service_seconds = self._ewma(self.avg_service_seconds, time.monotonic() - started)
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.avg_wait_seconds * 1000, 1),
+            "avg_service_ms": round(self.avg_service_seconds * 1000, 1),
+            "retry_after_seconds": self.retry_after(),
+        }
@@ -0,0 +1,329 @@
+"""Bulk backfill CLI - process pool for local work, asyncio for model calls"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from utils.file_hash import compute_file_hash
+from utils.document_classifier import extract_text_layer
+from utils.stage_journal import StageJournal
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Images larger than this on their long edge are downscaled before upload;
+# the model does not read more detail than this from an invoice page.
+MAX_IMAGE_EDGE = 2048
+
+
+# ============================================================================
+# CPU STAGES (run in worker processes)
+# ============================================================================
+
+def reencode_image(image_path: str, cache_dir: str, content_hash: str) -> str:
+    """Downscale oversized images to JPEG so uploads stay small"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return image_path
+    try:
+        with Image.open(image_path) as img:
+            if max(img.size) <= MAX_IMAGE_EDGE and img.format == "JPEG":
+                return image_path
+            img = img.convert("RGB")
+            img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE))
+            os.makedirs(cache_dir, exist_ok=True)
+            out_path = os.path.join(cache_dir, f"{content_hash}.jpg")
+            img.save(out_path, "JPEG", quality=90)
+            return out_path
+    except Exception as e:
+        logger.debug(f"Image re-encode failed for {image_path}: {e}")
+        return image_path
+
+
+def prepare_document(path: str, cache_dir: str) -> Dict[str, Any]:
+    """Hash, pre-parse and re-encode a document before the model stage"""
+    content_hash = compute_file_hash(path)
+    prepared = {
+        "path": path,
+        "capture_path": path,
+        "content_hash": content_hash,
+        "size": os.path.getsize(path),
+        "regex_fields": {},
+    }
+
+    if path.lower().endswith('.pdf'):
+        text = extract_text_layer(path)
+        if text.strip():
+            from utils.excel_exporter import extract_with_regex
+            prepared["regex_fields"] = extract_with_regex(text)
+    elif path.lower().endswith(IMAGE_EXTENSIONS):
+        prepared["capture_path"] = reencode_image(path, cache_dir, content_hash)
+
+    return prepared
+
+
+def export_chunk(results: List[Dict[str, Any]], filename: str) -> str:
+    """Write a chunk of results to the workbook, skipping invoices it already holds"""
+    from utils.excel_exporter import export_batch_to_excel
+    # A crash after the append but before the progress write re-exports the chunk on resume
+    return export_batch_to_excel(results, filename, skip_existing=True)
+
+
+def export_parquet_chunk(results: List[Dict[str, Any]], dataset_dir: str) -> str:
+    """Append a chunk of results to the partitioned Parquet dataset"""
+    from utils.excel_exporter import export_batch_to_parquet
+    return export_batch_to_parquet(results, dataset_dir)
+
+
+# ============================================================================
+# BACKFILL RUNNER
+# ============================================================================
+
+class BatchBackfill:
+    """Runs a historical backfill over a directory of invoices.
+
+    Local stages run on a process pool sized to the machine, model calls run
+    on an asyncio loop with bounded concurrency, and completed documents are
+    appended to a progress log so an interrupted run can resume. Each
+    document's finished stages are also written to a journal, so documents
+    that were mid-flight at a crash replay their model output on resume
+    instead of calling the model again.
+    """
+
+    def __init__(
+        self,
+        input_dir: str,
+        excel_file: str = "processed_invoices.xlsx",
+        concurrency: int = 8,
+        processes: Optional[int] = None,
+        export_every: int = 100,
+        progress_path: Optional[str] = None,
+        journal_path: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        parquet_dir: Optional[str] = None,
+        orchestrator=None,
+        invoice_store=None,
+    ):
+        self.input_dir = input_dir
+        self.excel_file = excel_file
+        self.concurrency = concurrency
+        self.processes = processes or os.cpu_count() or 1
+        self.export_every = export_every
+        self.progress_path = progress_path or f"{excel_file}.progress.jsonl"
+        self.journal = StageJournal(journal_path or f"{excel_file}.journal.jsonl")
+        self.cache_dir = cache_dir or os.path.join(input_dir, ".backfill_cache")
+        self.parquet_dir = parquet_dir
+        self.orchestrator = orchestrator
+        self.invoice_store = invoice_store
+
+        self.stats = {"total": 0, "processed": 0, "failed": 0, "skipped": 0, "replayed": 0, "bytes": 0}
+        self._done = self._load_progress()
+        self._exported = set(self._done)
+        self._pending_export: List[Dict[str, Any]] = []
+        self._started = 0.0
+        self._last_report = 0.0
+
+    def _load_progress(self) -> set:
+        """Read content hashes already exported by a previous run"""
+        done = set()
+        if not os.path.exists(self.progress_path):
+            return done
+        with open(self.progress_path, "r") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["content_hash"])
+                except (ValueError, KeyError):
+                    # A torn final line from a crash is simply redone.
+                    continue
+        logger.info(f"✅ Resuming: {len(done)} invoice(s) already done")
+        return done
+
+    def discover(self) -> List[str]:
+        """List supported invoice files under the input directory"""
+        paths = []
+        for root, dirs, files in os.walk(self.input_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in sorted(files):
+                if not name.startswith('.') and name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return paths
+
+    def _merge_prefill(self, result: Dict[str, Any], regex_fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill fields the model missed from the local regex pre-parse"""
+        if result.get("status") != "success" or not regex_fields:
+            return result
+        data = result.get("result")
+        if not isinstance(data, dict):
+            return result
+        filled = []
+        for field, value in regex_fields.items():
+            if value and data.get(field) in (None, ""):
+                data[field] = value
+                filled.append(field)
+        if filled:
+            result["regex_prefill"] = filled
+        return result
+
+    def _report_progress(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_report < 5.0:
+            return
+        self._last_report = now
+        done = self.stats["processed"] + self.stats["failed"] + self.stats["skipped"]
+        elapsed = now - self._started
+        rate = (self.stats["processed"] + self.stats["failed"]) / elapsed if elapsed else 0.0
+        remaining = self.stats["total"] - done
+        eta = f"{remaining / rate:.0f}s" if rate else "n/a"
+        logger.info(f"📊 {done}/{self.stats['total']} done ({rate:.2f} inv/s, ETA {eta})")
+
+    async def _flush_exports(self, loop, process_pool, force: bool = False):
+        if not self._pending_export or (not force and len(self._pending_export) < self.export_every):
+            return
+        chunk, self._pending_export = self._pending_export, []
+        successes = [r for r in chunk if r.get("status") == "success"]
+        if self.excel_file and successes:
+            await loop.run_in_executor(process_pool, export_chunk, successes, self.excel_file)
+        if self.parquet_dir and successes:
+            await loop.run_in_executor(process_pool, export_parquet_chunk, successes, self.parquet_dir)
+        # Only record progress once results are durably exported.
+        with open(self.progress_path, "a") as f:
+            for r in successes:
+                f.write(json.dumps({"content_hash": r["content_hash"], "path": r["invoice_path"]}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._exported.update(r["content_hash"] for r in successes)
+
+    async def _process_one(self, path, loop, process_pool, thread_pool, model_slots, export_lock):
+        prepared = await loop.run_in_executor(process_pool, prepare_document, path, self.cache_dir)
+        if prepared["content_hash"] in self._done:
+            self.stats["skipped"] += 1
+            self._report_progress()
+            return
+        self._done.add(prepared["content_hash"])
+
+        async with model_slots:
+            result = await loop.run_in_executor(thread_pool, partial(
+                self.orchestrator.process_invoice,
+                prepared["capture_path"],
+                journal=self.journal,
+                document_key=prepared["content_hash"],
+            ))
+        if result.get("replayed_stages"):
+            self.stats["replayed"] += 1
+        result["invoice_path"] = path
+        result["content_hash"] = prepared["content_hash"]
+        result = self._merge_prefill(result, prepared["regex_fields"])
+        record = await loop.run_in_executor(thread_pool, self.invoice_store.save_result, result)
+        result.update({"invoice_id": record["invoice_id"], "possible_duplicates": record["duplicates"]})
+
+        if result.get("status") == "success":
+            self.stats["processed"] += 1
+            self.stats["bytes"] += prepared["size"]
+        else:
+            self.stats["failed"] += 1
+            logger.warning(f"⚠️ Failed: {path}: {result.get('error')}")
+
+        async with export_lock:
+            self._pending_export.append(result)
+            await self._flush_exports(loop, process_pool)
+        self._report_progress()
+
+    async def run_async(self) -> Dict[str, Any]:
+        if self.orchestrator is None:
+            from agents.orchestrator import InvoiceOrchestrator
+            self.orchestrator = InvoiceOrchestrator()
+        if self.invoice_store is None:
+            from utils.invoice_store import InvoiceStore
+            self.invoice_store = InvoiceStore()
+
+        paths = self.discover()
+        self.stats["total"] = len(paths)
+        logger.info(f"📂 Found {len(paths)} invoice(s); {self.processes} processes, {self.concurrency} model slots")
+
+        loop = asyncio.get_running_loop()
+        model_slots = asyncio.Semaphore(self.concurrency)
+        export_lock = asyncio.Lock()
+        # Cap documents in flight so preparation cannot run far ahead of the model stage.
+        in_flight = asyncio.Semaphore(self.concurrency + self.processes * 2)
+        self._started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=self.processes) as process_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as thread_pool:
+
+            async def bounded(path):
+                async with in_flight:
+                    try:
+                        await self._process_one(path, loop, process_pool, thread_pool, model_slots, export_lock)
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        logger.error(f"❌ Error on {path}: {e}", exc_info=True)
+
+            await asyncio.gather(*(bounded(p) for p in paths))
+            async with export_lock:
+                await self._flush_exports(loop, process_pool, force=True)
+
+        # Exported documents are in the progress log; the journal only needs the rest
+        self.journal.compact(drop=self._exported)
+
+        self._report_progress(force=True)
+        return self.summary()
+
+    def run(self) -> Dict[str, Any]:
+        return asyncio.run(self.run_async())
+
+    def summary(self) -> Dict[str, Any]:
+        """Final throughput summary"""
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        attempted = self.stats["processed"] + self.stats["failed"]
+        summary = dict(self.stats)
+        summary.update({
+            "elapsed_seconds": round(elapsed, 2),
+            "invoices_per_second": round(attempted / elapsed, 3) if elapsed else 0.0,
+            "megabytes_per_second": round(self.stats["bytes"] / 1e6 / elapsed, 3) if elapsed else 0.0,
+        })
+        logger.info("=" * 60)
+        logger.info("BACKFILL SUMMARY")
+        logger.info("=" * 60)
+        for key, value in summary.items():
+            logger.info(f"   {key}: {value}")
+        return summary
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Bulk backfill of historical invoices")
+    parser.add_argument("input_dir")
+    parser.add_argument("--excel", default="processed_invoices.xlsx")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BACKFILL_CONCURRENCY", "8")),
+                        help="Maximum concurrent model calls")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--export-every", type=int, default=100)
+    parser.add_argument("--progress", default=None, help="Progress log (default: <excel>.progress.jsonl)")
+    parser.add_argument("--journal", default=None, help="Stage journal (default: <excel>.journal.jsonl)")
+    parser.add_argument("--parquet", default=None, help="Also append to a Parquet dataset in this directory")
+    args = parser.parse_args()
+
+    BatchBackfill(
+        args.input_dir,
+        excel_file=args.excel,
+        concurrency=args.concurrency,
+        processes=args.processes,
+        export_every=args.export_every,
+        progress_path=args.progress,
+        journal_path=args.journal,
+        parquet_dir=args.parquet,
+    ).run()
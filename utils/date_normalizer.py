@@ -0,0 +1,243 @@
+"""Date normalization with per-vendor format inference, plus payment-terms arithmetic"""
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tried in order; earlier formats win ties, so ISO and US styles come first
+DATE_FORMATS = (
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%m/%d/%Y", "%d/%m/%Y", "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y",
+    "%m/%d/%y", "%d/%m/%y", "%d.%m.%y",
+    "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y",
+    "%d %B %Y", "%d %b %Y", "%d-%b-%Y", "%d-%b-%y",
+    "%Y%m%d",
+)
+
+# Regex fragment matching a date written in any of the formats above
+DATE_TOKEN = (
+    r"\d{4}[-/]\d{1,2}[-/]\d{1,2}"
+    r"|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}"
+    r"|[A-Za-z]{3,9}\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}"
+    r"|\d{1,2}(?:st|nd|rd|th)?[\s-][A-Za-z]{3,9}\.?,?[\s-]\d{2,4}"
+    r"|\d{8}"
+)
+
+# Samples inspected when inferring a vendor's format
+INFERENCE_SAMPLE_SIZE = 200
+
+PAYMENT_TERMS_PATTERN = re.compile(
+    r"(?:(?P<discount_pct>\d+(?:\.\d+)?)\s*%?\s*(?:/|\s)\s*(?P<discount_days>\d+)\s*(?:days?)?\s*,?\s*)?"
+    r"\b(?:net|n/)\s*(?P<net_days>\d+)\b",
+    re.IGNORECASE,
+)
+DUE_ON_RECEIPT_PATTERN = re.compile(r"due\s+(?:up)?on\s+receipt|\bimmediate\b|\bcod\b", re.IGNORECASE)
+
+
+def _clean_strings(values: pd.Series) -> pd.Series:
+    cleaned = values.astype("string").str.strip()
+    # Ordinal suffixes ("March 3rd, 2025"), abbreviation dots ("Mar. 3")
+    # and doubled spaces trip strptime
+    cleaned = cleaned.str.replace(r"(?<=\d)(st|nd|rd|th)\b", "", regex=True)
+    cleaned = cleaned.str.replace(r"(?<=[A-Za-z])\.", "", regex=True)
+    return cleaned.str.replace(r"\s+", " ", regex=True).replace("", pd.NA)
+
+
+def _parse_matrix(uniques) -> np.ndarray:
+    """Parse every distinct string under every format: shape (formats, values)"""
+    uniques = pd.Series(uniques, dtype="object")
+    return np.stack([
+        pd.to_datetime(uniques, format=date_format, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        for date_format in DATE_FORMATS
+    ]) if len(uniques) else np.empty((len(DATE_FORMATS), 0), dtype="datetime64[ns]")
+
+
+def _best_format(hits: np.ndarray) -> int:
+    """Index of the format with the most hits (earliest on ties), or -1"""
+    best = int(np.argmax(hits))
+    return best if hits[best] > 0 else -1
+
+
+def _is_ambiguous(matrix: np.ndarray, parses: np.ndarray, column: int) -> bool:
+    return len(set(matrix[parses[:, column], column].tolist())) > 1
+
+
+def infer_date_format(values: Iterable) -> Optional[str]:
+    """Most likely format for a set of date strings; None if nothing parses"""
+    sample = _clean_strings(pd.Series(list(values), dtype="object")).dropna()
+    sample = sample.drop_duplicates().head(INFERENCE_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    best = _best_format((~np.isnat(_parse_matrix(sample))).sum(axis=1))
+    return DATE_FORMATS[best] if best >= 0 else None
+
+
+class DateNormalizer:
+    """Parses dates to typed values, learning each vendor's format once.
+
+    Each distinct string is parsed once per format, a vendor's format is
+    inferred from all of its values in the batch and cached, and every row
+    is then read with its vendor's format. Values that format cannot read
+    fall back to the first format that can.
+    """
+
+    def __init__(self):
+        self._formats: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"inferred": 0, "cache_hits": 0, "fallbacks": 0}
+
+    def format_for(self, vendor_key: Optional[str]) -> Optional[str]:
+        with self._lock:
+            return self._formats.get(vendor_key) if vendor_key else None
+
+    def parse_column(self, values, vendor_keys=None) -> pd.Series:
+        """Parse a column of date strings to datetime64, per vendor format.
+
+        vendor_keys is an optional same-length sequence grouping the values;
+        the result is NaT where no format matches.
+        """
+        # Clean and parse each distinct raw string once, then map back to rows
+        raw_codes, raw_uniques = pd.factorize(pd.Series(values, dtype="object"))
+        clean_codes, uniques = pd.factorize(_clean_strings(pd.Series(raw_uniques, dtype="object")))
+        value_codes = np.append(clean_codes, -1)[raw_codes]
+        if vendor_keys is None:
+            vendor_keys = [None] * len(value_codes)
+        key_codes, keys = pd.factorize(pd.Series(vendor_keys, dtype="object").fillna(""))
+
+        matrix = _parse_matrix(uniques)
+        parses = ~np.isnat(matrix)
+        format_index = {date_format: i for i, date_format in enumerate(DATE_FORMATS)}
+
+        # One format per vendor: cached, else the one reading most of its distinct values
+        present = value_codes >= 0
+        pairs = np.unique(np.stack([key_codes[present], value_codes[present]]), axis=1)
+        hits = np.zeros((len(keys), len(DATE_FORMATS)), dtype=np.int64)
+        np.add.at(hits, pairs[0], parses[:, pairs[1]].T.astype(np.int64))
+        distinct = np.bincount(pairs[0], minlength=len(keys))
+
+        vendor_format = np.full(len(keys), -1, dtype=np.int64)
+        with self._lock:
+            for k, key in enumerate(keys):
+                cached = self._formats.get(key) if key else None
+                if cached:
+                    vendor_format[k] = format_index[cached]
+                    self.stats["cache_hits"] += 1
+                    continue
+                vendor_format[k] = _best_format(hits[k])
+                if not key or vendor_format[k] < 0:
+                    continue
+                # A lone value that reads differently under several formats
+                # (03/04/2025) is not evidence enough to cache
+                if distinct[k] > 1 or not _is_ambiguous(matrix, parses, pairs[1][pairs[0] == k][0]):
+                    self._formats[key] = DATE_FORMATS[vendor_format[k]]
+                    self.stats["inferred"] += 1
+
+        parsed = np.full(len(value_codes), np.datetime64("NaT"), dtype="datetime64[ns]")
+        rows = np.flatnonzero(present & (vendor_format[key_codes] >= 0))
+        parsed[rows] = matrix[vendor_format[key_codes[rows]], value_codes[rows]]
+
+        missing = present & np.isnat(parsed)
+        if missing.any() and len(uniques):
+            first_parse = np.argmax(parses, axis=0)
+            fallback = matrix[first_parse, np.arange(len(uniques))]
+            parsed[missing] = fallback[value_codes[missing]]
+            with self._lock:
+                self.stats["fallbacks"] += int(missing.sum())
+        index = values.index if isinstance(values, pd.Series) else None
+        return pd.Series(parsed, index=index, dtype="datetime64[ns]")
+
+    def normalize(self, value, vendor_key: Optional[str] = None) -> Optional[str]:
+        """Normalize one date to YYYY-MM-DD; None if it cannot be parsed"""
+        if value in (None, ""):
+            return None
+        if isinstance(value, (datetime, pd.Timestamp)):
+            return value.strftime("%Y-%m-%d")
+        parsed = self.parse_column([value], [vendor_key])[0]
+        return None if pd.isna(parsed) else parsed.strftime("%Y-%m-%d")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, vendors=len(self._formats))
+
+
+date_normalizer = DateNormalizer()
+
+
+def parse_payment_terms(terms) -> Tuple[float, float, float]:
+    """(discount_pct, discount_days, net_days) from terms like '2/10 Net 30'; NaN if unknown"""
+    if not isinstance(terms, str) or not terms.strip():
+        return (np.nan, np.nan, np.nan)
+    if DUE_ON_RECEIPT_PATTERN.search(terms):
+        return (0.0, np.nan, 0.0)
+    match = PAYMENT_TERMS_PATTERN.search(terms)
+    if not match:
+        return (np.nan, np.nan, np.nan)
+    discount_pct = float(match.group("discount_pct")) if match.group("discount_pct") else 0.0
+    discount_days = float(match.group("discount_days")) if match.group("discount_days") else np.nan
+    return (discount_pct, discount_days, float(match.group("net_days")))
+
+
+def payment_schedule(
+    frame: pd.DataFrame,
+    vendor_col: Optional[str] = None,
+    normalizer: DateNormalizer = date_normalizer,
+) -> pd.DataFrame:
+    """Due dates, discount deadlines and discount value for a batch of invoices.
+
+    Expects invoice_date, due_date, payment_terms and total_amount columns.
+    Terms are parsed once per distinct string and all date arithmetic runs on
+    datetime64 columns.
+    """
+    vendor_keys = frame[vendor_col].tolist() if vendor_col else None
+    invoice_date = normalizer.parse_column(frame["invoice_date"], vendor_keys)
+    stated_due = normalizer.parse_column(frame["due_date"], vendor_keys)
+
+    codes, uniques = pd.factorize(frame["payment_terms"])
+    terms = np.array([parse_payment_terms(t) for t in uniques] + [(np.nan, np.nan, np.nan)], dtype="float64")
+    discount_pct, discount_days, net_days = terms[codes].T
+
+    net_due = invoice_date + pd.to_timedelta(net_days, unit="D")
+    due_date = stated_due.fillna(net_due)
+    discount_deadline = invoice_date + pd.to_timedelta(discount_days, unit="D")
+    amount = pd.to_numeric(frame["total_amount"], errors="coerce").to_numpy(dtype="float64")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_early = (due_date - discount_deadline).dt.days.to_numpy(dtype="float64")
+        rate = discount_pct / 100.0
+        annualized = np.where(days_early > 0, rate / (1 - rate) * 365.0 / days_early, np.nan)
+
+    return pd.DataFrame({
+        "invoice_date": invoice_date,
+        "due_date": due_date,
+        "discount_pct": discount_pct,
+        "discount_deadline": discount_deadline,
+        "discount_amount": np.round(amount * discount_pct / 100.0, 2),
+        "annualized_return": np.round(annualized, 4),
+    }, index=frame.index)
+
+
+def invoice_payment_schedule(invoice_data: Dict[str, Any], vendor_key: Optional[str] = None) -> Dict[str, Any]:
+    """Payment schedule for one invoice, with dates as YYYY-MM-DD strings"""
+    frame = pd.DataFrame([{
+        "invoice_date": invoice_data.get("invoice_date"),
+        "due_date": invoice_data.get("due_date"),
+        "payment_terms": invoice_data.get("payment_terms"),
+        "total_amount": invoice_data.get("total_amount"),
+        "vendor": vendor_key,
+    }])
+    row = payment_schedule(frame, vendor_col="vendor").iloc[0]
+
+    def _value(value):
+        if pd.isna(value):
+            return None
+        if isinstance(value, pd.Timestamp):
+            return value.strftime("%Y-%m-%d")
+        return float(value)
+
+    return {key: _value(value) for key, value in row.items()}
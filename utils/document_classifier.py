@@ -0,0 +1,220 @@
+"""Local document classifier - picks the cheapest capture path for each file"""
+import io
+import itertools
+import logging
+import mimetypes
+import os
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEXT_PDF = "text_pdf"
+SCANNED_PDF = "scanned_pdf"
+TYPED_IMAGE = "typed_image"
+HANDWRITTEN = "handwritten"
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# A PDF with at least this many letters/digits in its text layer is read as text
+MIN_TEXT_CHARS = int(os.getenv("CLASSIFIER_MIN_TEXT_CHARS", "50"))
+TEXT_LAYER_PAGES = 3
+
+# Longer text layers are not sent as text; the PDF goes down the document path
+# instead, the way large files go through the Files API rather than inline
+TEXT_LAYER_MAX_CHARS = int(os.getenv("CLASSIFIER_TEXT_LAYER_MAX_CHARS", "60000"))
+
+# Images are analysed at this size; stroke statistics are stable well below full resolution
+ANALYSIS_EDGE = 1000
+
+# Printed text is dominated by horizontal/vertical edges and dark ink; pen
+# strokes are curved and often coloured. Below this share of axis-aligned edge
+# energy, or above this share of coloured ink, an image is treated as handwritten.
+AXIS_ALIGNED_THRESHOLD = float(os.getenv("CLASSIFIER_AXIS_ALIGNED_THRESHOLD", "0.45"))
+COLORED_INK_THRESHOLD = float(os.getenv("CLASSIFIER_COLORED_INK_THRESHOLD", "0.3"))
+
+
+def _page_texts(reader, source: str):
+    """Text of each page in turn; stops at the first page that cannot be read"""
+    for page in reader.pages:
+        try:
+            yield page.extract_text() or ""
+        except Exception as e:
+            logger.debug(f"Text layer extraction failed for {source}: {e}")
+            return
+
+
+def _join_pages(pages, max_chars: Optional[int] = None, texts=None) -> str:
+    """Join page texts, stopping at the first page that takes the text past max_chars"""
+    texts = list(texts or [])
+    length = sum(len(text) + 1 for text in texts)
+    for text in pages:
+        if max_chars is not None and length > max_chars:
+            break
+        texts.append(text)
+        length += len(text) + 1
+    return "\n".join(texts)
+
+
+def extract_text_layer(
+    pdf_path: str, max_pages: Optional[int] = TEXT_LAYER_PAGES, max_chars: Optional[int] = None
+) -> str:
+    """Extract the embedded text of the first pages of a PDF (all pages if max_pages is None).
+
+    With max_chars, extraction stops at the first page that takes the text past it.
+    """
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        return ""
+    try:
+        # Given a path, PdfReader copies the whole file into memory; a file object is read on demand
+        with open(pdf_path, "rb") as f:
+            return _join_pages(itertools.islice(_page_texts(PdfReader(f), pdf_path), max_pages), max_chars)
+    except Exception as e:
+        logger.debug(f"Text layer extraction failed for {pdf_path}: {e}")
+        return ""
+
+
+def _box_mean(values: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over a (2r+1) square window, via an integral image"""
+    integral = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    height, width = values.shape
+    y0 = np.clip(np.arange(height) - radius, 0, height)
+    y1 = np.clip(np.arange(height) + radius + 1, 0, height)
+    x0 = np.clip(np.arange(width) - radius, 0, width)
+    x1 = np.clip(np.arange(width) + radius + 1, 0, width)
+    sums = integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0]
+    return sums / ((y1 - y0)[:, None] * (x1 - x0)[None, :])
+
+
+def image_features(image) -> Dict[str, float]:
+    """Ink, colour and stroke statistics of a page image (PIL Image)"""
+    image = image.convert("RGB")
+    image.thumbnail((ANALYSIS_EDGE, ANALYSIS_EDGE))
+    rgb = np.asarray(image, dtype=np.int16)
+    gray = np.asarray(image.convert("L"), dtype=np.float64)
+
+    # Ink is anything clearly darker than the paper around it, which copes
+    # with shadows and with photos where the page does not fill the frame.
+    local = _box_mean(gray, max(8, min(gray.shape) // 40))
+    paper = local >= 140
+    ink = paper & (gray < local - 30)
+    chroma = rgb.max(axis=2) - rgb.min(axis=2)
+
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    strong = (magnitude > 60) & paper
+    angle = np.mod(np.arctan2(gy[strong], gx[strong]), np.pi)
+    weight = magnitude[strong]
+    off_axis = np.minimum.reduce([angle, np.abs(angle - np.pi / 2), np.pi - angle])
+    axis_aligned = float((weight * (off_axis < np.pi / 12)).sum() / weight.sum()) if weight.size else 0.0
+
+    # Horizontal ink runs approximate stroke width
+    edges = np.diff(np.pad(ink, ((0, 0), (1, 1))).astype(np.int8), axis=1).ravel()
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+    return {
+        "paper_ratio": round(float(paper.mean()), 3),
+        "ink_ratio": round(float(ink.sum() / max(paper.sum(), 1)), 3),
+        "colored_ink_ratio": round(float((chroma[ink] > 50).mean()) if ink.any() else 0.0, 3),
+        "axis_aligned_ratio": round(axis_aligned, 3),
+        "stroke_width": float(np.median(runs)) if runs.size else 0.0,
+    }
+
+
+def classify_image(image) -> Tuple[str, Dict[str, float]]:
+    """Label a page image as typed or handwritten"""
+    features = image_features(image)
+    handwritten = (
+        features["axis_aligned_ratio"] < AXIS_ALIGNED_THRESHOLD
+        or features["colored_ink_ratio"] >= COLORED_INK_THRESHOLD
+    )
+    return (HANDWRITTEN if handwritten else TYPED_IMAGE), features
+
+
+def _first_page_image(reader):
+    """Largest embedded image on a scanned PDF's first page, if any"""
+    from PIL import Image
+
+    images = list(reader.pages[0].images)
+    if not images:
+        return None
+    largest = max(images, key=lambda embedded: len(embedded.data))
+    image = Image.open(io.BytesIO(largest.data))
+    if hasattr(image, "draft"):
+        image.draft("RGB", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+    return image
+
+
+def _classify_pdf(stream, file_path: str) -> Dict[str, Any]:
+    """Classify an open PDF with one reader for the sample, the full text and the page image"""
+    from PyPDF2 import PdfReader
+
+    mime_type = "application/pdf"
+    reader = PdfReader(stream)
+    pages = _page_texts(reader, file_path)
+    sample = list(itertools.islice(pages, TEXT_LAYER_PAGES))
+    text_chars = sum(ch.isalnum() for text in sample for ch in text)
+    features = {"text_chars": text_chars}
+    if text_chars >= MIN_TEXT_CHARS:
+        # Continues after the sample pages, so no page is extracted twice
+        text = _join_pages(pages, TEXT_LAYER_MAX_CHARS, texts=sample)
+        if len(text) <= TEXT_LAYER_MAX_CHARS:
+            return {"document_type": TEXT_PDF, "mime_type": mime_type, "features": features, "text": text}
+        # A real text layer: embedded images are logos, not handwriting
+        logger.info(f"ℹ️ Text layer of {file_path} exceeds {TEXT_LAYER_MAX_CHARS} chars; sending the document")
+        features["text_layer_too_long"] = True
+        return {"document_type": SCANNED_PDF, "mime_type": mime_type, "features": features}
+    try:
+        image = _first_page_image(reader)
+        if image is not None:
+            label, image_stats = classify_image(image)
+            features.update(image_stats)
+            if label == HANDWRITTEN:
+                return {"document_type": HANDWRITTEN, "mime_type": mime_type, "features": features}
+    except Exception as e:
+        logger.debug(f"Page image analysis failed for {file_path}: {e}")
+    return {"document_type": SCANNED_PDF, "mime_type": mime_type, "features": features}
+
+
+def classify_document(file_path: str) -> Dict[str, Any]:
+    """Classify a document and return its type, MIME type and features.
+
+    PDFs with a usable text layer are text_pdf and carry their full text so
+    capture can skip sending the document; text layers longer than
+    TEXT_LAYER_MAX_CHARS are scanned_pdf so the document is sent instead.
+    Other PDFs are scanned_pdf unless their page image looks handwritten.
+    Images are typed_image or handwritten.
+    Anything that cannot be analysed keeps the old extension-based label.
+    """
+    mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    lower = file_path.lower()
+
+    if lower.endswith(".pdf"):
+        try:
+            with open(file_path, "rb") as stream:
+                return _classify_pdf(stream, file_path)
+        except Exception as e:
+            logger.debug(f"PDF analysis failed for {file_path}: {e}")
+        return {"document_type": SCANNED_PDF, "mime_type": "application/pdf", "features": {}}
+
+    if lower.endswith(IMAGE_EXTENSIONS):
+        try:
+            from PIL import Image
+            with Image.open(file_path) as image:
+                if hasattr(image, "draft"):
+                    # JPEG can decode at reduced size directly
+                    image.draft("RGB", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+                label, features = classify_image(image)
+            return {"document_type": label, "mime_type": mime_type, "features": features}
+        except Exception as e:
+            logger.debug(f"Image analysis failed for {file_path}: {e}")
+        return {"document_type": HANDWRITTEN, "mime_type": mime_type, "features": {}}
+
+    # Unknown extensions keep going down the PDF path, as before
+    return {"document_type": SCANNED_PDF, "mime_type": "application/pdf", "features": {}}
@@ -2,48 +2,34 @@
 import pandas as pd
 import json
 import re
+import uuid
 from datetime import datetime
 import logging
+from utils.fx_rates import get_fx_table
+from utils.date_normalizer import date_normalizer
+from utils.normalization import normalize_record
+from utils.regex_extractor import regex_extractor
+from utils.vendor_master import normalize_vendor_name
 
 logger = logging.getLogger(__name__)
 
 def clean_extracted_data(data: dict) -> dict:
-    """Clean extracted data by removing placeholder values"""
-    cleaned = {}
-    
-    placeholder_values = [
-        'Not Found', 'Not found', 'TBD', 'To be extracted', 'To be determined',
-        'YYYY-MM-DD', 'yyyy-mm-dd', 'DD-MM-YYYY', 'mm/dd/yyyy',
-        'INVOICE_NUMBER_EXTRACTED', 'INVOICE_DATE_EXTRACTED', 'CURRENCY_EXTRACTED',
-        'TOTAL_AMOUNT_EXTRACTED', 'PAYMENT_TERMS_EXTRACTED',
-        'To be determined by OCR/extraction',
-        'TBD - to be extracted', 'pending', 'null', 'None'
-    ]
-    
-    for key, value in data.items():
-        if not value:
-            cleaned[key] = ''
-        elif isinstance(value, str):
-            # Check if it's a placeholder
-            if any(placeholder.lower() in str(value).lower() for placeholder in placeholder_values):
-                cleaned[key] = ''
-            else:
-                cleaned[key] = value.strip()
-        elif isinstance(value, (int, float)):
-            cleaned[key] = value if value != 0 else ''
-        else:
-            cleaned[key] = value
-    
-    return cleaned
+    """Normalize extracted fields for export; missing values become empty cells"""
+    return {key: '' if value is None else value for key, value in normalize_record(data).items()}
 
 def extract_invoice_data_from_json(json_str: str) -> dict:
-    """Extract invoice data from various JSON structures"""
+    """Extract invoice data from a JSON string (older results embed the payload as one)"""
     try:
         data = json.loads(json_str)
     except json.JSONDecodeError:
         logger.warning(f"JSON decode error, attempting fallback extraction")
         return extract_with_regex(json_str)
-    
+    if not isinstance(data, dict):
+        return extract_with_regex(json_str)
+    return extract_invoice_data(data)
+
+def extract_invoice_data(data: dict) -> dict:
+    """Extract invoice data from various payload structures"""
     # Initialize result
     result = {
         'vendor_name': '',
@@ -72,7 +58,7 @@ def extract_invoice_data_from_json(json_str: str) -> dict:
             'due_date': extracted.get('due_date', ''),
             'total_amount': extracted.get('total_amount', extracted.get('amount', '')),
             'tax_amount': extracted.get('tax', extracted.get('tax_amount', '')),
-            'currency': extracted.get('currency', 'USD'),
+            'currency': extracted.get('currency', ''),
             'payment_terms': extracted.get('payment_terms', '')
         })
     
@@ -86,7 +72,7 @@ def extract_invoice_data_from_json(json_str: str) -> dict:
             'due_date': data_section.get('due_date', ''),
             'total_amount': data_section.get('total_amount', data_section.get('amount', '')),
             'tax_amount': data_section.get('tax', ''),
-            'currency': data_section.get('currency', 'USD'),
+            'currency': data_section.get('currency', ''),
             'payment_terms': data_section.get('payment_terms', '')
         })
     
@@ -100,7 +86,7 @@ def extract_invoice_data_from_json(json_str: str) -> dict:
             'due_date': capture.get('due_date', ''),
             'total_amount': capture.get('total_amount', capture.get('amount', '')),
             'tax_amount': capture.get('tax', ''),
-            'currency': capture.get('currency', 'USD'),
+            'currency': capture.get('currency', ''),
             'payment_terms': capture.get('payment_terms', '')
         })
     
@@ -113,129 +99,231 @@ def extract_invoice_data_from_json(json_str: str) -> dict:
             'due_date': data.get('due_date', ''),
             'total_amount': data.get('total_amount', data.get('amount', '')),
             'tax_amount': data.get('tax', data.get('tax_amount', '')),
-            'currency': data.get('currency', 'USD'),
+            'currency': data.get('currency', ''),
             'payment_terms': data.get('payment_terms', '')
         })
     
-    # Convert amounts to numbers if they're strings
-    for amount_field in ['total_amount', 'tax_amount']:
-        if result[amount_field]:
-            try:
-                # Extract numeric value if it's a string with text
-                amount_str = str(result[amount_field])
-                # Extract numbers
-                numbers = re.findall(r'\d+\.?\d*', amount_str)
-                if numbers:
-                    result[amount_field] = float(numbers[0])
-                else:
-                    result[amount_field] = ''
-            except (ValueError, AttributeError):
-                result[amount_field] = ''
-    
-    # Clean up extracted data
+    # Placeholders dropped, amounts typed (zero amounts are kept)
     result = clean_extracted_data(result)
     
     return result
 
 def extract_with_regex(text: str) -> dict:
     """Extract invoice data using regex patterns as fallback"""
-    result = {
-        'vendor_name': '',
-        'invoice_number': '',
-        'invoice_date': '',
-        'due_date': '',
-        'total_amount': '',
-        'tax_amount': '',
-        'currency': 'USD',
-        'payment_terms': ''
-    }
+    result = {field: '' for field in (
+        'vendor_name', 'invoice_number', 'invoice_date', 'due_date',
+        'total_amount', 'tax_amount', 'currency', 'payment_terms'
+    )}
+    
+    # One precompiled scan over the text for all fields
+    for field, value in regex_extractor.extract_fields(text).items():
+        if value:
+            result[field] = value
+    
+    # Dates come back in whatever format the document used
+    for date_field in ('invoice_date', 'due_date'):
+        if result[date_field]:
+            result[date_field] = date_normalizer.normalize(result[date_field]) or result[date_field]
+    
+    return clean_extracted_data(result)
+
+def build_export_row(result: dict) -> dict:
+    """Build the Excel row for a processed invoice result"""
+    # Extract invoice data
+    payload = result.get('result')
+    if isinstance(payload, dict):
+        invoice_data = extract_invoice_data(payload)
+    elif payload:
+        invoice_data = extract_invoice_data_from_json(str(payload))
+    else:
+        invoice_data = {}
     
-    patterns = {
-        'invoice_number': [
-            r'["\']invoice[_\s]*number["\']?\s*:?\s*["\']?([A-Z0-9\-]+)["\']?',
-            r'Invoice\s*#?:?\s*([A-Z0-9\-]+)',
-            r'INV[A-Z]*[-\s]?(\d{4}[-\s]\d{4})'
-        ],
-        'vendor_name': [
-            r'["\']vendor[_\s]*name["\']?\s*:?\s*["\']?([^"\'}\n]+)["\']?',
-            r'From:\s*([^\n]+)',
-            r'Bill\s*From:\s*([^\n]+)'
-        ],
-        'invoice_date': [
-            r'["\']invoice[_\s]*date["\']?\s*:?\s*["\']?(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})["\']?',
-            r'Date:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})',
-            r'Dated:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})'
-        ],
-        'due_date': [
-            r'["\']due[_\s]*date["\']?\s*:?\s*["\']?(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})["\']?',
-            r'Due:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})',
-            r'Due\s*Date:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})'
-        ],
-        'total_amount': [
-            r'["\']total[_\s]*amount["\']?\s*:?\s*["\']?(\d+\.?\d*)["\']?',
-            r'["\']amount["\']?\s*:?\s*["\']?(\d+\.?\d*)["\']?',
-            r'Total:\s*\$?(\d+\.?\d*)',
-            r'Amount:\s*\$?(\d+\.?\d*)'
-        ],
-        'currency': [
-            r'["\']currency["\']?\s*:?\s*["\']?([A-Z]{3})["\']?'
-        ]
+    return {
+        'Processed Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'Status': result.get('status', 'unknown'),
+        'PDF Path': result.get('invoice_path', ''),
+        'Vendor Name': invoice_data.get('vendor_name', 'Unknown'),
+        'Invoice Number': invoice_data.get('invoice_number', ''),
+        'Invoice Date': invoice_data.get('invoice_date', ''),
+        'Due Date': invoice_data.get('due_date', ''),
+        'Amount': invoice_data.get('total_amount', ''),
+        'Currency': invoice_data.get('currency', ''),
+        'Tax Amount': invoice_data.get('tax_amount', ''),
+        'Payment Terms': invoice_data.get('payment_terms', ''),
+        'Model Used': result.get('model_used', 'unknown'),
+        'Processing Time': result.get('processing_time', ''),
+        'Content Hash': result.get('content_hash', '')
     }
+
+def add_base_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the amount converted to the base currency, for the whole frame at once"""
+    fx_table = get_fx_table()
+    df[f'Amount ({fx_table.base_currency})'] = fx_table.convert_frame(
+        df, amount_col='Amount', currency_col='Currency', date_col='Invoice Date'
+    )
+    return df
+
+def _append_rows(rows: list, filename: str, skip_existing: bool = False) -> str:
+    """Append rows to the workbook, creating it if needed.
     
-    for field, pattern_list in patterns.items():
-        for pattern in pattern_list:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if match:
-                result[field] = match.group(1).strip()
-                break
+    With skip_existing, rows whose Content Hash is already in the workbook
+    are dropped, so re-exporting a chunk does not duplicate it.
+    """
+    # Create DataFrame
+    df = add_base_amounts(pd.DataFrame(rows))
     
-    return result
+    # Check if file exists
+    try:
+        existing_df = pd.read_excel(filename)
+        if skip_existing and 'Content Hash' in existing_df:
+            exported = set(existing_df['Content Hash'].dropna().astype(str)) - {''}
+            duplicate = df['Content Hash'].astype(str).isin(exported)
+            if duplicate.any():
+                logger.info(f"ℹ️ Skipping {int(duplicate.sum())} row(s) already in {filename}")
+                df = df[~duplicate]
+        # Append to existing
+        df = pd.concat([existing_df, df], ignore_index=True)
+        logger.info("✅ Appended to existing Excel file")
+    except FileNotFoundError:
+        logger.info("✅ Creating new Excel file")
+    
+    # Export to Excel
+    df.to_excel(filename, index=False, sheet_name='Processed Invoices')
+    logger.info(f"✅ Exported to Excel: {filename}")
+    
+    return filename
 
 def export_to_excel(result: dict, filename: str = "processed_invoices.xlsx") -> str:
     """Export processed invoice to Excel file"""
     try:
-        # Extract invoice data
-        if result.get('result'):
-            result_str = str(result['result'])
-            invoice_data = extract_invoice_data_from_json(result_str)
-        else:
-            invoice_data = {}
-        
-        # Create row data
-        row_data = {
-            'Processed Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'Status': result.get('status', 'unknown'),
-            'PDF Path': result.get('invoice_path', ''),
-            'Vendor Name': invoice_data.get('vendor_name', 'Unknown'),
-            'Invoice Number': invoice_data.get('invoice_number', ''),
-            'Invoice Date': invoice_data.get('invoice_date', ''),
-            'Due Date': invoice_data.get('due_date', ''),
-            'Amount': invoice_data.get('total_amount', ''),
-            'Currency': invoice_data.get('currency', 'USD'),
-            'Tax Amount': invoice_data.get('tax_amount', ''),
-            'Payment Terms': invoice_data.get('payment_terms', ''),
-            'Model Used': result.get('model_used', 'unknown'),
-            'Processing Time': result.get('processing_time', '')
-        }
-        
-        # Create DataFrame
-        df = pd.DataFrame([row_data])
+        return _append_rows([build_export_row(result)], filename)
         
-        # Check if file exists
-        try:
-            existing_df = pd.read_excel(filename)
-            # Append to existing
-            df = pd.concat([existing_df, df], ignore_index=True)
-            logger.info("✅ Appended to existing Excel file")
-        except FileNotFoundError:
-            logger.info("✅ Creating new Excel file")
+    except Exception as e:
+        logger.error(f"❌ Error exporting to Excel: {str(e)}")
+        raise
+
+def export_batch_to_excel(
+    results: list, filename: str = "processed_invoices.xlsx", skip_existing: bool = False
+) -> str:
+    """Export many processed invoices with a single workbook rewrite"""
+    try:
+        if not results:
+            return filename
+        return _append_rows([build_export_row(result) for result in results], filename, skip_existing)
         
-        # Export to Excel
-        df.to_excel(filename, index=False, sheet_name='Processed Invoices')
-        logger.info(f"✅ Exported to Excel: {filename}")
+    except Exception as e:
+        logger.error(f"❌ Error exporting batch to Excel: {str(e)}")
+        raise
+
+# ============================================================================
+# PARQUET DATASET EXPORT
+# ============================================================================
+
+# Excel column -> dataset column
+PARQUET_COLUMNS = {
+    'Processed Date': 'processed_at',
+    'Status': 'status',
+    'PDF Path': 'invoice_path',
+    'Vendor Name': 'vendor_name',
+    'Invoice Number': 'invoice_number',
+    'Invoice Date': 'invoice_date',
+    'Due Date': 'due_date',
+    'Amount': 'total_amount',
+    'Currency': 'currency',
+    'Tax Amount': 'tax_amount',
+    'Payment Terms': 'payment_terms',
+    'Model Used': 'model_used',
+}
+
+PARQUET_PARTITIONS = ('month', 'vendor')
+
+def parquet_schema():
+    """Typed schema of the dataset (month and vendor are the hive partition keys)"""
+    import pyarrow as pa
+    return pa.schema([
+        ('processed_at', pa.timestamp('ms')),
+        ('status', pa.string()),
+        ('content_hash', pa.string()),
+        ('invoice_path', pa.string()),
+        ('vendor_id', pa.string()),
+        ('vendor_name', pa.string()),
+        ('invoice_number', pa.string()),
+        ('invoice_date', pa.date32()),
+        ('due_date', pa.date32()),
+        ('total_amount', pa.float64()),
+        ('tax_amount', pa.float64()),
+        ('currency', pa.string()),
+        ('amount_base', pa.float64()),
+        ('payment_terms', pa.string()),
+        ('model_used', pa.string()),
+        ('month', pa.string()),
+        ('vendor', pa.string()),
+    ], metadata={'base_currency': get_fx_table().base_currency})
+
+def _partition_value(value) -> str:
+    """Path-safe partition value; blanks go to 'unknown'"""
+    key = re.sub(r'[^a-z0-9]+', '_', str(value if pd.notna(value) else '').lower()).strip('_')[:64]
+    return key or 'unknown'
+
+def build_parquet_frame(results: list) -> pd.DataFrame:
+    """Typed, partition-keyed frame of processed invoice results"""
+    fx_table = get_fx_table()
+    df = add_base_amounts(pd.DataFrame([build_export_row(result) for result in results]))
+    df = df.rename(columns={**PARQUET_COLUMNS, f'Amount ({fx_table.base_currency})': 'amount_base'})
+    df['content_hash'] = [result.get('content_hash') for result in results]
+    df['vendor_id'] = [result.get('vendor_id') for result in results]
+    
+    df['processed_at'] = pd.to_datetime(df['processed_at'], errors='coerce')
+    for column in ('invoice_date', 'due_date'):
+        df[column] = pd.to_datetime(df[column].replace('', None), format='%Y-%m-%d', errors='coerce').dt.date
+    for column in ('total_amount', 'tax_amount', 'amount_base'):
+        df[column] = pd.to_numeric(df[column].replace('', None), errors='coerce').astype('float64')
+    text_columns = ('status', 'content_hash', 'invoice_path', 'vendor_id', 'vendor_name',
+                    'invoice_number', 'currency', 'payment_terms', 'model_used')
+    for column in text_columns:
+        df[column] = df[column].map(lambda value: None if value in (None, '') or pd.isna(value) else str(value))
+    
+    # Invoices without a readable date are filed under the month they were processed
+    months = pd.to_datetime(df['invoice_date'], errors='coerce').fillna(df['processed_at'])
+    df['month'] = months.dt.strftime('%Y-%m').fillna('unknown')
+    df['vendor'] = [
+        _partition_value(vendor_id if pd.notna(vendor_id) else normalize_vendor_name(vendor_name))
+        for vendor_id, vendor_name in zip(df['vendor_id'], df['vendor_name'].fillna(''))
+    ]
+    return df[[field.name for field in parquet_schema()]]
+
+def export_batch_to_parquet(results: list, dataset_dir: str = "processed_invoices_dataset") -> str:
+    """Append processed invoices to a Parquet dataset partitioned by month and vendor.
+    
+    Each call writes new files only (one per partition touched), so batches
+    are appended without rewriting earlier data. Readers can prune by
+    partition and read only the columns they need, e.g.
+    pd.read_parquet(dataset_dir, columns=[...], filters=[('month', '=', '2025-01')]).
+    A batch exported twice (e.g. a resumed backfill) appears twice; dedupe
+    on content_hash.
+    """
+    try:
+        if not results:
+            return dataset_dir
+        import pyarrow as pa
+        import pyarrow.dataset as ds
         
-        return filename
+        schema = parquet_schema()
+        table = pa.Table.from_pandas(build_parquet_frame(results), schema=schema, preserve_index=False)
+        ds.write_dataset(
+            table,
+            dataset_dir,
+            format='parquet',
+            partitioning=ds.partitioning(
+                pa.schema([schema.field(name) for name in PARQUET_PARTITIONS]), flavor='hive'
+            ),
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        )
+        logger.info(f"✅ Exported {len(results)} invoice(s) to Parquet dataset: {dataset_dir}")
+        return dataset_dir
         
     except Exception as e:
-        logger.error(f"❌ Error exporting to Excel: {str(e)}")
+        logger.error(f"❌ Error exporting batch to Parquet: {str(e)}")
         raise
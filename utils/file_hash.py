@@ -0,0 +1,14 @@
+"""Content hashing helpers for invoice files"""
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
@@ -0,0 +1,158 @@
+"""Date-indexed FX rate table for converting invoice amounts to a base currency"""
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FX_RATES_PATH = os.getenv("FX_RATES_PATH", "fx_rates.csv")
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "USD").upper()
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+
+
+def normalize_currency(value) -> Optional[str]:
+    """Map a currency code or symbol to an upper-case ISO code; None if unknown"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    code = str(value).strip()
+    code = CURRENCY_SYMBOLS.get(code, code).upper()
+    return code if len(code) == 3 and code.isalpha() else None
+
+
+def parse_dates(values) -> pd.Series:
+    """Parse invoice dates the same way for single and column lookups.
+
+    Only ISO 8601 is accepted (anything else is NaT); UTC offsets are
+    converted to UTC and dropped so dates compare with the rate table.
+    """
+    dates = pd.to_datetime(pd.Series(values), errors="coerce", format="ISO8601", utc=True)
+    return dates.dt.tz_localize(None).astype("datetime64[ns]")
+
+
+class FxRateTable:
+    """Daily FX rates loaded once from a CSV file.
+
+    The file has columns date, currency, rate where rate is the number of
+    base-currency units per unit of currency. An amount is converted at the
+    latest rate on or before its invoice date; undated amounts use the latest
+    rate and dates before the table starts use the earliest one.
+    """
+
+    def __init__(self, path: str = DEFAULT_FX_RATES_PATH, base_currency: str = BASE_CURRENCY):
+        self.path = path
+        self.base_currency = base_currency.upper()
+        self.rates = self._load()
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            currency: (group["date"].to_numpy(), group["rate"].to_numpy())
+            for currency, group in self.rates.groupby("currency", sort=False)
+        }
+
+    def _load(self) -> pd.DataFrame:
+        empty = pd.DataFrame({
+            "date": pd.Series(dtype="datetime64[ns]"),
+            "currency": pd.Series(dtype="object"),
+            "rate": pd.Series(dtype="float64"),
+        })
+        if not os.path.exists(self.path):
+            logger.warning(f"⚠️ No FX rate file at {self.path}; only {self.base_currency} amounts can be converted")
+            return empty
+        rates = pd.read_csv(self.path, usecols=["date", "currency", "rate"])
+        rates["date"] = pd.to_datetime(rates["date"], errors="coerce").astype("datetime64[ns]")
+        rates["currency"] = rates["currency"].map(normalize_currency)
+        rates["rate"] = pd.to_numeric(rates["rate"], errors="coerce").astype("float64")
+        rates = rates.dropna().sort_values(["date", "currency"], kind="stable").reset_index(drop=True)
+        logger.info(f"✅ Loaded {len(rates)} FX rate(s) for {rates['currency'].nunique()} currencies from {self.path}")
+        return rates if len(rates) else empty
+
+    def currencies(self):
+        return sorted(set(self._series) | {self.base_currency})
+
+    def rate(self, currency, on_date=None) -> Optional[float]:
+        """Base-currency units per unit of currency on a date; None if unknown"""
+        code = normalize_currency(currency)
+        if code is None:
+            return None
+        if code == self.base_currency:
+            return 1.0
+        if code not in self._series:
+            return None
+        dates, rates = self._series[code]
+        when = parse_dates([on_date]).iloc[0] if on_date else pd.NaT
+        if pd.isna(when):
+            return float(rates[-1])
+        index = np.searchsorted(dates, np.datetime64(when, "ns"), side="right") - 1
+        return float(rates[max(index, 0)])
+
+    def convert(self, amount, currency, on_date=None) -> Optional[float]:
+        """Convert one amount to the base currency; None if it cannot be converted"""
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            return None
+        rate = self.rate(currency, on_date)
+        return round(amount * rate, 2) if rate is not None else None
+
+    @staticmethod
+    def _normalize_column(column: pd.Series) -> np.ndarray:
+        # Normalize each distinct value once rather than every row
+        codes, uniques = pd.factorize(column)
+        normalized = np.array([normalize_currency(value) for value in uniques] + [None], dtype=object)
+        return normalized[codes]
+
+    def convert_frame(
+        self,
+        frame: pd.DataFrame,
+        amount_col: str = "total_amount",
+        currency_col: str = "currency",
+        date_col: str = "invoice_date",
+    ) -> pd.Series:
+        """Convert a whole column of amounts with one as-of join.
+
+        Returns a float Series aligned with frame; NaN where the amount or
+        currency is missing or no rate is known.
+        """
+        work = pd.DataFrame({
+            "row": np.arange(len(frame)),
+            "amount": pd.to_numeric(frame[amount_col], errors="coerce").astype("float64").to_numpy(),
+            "currency": self._normalize_column(frame[currency_col]),
+        })
+        if date_col in frame:
+            work["date"] = parse_dates(frame[date_col]).to_numpy()
+        else:
+            work["date"] = pd.NaT
+        latest = self.rates["date"].max() if len(self.rates) else pd.Timestamp.now()
+        work["date"] = work["date"].fillna(latest).astype("datetime64[ns]")
+
+        foreign = work["currency"].notna() & (work["currency"] != self.base_currency)
+        rate = pd.Series(np.nan, index=work.index)
+        rate[work["currency"] == self.base_currency] = 1.0
+
+        if foreign.any() and len(self.rates):
+            lookup = work.loc[foreign, ["row", "date", "currency"]].sort_values("date", kind="stable")
+            matched = pd.merge_asof(lookup, self.rates, on="date", by="currency", direction="backward")
+            before_table = matched["rate"].isna()
+            if before_table.any():
+                earliest = self.rates.groupby("currency")["rate"].first()
+                matched.loc[before_table, "rate"] = matched.loc[before_table, "currency"].map(earliest)
+            rate[matched["row"].to_numpy()] = matched["rate"].to_numpy()
+
+        converted = (work["amount"] * rate).round(2)
+        return pd.Series(converted.to_numpy(), index=frame.index, name=f"amount_{self.base_currency.lower()}")
+
+
+@lru_cache(maxsize=1)
+def get_fx_table() -> FxRateTable:
+    """Process-wide FX table, loaded on first use"""
+    return FxRateTable()
+
+
+def to_base_currency(invoice_data: Dict, amount_field: str = "total_amount") -> Optional[float]:
+    """Convert an invoice's amount to the base currency using the shared table"""
+    return get_fx_table().convert(
+        invoice_data.get(amount_field), invoice_data.get("currency"), invoice_data.get("invoice_date")
+    )
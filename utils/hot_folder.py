@@ -0,0 +1,458 @@
+"""Hot-folder ingestion - watches a scanner drop directory and processes new invoices"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from utils.file_hash import compute_file_hash
+from utils.profiler import request_profiler
+from utils.priority import PriorityWorkQueue, document_priority
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Failed files are retried with backoff, then left alone until they change or the watcher restarts
+MAX_ATTEMPTS = int(os.getenv("HOT_FOLDER_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("HOT_FOLDER_RETRY_BACKOFF_SECONDS", "60"))
+
+_STOP = object()
+
+
+class _DropEventHandler(FileSystemEventHandler):
+    """Forwards finished writes and moves into the watcher"""
+
+    def __init__(self, watcher: "HotFolderWatcher"):
+        self.watcher = watcher
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.watcher.submit(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.submit(event.dest_path)
+
+    def on_modified(self, event):
+        # Not every platform reports close events, so modifications are
+        # submitted too; the settle check in submit() skips partial writes.
+        if not event.is_directory:
+            self.watcher.submit(event.src_path)
+
+
+class HotFolderWatcher:
+    """Incrementally processes invoices dropped into a directory.
+
+    Files are de-duplicated by content hash, fed through a bounded worker pool
+    and recorded in a JSON checkpoint so restarts only pick up new work.
+    Waiting files are handed out by urgency (open discount deadline, due
+    date, amount) rather than arrival order.
+    """
+
+    def __init__(
+        self,
+        watch_dir: str,
+        orchestrator=None,
+        checkpoint_path: Optional[str] = None,
+        max_workers: int = 4,
+        queue_size: Optional[int] = None,
+        poll_interval: float = 2.0,
+        settle_seconds: float = 1.0,
+        checkpoint_every: int = 25,
+        excel_file: Optional[str] = "processed_invoices.xlsx",
+        use_inotify: bool = True,
+        invoice_store=None,
+        parquet_dir: Optional[str] = None,
+        parquet_batch_size: int = 50,
+        parquet_flush_seconds: float = 60.0,
+    ):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.orchestrator = orchestrator
+        self.invoice_store = invoice_store
+        self.checkpoint_path = checkpoint_path or os.path.join(self.watch_dir, ".hot_folder_checkpoint.json")
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.checkpoint_every = checkpoint_every
+        self.excel_file = excel_file
+        self.use_inotify = use_inotify and WATCHDOG_AVAILABLE
+        self.parquet_dir = parquet_dir
+        self.parquet_batch_size = parquet_batch_size
+        self.parquet_flush_seconds = parquet_flush_seconds
+
+        # Deep enough that urgent files can overtake a backlog, still bounded for discovery
+        self._queue: "queue.Queue" = PriorityWorkQueue(maxsize=queue_size or max_workers * 64)
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        # Parquet files are written per batch, not per invoice, to keep them few and large
+        self._parquet_buffer: list = []
+        self._parquet_buffered_at = 0.0
+        self._pending: set = set()
+        self._in_flight_hashes: set = set()
+        # content hash -> other paths with the same content that arrived while it was in flight
+        self._waiting_on: Dict[str, set] = {}
+        self._dirty = 0
+        self._stop_event = threading.Event()
+        self._workers: list = []
+        self._observer = None
+
+        self.stats = {"processed": 0, "skipped": 0, "failed": 0}
+        self._processed: Dict[str, Dict[str, Any]] = {}
+        self._seen: Dict[str, Tuple[int, int, str]] = {}
+        # path -> (attempts, retry_at, size, mtime_ns) for files whose processing failed
+        self._failures: Dict[str, Tuple[int, float, int, int]] = {}
+        # Files still being written, re-submitted once they have settled
+        self._settling: Dict[str, threading.Timer] = {}
+        self._load_checkpoint()
+
+    # ------------------------------------------------------------------
+    # Checkpointing
+    # ------------------------------------------------------------------
+
+    def _load_checkpoint(self):
+        """Load processed hashes and the file stat cache from disk"""
+        if not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                data = json.load(f)
+            self._processed = data.get("processed", {})
+            self._seen = {path: tuple(entry) for path, entry in data.get("seen", {}).items()}
+            logger.info(f"✅ Loaded checkpoint: {len(self._processed)} processed invoice(s)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read checkpoint {self.checkpoint_path}: {e}")
+
+    def save_checkpoint(self):
+        """Atomically write the checkpoint file"""
+        with self._lock:
+            data = {
+                "processed": dict(self._processed),
+                "seen": {path: list(entry) for path, entry in self._seen.items()},
+            }
+            self._dirty = 0
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _mark_dirty(self):
+        with self._lock:
+            self._dirty += 1
+            should_save = self._dirty >= self.checkpoint_every
+        if should_save:
+            self.save_checkpoint()
+
+    # ------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------
+
+    def is_supported(self, path: str) -> bool:
+        """Check the extension and ignore hidden/temporary files"""
+        name = os.path.basename(path)
+        return not name.startswith('.') and name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+    def submit(self, path: str) -> bool:
+        """Queue a file if it is new or changed since it was last seen"""
+        path = os.path.abspath(path)
+        if not self.is_supported(path):
+            return False
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+
+        # Scanners write in place; look again once the file has stopped changing.
+        age = time.time() - st.st_mtime
+        if age < self.settle_seconds:
+            self._resubmit_later(path, self.settle_seconds - age)
+            return False
+
+        with self._lock:
+            seen = self._seen.get(path)
+            if seen and seen[0] == st.st_size and seen[1] == st.st_mtime_ns:
+                return False
+            failure = self._failures.get(path)
+            if failure is not None:
+                attempts, retry_at, size, mtime_ns = failure
+                if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    # A rewritten file starts over
+                    del self._failures[path]
+                elif attempts >= MAX_ATTEMPTS or time.time() < retry_at:
+                    return False
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+
+        # Blocks when the pipeline is full, which throttles discovery.
+        self._queue.put(path, priority=document_priority(path))
+        return True
+
+    def _resubmit_later(self, path: str, delay: float):
+        """Submit a file again after it settles (events fire while it is still fresh)"""
+        with self._lock:
+            if path in self._settling or self._stop_event.is_set():
+                return
+            timer = threading.Timer(delay + 0.05, self._resubmit, args=(path,))
+            timer.daemon = True
+            self._settling[path] = timer
+        timer.start()
+
+    def _resubmit(self, path: str):
+        with self._lock:
+            self._settling.pop(path, None)
+        if not self._stop_event.is_set():
+            self.submit(path)
+
+    def scan(self) -> int:
+        """Walk the watch directory once and queue new or changed files"""
+        queued = 0
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and self.submit(entry.path):
+                    queued += 1
+        return queued
+
+    # ------------------------------------------------------------------
+    # Processing
+    # ------------------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if path is _STOP:
+                    return
+                self._handle(path)
+            except Exception as e:
+                logger.error(f"❌ Hot-folder worker error on {path}: {e}", exc_info=True)
+            finally:
+                if path is not _STOP:
+                    with self._lock:
+                        self._pending.discard(path)
+                self._queue.task_done()
+
+    def _handle(self, path: str):
+        try:
+            st = os.stat(path)
+            content_hash = compute_file_hash(path)
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+            if content_hash in self._in_flight_hashes:
+                # Decided once the first copy finishes: skipped if it succeeds, retried if not
+                self._waiting_on.setdefault(content_hash, set()).add(path)
+                return
+            duplicate = content_hash in self._processed
+            if duplicate:
+                self._seen[path] = (st.st_size, st.st_mtime_ns, content_hash)
+                self.stats["skipped"] += 1
+            else:
+                self._in_flight_hashes.add(content_hash)
+
+        if duplicate:
+            logger.info(f"⏭️ Already processed: {os.path.basename(path)}")
+            self._mark_dirty()
+            return
+
+        try:
+            result, profile_report = request_profiler.run(
+                request_profiler.trigger(), self.process_file, path, content_hash
+            )
+            if profile_report is not None and self.invoice_store is not None:
+                self.invoice_store.save_profile(result.get("invoice_id"), profile_report)
+        except Exception as e:
+            # A locked workbook or a store error fails this attempt like any other
+            logger.error(f"❌ Processing {os.path.basename(path)} failed: {e}", exc_info=True)
+            result = {"status": "error", "invoice_path": path, "error": str(e)}
+        finally:
+            with self._lock:
+                self._in_flight_hashes.discard(content_hash)
+                waiting = self._waiting_on.pop(content_hash, set())
+
+        with self._lock:
+            if result.get("status") == "success":
+                # Only recorded now, so a file that failed or was interrupted is picked up again
+                self._seen[path] = (st.st_size, st.st_mtime_ns, content_hash)
+                self._processed[content_hash] = {
+                    "path": path,
+                    "processed_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                self._failures.pop(path, None)
+                self.stats["processed"] += 1
+            else:
+                # Retried after a backoff; after MAX_ATTEMPTS only once the file
+                # changes or the watcher restarts (failures are not checkpointed)
+                attempts = self._failures.get(path, (0,))[0] + 1
+                retry_at = time.time() + RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                self._failures[path] = (attempts, retry_at, st.st_size, st.st_mtime_ns)
+                self.stats["failed"] += 1
+        if result.get("status") != "success" and attempts < MAX_ATTEMPTS:
+            self._resubmit_later(path, retry_at - time.time())
+        for other in waiting:
+            self._resubmit_later(other, 0.0)
+        self._mark_dirty()
+
+    def process_file(self, path: str, content_hash: str) -> Dict[str, Any]:
+        """Run a single invoice through the orchestrator and export it"""
+        logger.info(f"📥 New invoice: {os.path.basename(path)}")
+        result = self.orchestrator.process_invoice(path)
+        result["content_hash"] = content_hash
+        if self.invoice_store is not None:
+            record = self.invoice_store.save_result(result)
+            result.update({"invoice_id": record["invoice_id"], "possible_duplicates": record["duplicates"]})
+
+        if result.get("status") == "success" and self.excel_file:
+            from utils.excel_exporter import export_to_excel
+            # The workbook is rewritten on every export, so exports are serialized.
+            with self._export_lock:
+                export_to_excel(result, self.excel_file)
+        if result.get("status") == "success" and self.parquet_dir:
+            with self._export_lock:
+                if not self._parquet_buffer:
+                    self._parquet_buffered_at = time.monotonic()
+                self._parquet_buffer.append(result)
+            self.flush_parquet()
+        return result
+
+    def flush_parquet(self, force: bool = False):
+        """Write buffered results to the Parquet dataset once the batch is full or old enough"""
+        with self._export_lock:
+            if not self._parquet_buffer:
+                return
+            age = time.monotonic() - self._parquet_buffered_at
+            if not force and len(self._parquet_buffer) < self.parquet_batch_size and age < self.parquet_flush_seconds:
+                return
+            from utils.excel_exporter import export_batch_to_parquet
+            batch, self._parquet_buffer = self._parquet_buffer, []
+            try:
+                export_batch_to_parquet(batch, self.parquet_dir)
+            except Exception as e:
+                # Keep the results for the next flush; a failed write must not
+                # fail whichever invoice happened to trigger it, or stop the watcher
+                self._parquet_buffer = batch + self._parquet_buffer
+                self._parquet_buffered_at = time.monotonic()
+                logger.error(f"❌ Parquet export of {len(batch)} result(s) failed; will retry: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker pool and the filesystem observer"""
+        if self.orchestrator is None:
+            from agents.orchestrator import InvoiceOrchestrator
+            self.orchestrator = InvoiceOrchestrator()
+        if self.invoice_store is None:
+            from utils.invoice_store import InvoiceStore
+            self.invoice_store = InvoiceStore()
+
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker, name=f"hot-folder-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+        if self.use_inotify:
+            self._observer = Observer()
+            self._observer.schedule(_DropEventHandler(self), self.watch_dir, recursive=False)
+            self._observer.start()
+            logger.info(f"👀 Watching {self.watch_dir} (inotify)")
+        else:
+            logger.info(f"👀 Watching {self.watch_dir} (polling every {self.poll_interval}s)")
+
+    def run_once(self):
+        """Process everything currently in the folder, then stop"""
+        self.start()
+        queued = self.scan()
+        logger.info(f"📂 Queued {queued} file(s)")
+        self.stop()
+
+    def run_forever(self):
+        """Watch the folder until interrupted"""
+        self.start()
+        self.scan()
+        # Events can be missed (network shares, files still settling), so a
+        # periodic rescan runs even when inotify is active.
+        rescan_interval = self.poll_interval if not self.use_inotify else max(self.poll_interval, 30.0)
+        try:
+            while not self._stop_event.wait(rescan_interval):
+                self.scan()
+                self.flush_parquet()
+        except KeyboardInterrupt:
+            logger.info("🛑 Stopping hot-folder watcher")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Drain the pipeline and write a final checkpoint"""
+        self._stop_event.set()
+        with self._lock:
+            timers, self._settling = list(self._settling.values()), {}
+        for timer in timers:
+            timer.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        self._queue.join()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for t in self._workers:
+            t.join()
+        self._workers = []
+        self.flush_parquet(force=True)
+        self.save_checkpoint()
+        logger.info(
+            f"✅ Hot folder done: {self.stats['processed']} processed, "
+            f"{self.stats['skipped']} skipped, {self.stats['failed']} failed"
+        )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Watch a folder and process dropped invoices")
+    parser.add_argument("watch_dir", nargs="?", default=os.getenv("HOT_FOLDER_DIR", "tests/sample_invoices"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HOT_FOLDER_WORKERS", "4")))
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <watch_dir>/.hot_folder_checkpoint.json)")
+    parser.add_argument("--excel", default="processed_invoices.xlsx")
+    parser.add_argument("--parquet", default=None, help="Also append to a Parquet dataset in this directory")
+    parser.add_argument("--polling", action="store_true", help="Force polling instead of inotify")
+    parser.add_argument("--once", action="store_true", help="Process the current folder contents and exit")
+    args = parser.parse_args()
+
+    watcher = HotFolderWatcher(
+        args.watch_dir,
+        checkpoint_path=args.checkpoint,
+        max_workers=args.workers,
+        poll_interval=args.poll_interval,
+        excel_file=args.excel,
+        use_inotify=not args.polling,
+        parquet_dir=args.parquet,
+    )
+    if args.once:
+        watcher.run_once()
+    else:
+        watcher.run_forever()
@@ -0,0 +1,383 @@
+"""Indexed SQLite result store - the system of record for processed invoices"""
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INVOICE_DB_PATH = os.getenv("INVOICE_DB_PATH", "invoices.db")
+# WAL needs shared memory on one host; use DELETE when the database is on a network volume
+DEFAULT_JOURNAL_MODE = os.getenv("INVOICE_DB_JOURNAL_MODE", "WAL")
+JOURNAL_MODES = ("WAL", "DELETE", "TRUNCATE", "PERSIST")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT,
+    invoice_path TEXT,
+    status TEXT NOT NULL,
+    vendor_name TEXT,
+    vendor_id TEXT,
+    invoice_number TEXT,
+    invoice_date TEXT,
+    due_date TEXT,
+    total_amount REAL,
+    tax_amount REAL,
+    currency TEXT,
+    payment_terms TEXT,
+    model_used TEXT,
+    result_json TEXT NOT NULL,
+    stages_json TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_content_hash ON invoices (content_hash);
+CREATE INDEX IF NOT EXISTS idx_invoices_vendor_id ON invoices (vendor_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_vendor_name ON invoices (vendor_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_invoices_invoice_number ON invoices (invoice_number, vendor_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_due_date ON invoices (due_date);
+CREATE TABLE IF NOT EXISTS line_items (
+    invoice_id INTEGER NOT NULL REFERENCES invoices (id),
+    line_no INTEGER NOT NULL,
+    description TEXT,
+    quantity REAL,
+    unit_price REAL,
+    line_total REAL,
+    PRIMARY KEY (invoice_id, line_no)
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_id INTEGER REFERENCES invoices (id),
+    trigger TEXT,
+    wall_seconds REAL,
+    peak_memory_bytes INTEGER,
+    report_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_invoice_id ON profiles (invoice_id);
+"""
+
+INVOICE_FIELDS = (
+    "vendor_name", "invoice_number", "invoice_date", "due_date",
+    "total_amount", "tax_amount", "currency", "payment_terms",
+)
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_line_items(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pull the extracted line items out of an orchestrator result"""
+    payload = result.get("result") or {}
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = {}
+    items = []
+    for item in payload.get("line_items") or []:
+        if not isinstance(item, dict):
+            continue
+        items.append({
+            "description": item.get("description"),
+            "quantity": _to_float(item.get("quantity")),
+            "unit_price": _to_float(item.get("unit_price")),
+            "line_total": _to_float(item.get("line_total")),
+        })
+    return items
+
+
+def parse_invoice_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Pull the extracted fields out of an orchestrator result"""
+    payload = result.get("result") or {}
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = {}
+    fields = {field: payload.get(field) for field in INVOICE_FIELDS}
+    fields["total_amount"] = _to_float(fields["total_amount"])
+    fields["tax_amount"] = _to_float(fields["tax_amount"])
+    return fields
+
+
+class InvoiceStore:
+    """Stores every processed invoice with its stage outputs.
+
+    Vendor, invoice number, due date and content hash are indexed so status
+    lookups, duplicate checks and reports are queries rather than workbook scans.
+    """
+
+    def __init__(self, path: str = DEFAULT_INVOICE_DB_PATH, journal_mode: str = DEFAULT_JOURNAL_MODE):
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported journal mode: {journal_mode}")
+        self.path = path
+        self.journal_mode = journal_mode.upper()
+        with self._connect() as conn:
+            mode = conn.execute(f"PRAGMA journal_mode={self.journal_mode}").fetchone()[0]
+            if mode.upper() != self.journal_mode:
+                # Switching out of WAL needs every other connection closed
+                logger.warning(f"⚠️ {path} is still in {mode} mode (wanted {self.journal_mode}); close other users and retry")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record an orchestrator result; returns its ID and any likely duplicates"""
+        with self._connect() as conn:
+            record = self.insert_result(conn, result)
+        if record["duplicates"]:
+            logger.warning(f"⚠️ Invoice {record['invoice_id']} looks like a duplicate of {record['duplicates']}")
+        return record
+
+    def insert_result(self, conn: sqlite3.Connection, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a result inside the caller's transaction (e.g. with a work queue update)"""
+        fields = parse_invoice_fields(result)
+        row = {
+            "content_hash": result.get("content_hash"),
+            "invoice_path": result.get("invoice_path"),
+            "status": result.get("status", "unknown"),
+            "vendor_id": result.get("vendor_id"),
+            "model_used": result.get("model_used"),
+            "result_json": json.dumps(result, default=str),
+            "stages_json": json.dumps(result["stages"], default=str) if result.get("stages") else None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            **fields,
+        }
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        cursor = conn.execute(f"INSERT INTO invoices ({columns}) VALUES ({placeholders})", tuple(row.values()))
+        invoice_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO line_items (invoice_id, line_no, description, quantity, unit_price, line_total) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (invoice_id, line_no, item["description"], item["quantity"], item["unit_price"], item["line_total"])
+                for line_no, item in enumerate(parse_line_items(result), 1)
+            ],
+        )
+        return {"invoice_id": invoice_id, "duplicates": self._duplicates(conn, invoice_id, row)}
+
+    def _duplicates(self, conn: sqlite3.Connection, invoice_id: int, row: Dict[str, Any]) -> List[int]:
+        """Earlier successful invoices with the same content or the same vendor + number"""
+        clauses, params = [], []
+        if row.get("content_hash"):
+            clauses.append("content_hash = ?")
+            params.append(row["content_hash"])
+        if row.get("invoice_number") and (row.get("vendor_id") or row.get("vendor_name")):
+            if row.get("vendor_id"):
+                clauses.append("(invoice_number = ? AND vendor_id = ?)")
+                params.extend([row["invoice_number"], row["vendor_id"]])
+            else:
+                clauses.append("(invoice_number = ? AND vendor_name = ? COLLATE NOCASE)")
+                params.extend([row["invoice_number"], row["vendor_name"]])
+        if not clauses:
+            return []
+        query = f"SELECT id FROM invoices WHERE id != ? AND status = 'success' AND ({' OR '.join(clauses)}) ORDER BY id"
+        return [r["id"] for r in conn.execute(query, [invoice_id] + params)]
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record["result"] = json.loads(record.pop("result_json"))
+        payload = record["result"].get("result")
+        if isinstance(payload, str):
+            # Rows stored before the payload became a nested object
+            try:
+                record["result"]["result"] = json.loads(payload)
+            except ValueError:
+                pass
+        stages = record.pop("stages_json")
+        record["stages"] = json.loads(stages) if stages else None
+        return record
+
+    def get(self, invoice_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Latest record for a file's content hash"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM invoices WHERE content_hash = ? ORDER BY id DESC LIMIT 1", (content_hash,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def query(
+        self,
+        vendor_name: Optional[str] = None,
+        vendor_id: Optional[str] = None,
+        invoice_number: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        status: Optional[str] = None,
+        due_after: Optional[str] = None,
+        due_before: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        include_result: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Filter invoices on indexed columns; dates are ISO YYYY-MM-DD strings"""
+        clauses, params = [], []
+        for column, value in (
+            ("vendor_id", vendor_id),
+            ("invoice_number", invoice_number),
+            ("content_hash", content_hash),
+            ("status", status),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if vendor_name is not None:
+            clauses.append("vendor_name = ? COLLATE NOCASE")
+            params.append(vendor_name)
+        if due_after is not None:
+            clauses.append("due_date >= ?")
+            params.append(due_after)
+        if due_before is not None:
+            clauses.append("due_date <= ?")
+            params.append(due_before)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM invoices {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+
+        records = [self._row_to_dict(row) for row in rows]
+        if not include_result:
+            for record in records:
+                record.pop("result", None)
+                record.pop("stages", None)
+        return records
+
+    def line_items(self, invoice_id: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT line_no, description, quantity, unit_price, line_total FROM line_items "
+                "WHERE invoice_id = ? ORDER BY line_no",
+                (invoice_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def save_profile(self, invoice_id: Optional[int], report: Dict[str, Any]) -> int:
+        """Store a profiling report next to the invoice it was taken for"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO profiles (invoice_id, trigger, wall_seconds, peak_memory_bytes, report_json, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    invoice_id,
+                    report.get("trigger"),
+                    report.get("wall_seconds"),
+                    report.get("process_peak_memory_bytes"),
+                    json.dumps(report, default=str),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            return cursor.lastrowid
+
+    def profiles(self, invoice_id: int) -> List[Dict[str, Any]]:
+        """Profiling reports taken for an invoice, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, report_json, created_at FROM profiles WHERE invoice_id = ? ORDER BY id DESC",
+                (invoice_id,),
+            ).fetchall()
+        return [dict(json.loads(row["report_json"]), profile_id=row["id"], created_at=row["created_at"]) for row in rows]
+
+    def reconcile(self, status: Optional[str] = "success"):
+        """Reconcile line items against totals for every stored invoice in one pass"""
+        from utils.line_items import reconcile
+        import pandas as pd
+
+        where = "WHERE status = ?" if status else ""
+        params = [status] if status else []
+        with self._connect() as conn:
+            invoices = pd.read_sql_query(
+                f"SELECT id AS invoice_key, total_amount, tax_amount FROM invoices {where}", conn, params=params
+            )
+            lines = pd.read_sql_query(
+                "SELECT invoice_id AS invoice_key, line_no, quantity, unit_price, line_total FROM line_items", conn
+            )
+        lines = lines[lines["invoice_key"].isin(invoices["invoice_key"])]
+        for column in ("total_amount", "tax_amount"):
+            invoices[column] = invoices[column].astype("float64")
+        for column in ("quantity", "unit_price", "line_total"):
+            lines[column] = lines[column].astype("float64")
+        return reconcile(invoices, lines).rename(columns={"invoice_key": "invoice_id"})
+
+    def export_to_excel(self, filename: str = "processed_invoices.xlsx", **filters) -> str:
+        """Export stored invoices to a fresh workbook"""
+        from utils.excel_exporter import build_export_row, add_base_amounts
+        import pandas as pd
+
+        records = self.query(include_result=True, limit=-1, **filters)
+        rows = [build_export_row(record["result"]) for record in reversed(records)]
+        add_base_amounts(pd.DataFrame(rows)).to_excel(filename, index=False, sheet_name='Processed Invoices')
+        logger.info(f"✅ Exported {len(rows)} invoice(s) to Excel: {filename}")
+        return filename
+
+    def export_to_parquet(self, dataset_dir: str = "processed_invoices_dataset", **filters) -> str:
+        """Append stored invoices to a Parquet dataset partitioned by month and vendor"""
+        from utils.excel_exporter import export_batch_to_parquet
+
+        records = self.query(include_result=True, limit=-1, **filters)
+        results = [record["result"] for record in reversed(records)]
+        return export_batch_to_parquet(results, dataset_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Export the invoice result store to Excel")
+    parser.add_argument("filename", nargs="?", default="processed_invoices.xlsx")
+    parser.add_argument("--reconcile", action="store_true", help="Report line-item mismatches instead of exporting")
+    parser.add_argument("--parquet", default=None, help="Export to a Parquet dataset in this directory instead of Excel")
+    parser.add_argument("--db", default=DEFAULT_INVOICE_DB_PATH)
+    parser.add_argument("--vendor-name", default=None)
+    parser.add_argument("--due-after", default=None)
+    parser.add_argument("--due-before", default=None)
+    args = parser.parse_args()
+
+    store = InvoiceStore(args.db)
+    if args.reconcile:
+        report = store.reconcile()
+        mismatches = report[report["status"] == "mismatch"]
+        logger.info(f"📊 {len(mismatches)} of {len(report)} invoice(s) do not reconcile")
+        if not mismatches.empty:
+            print(mismatches.to_string(index=False))
+    elif args.parquet:
+        store.export_to_parquet(
+            args.parquet,
+            vendor_name=args.vendor_name,
+            due_after=args.due_after,
+            due_before=args.due_before,
+        )
+    else:
+        store.export_to_excel(
+            args.filename,
+            vendor_name=args.vendor_name,
+            due_after=args.due_after,
+            due_before=args.due_before,
+        )
@@ -0,0 +1,93 @@
+"""Shared job/result store so status lookups work across API worker processes"""
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    filename TEXT,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    worker_pid INTEGER,
+    result_json TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash);
+"""
+
+
+class JobStore:
+    """SQLite-backed job table shared by all workers on a node.
+
+    WAL mode lets readers in every worker see committed updates while one
+    writer at a time records progress.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _now(self) -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def create(self, job_id: str, filename: str, content_hash: str):
+        now = self._now()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, filename, content_hash, status, worker_pid, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'processing', ?, ?, ?)",
+                (job_id, filename, content_hash, os.getpid(), now, now),
+            )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        status = "completed" if result.get("status") == "success" else "failed"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result_json = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result, default=str), result.get("error"), self._now(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, status: str = "failed"):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, self._now(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a job by ID, or the latest job for a content hash"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE content_hash = ? ORDER BY created_at DESC LIMIT 1", (job_id,)
+                ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job.pop("result_json")) if job.get("result_json") else None
+        return job
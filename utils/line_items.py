@@ -0,0 +1,133 @@
+"""Line-item tables and vectorized arithmetic reconciliation"""
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LINE_ITEM_COLUMNS = ["invoice_key", "line_no", "description", "quantity", "unit_price", "line_total"]
+
+# Differences are tolerated up to the larger of a per-line rounding allowance
+# and a fraction of the amount being checked
+ABSOLUTE_TOLERANCE = 0.01
+RELATIVE_TOLERANCE = 0.0005
+
+
+def _payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    payload = result.get("result") or {}
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = {}
+    return payload
+
+
+def build_frames(results: List[Dict[str, Any]], key_field: str = "invoice_path"):
+    """Build columnar invoice and line-item tables from orchestrator results.
+
+    Returns (invoices, lines): one row per invoice with total/tax, and one row
+    per line item keyed back to its invoice.
+    """
+    invoice_cols = {"invoice_key": [], "total_amount": [], "tax_amount": []}
+    line_cols = {column: [] for column in LINE_ITEM_COLUMNS}
+
+    for i, result in enumerate(results):
+        payload = _payload(result)
+        key = result.get(key_field) or i
+        invoice_cols["invoice_key"].append(key)
+        invoice_cols["total_amount"].append(payload.get("total_amount"))
+        invoice_cols["tax_amount"].append(payload.get("tax_amount"))
+
+        for line_no, item in enumerate(payload.get("line_items") or [], 1):
+            if not isinstance(item, dict):
+                continue
+            line_cols["invoice_key"].append(key)
+            line_cols["line_no"].append(line_no)
+            line_cols["description"].append(item.get("description"))
+            line_cols["quantity"].append(item.get("quantity"))
+            line_cols["unit_price"].append(item.get("unit_price"))
+            line_cols["line_total"].append(item.get("line_total"))
+
+    invoices = pd.DataFrame(invoice_cols)
+    lines = pd.DataFrame(line_cols)
+    for frame, columns in ((invoices, ["total_amount", "tax_amount"]),
+                           (lines, ["quantity", "unit_price", "line_total"])):
+        for column in columns:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    return invoices, lines
+
+
+def reconcile(
+    invoices: pd.DataFrame,
+    lines: pd.DataFrame,
+    absolute_tolerance: float = ABSOLUTE_TOLERANCE,
+    relative_tolerance: float = RELATIVE_TOLERANCE,
+) -> pd.DataFrame:
+    """Check sum(quantity x unit_price) + tax == total for every invoice at once.
+
+    Lines without quantity/unit price fall back to their stated line total.
+    Returns one row per invoice with the computed figures, the number of
+    lines whose own arithmetic is off, and a status of match, mismatch,
+    no_line_items or missing_total.
+    """
+    lines = lines.copy()
+    extended = lines["quantity"] * lines["unit_price"]
+    lines["line_value"] = extended.fillna(lines["line_total"])
+    line_tolerance = np.maximum(absolute_tolerance, relative_tolerance * lines["line_total"].abs())
+    lines["line_mismatch"] = (extended - lines["line_total"]).abs() > line_tolerance
+
+    per_invoice = lines.groupby("invoice_key", sort=False).agg(
+        line_count=("line_no", "size"),
+        lines_total=("line_value", "sum"),
+        line_mismatches=("line_mismatch", "sum"),
+    )
+
+    report = invoices.set_index("invoice_key").join(per_invoice, how="left")
+    report["line_count"] = report["line_count"].fillna(0).astype("int64")
+    report["line_mismatches"] = report["line_mismatches"].fillna(0).astype("int64")
+    report["expected_total"] = report["lines_total"] + report["tax_amount"].fillna(0.0)
+    report["difference"] = report["total_amount"] - report["expected_total"]
+
+    tolerance = np.maximum(
+        absolute_tolerance * (report["line_count"] + 1),
+        relative_tolerance * report["total_amount"].abs(),
+    )
+    mismatch = report["difference"].abs() > tolerance
+    report["status"] = np.select(
+        [report["line_count"] == 0, report["total_amount"].isna(), mismatch | (report["line_mismatches"] > 0)],
+        ["no_line_items", "missing_total", "mismatch"],
+        default="match",
+    )
+    return report.reset_index()
+
+
+def reconcile_results(results: List[Dict[str, Any]], key_field: str = "invoice_path") -> pd.DataFrame:
+    """Reconcile a batch of orchestrator results"""
+    invoices, lines = build_frames(results, key_field)
+    report = reconcile(invoices, lines)
+    mismatches = int((report["status"] == "mismatch").sum())
+    if mismatches:
+        logger.warning(f"⚠️ {mismatches} of {len(report)} invoice(s) failed line-item reconciliation")
+    return report
+
+
+def reconcile_invoice(invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconcile a single invoice's extracted fields"""
+    report = reconcile_results([{"invoice_path": "invoice", "result": invoice_data}])
+    row = report.iloc[0]
+
+    def _clean(value) -> Optional[float]:
+        return None if pd.isna(value) else round(float(value), 2)
+
+    return {
+        "status": row["status"],
+        "line_count": int(row["line_count"]),
+        "line_mismatches": int(row["line_mismatches"]),
+        "lines_total": _clean(row["lines_total"]),
+        "expected_total": _clean(row["expected_total"]),
+        "difference": _clean(row["difference"]),
+    }
@@ -0,0 +1,59 @@
+"""Per-worker memory budget that queues large jobs instead of running them together"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBudget:
+    """Weighted semaphore over an estimated byte budget.
+
+    Each job reserves its estimated peak memory; jobs wait while the budget is
+    exhausted. A job larger than the whole budget is admitted alone rather than
+    rejected, so very large scans still complete, just serially.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.in_use = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int) -> int:
+        """Block until nbytes fit in the budget; returns the amount reserved"""
+        nbytes = max(0, min(int(nbytes), self.budget_bytes))
+        with self._cond:
+            if self.in_use + nbytes > self.budget_bytes:
+                self.waiting += 1
+                start = time.monotonic()
+                try:
+                    self._cond.wait_for(lambda: self.in_use + nbytes <= self.budget_bytes)
+                finally:
+                    self.waiting -= 1
+                logger.info(f"⏳ Waited {time.monotonic() - start:.1f}s for {nbytes / 1e6:.0f} MB of memory budget")
+            self.in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self.in_use -= nbytes
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        reserved = self.acquire(nbytes)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"budget_bytes": self.budget_bytes, "in_use_bytes": self.in_use, "waiting": self.waiting}
+
+
+# Shared by all capture calls in this worker process
+capture_memory_budget = MemoryBudget(int(float(os.getenv("CAPTURE_MEMORY_BUDGET_MB", "512")) * 1024 * 1024))
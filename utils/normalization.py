@@ -0,0 +1,122 @@
+"""Shared normalization of extracted invoice values - placeholders, whitespace and typed amounts"""
+import math
+import re
+from typing import Dict, Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Values the model writes when it could not read a field. A value is a
+# placeholder only if it matches as a whole, so "Pending Supplies Ltd" stays.
+PLACEHOLDER_PATTERNS = (
+    r"not\s+(?:found|available|provided|specified)",
+    r"to\s+be\s+(?:extracted|determined)(?:\s+by\s+.*)?",
+    r"tbd(?:\s*-.*)?",
+    r"[a-z]+(?:_[a-z]+)*_extracted",
+    r"(?:yyyy|dd|mm)[-/.](?:mm|dd)[-/.](?:yyyy|yy|dd)",
+    r"n/a", r"none", r"null", r"unknown", r"pending",
+    r"-+", r"\?+",
+)
+PLACEHOLDER_PATTERN = re.compile(r"\s*(?:" + "|".join(PLACEHOLDER_PATTERNS) + r")\s*", re.IGNORECASE)
+
+# Fields read as numbers, at any depth (line items included)
+AMOUNT_FIELDS = frozenset({
+    "total_amount", "tax_amount", "amount", "tax", "subtotal",
+    "quantity", "unit_price", "line_total",
+})
+
+# A sign or accounting parentheses may sit on either side of the currency:
+# "-$1,234.56", "$-1,234.56", "($1,234.56)", "USD -1.234,56". Exponents ("1e3") are read in full.
+_NUMBER_PATTERN = re.compile(
+    r"(?P<open>\()?\s*(?P<sign>[-\u2212\u2013])?\s*(?:[$\u20ac\u00a3\u00a5\u20b9]|[A-Za-z]{3}\b)?\s*"
+    r"(?P<inner_sign>[-\u2212\u2013])?\s*"
+    r"(?P<number>\d{1,3}(?:['\s]\d{3})+(?:[.,]\d+)?|\d[\d.,]*)"
+    r"(?P<exponent>[eE][-+]?\d+)?"
+    r"\s*(?:[$\u20ac\u00a3\u00a5\u20b9]|[A-Za-z]{3}\b)?\s*(?P<close>\))?"
+)
+
+
+def is_placeholder(value) -> bool:
+    return isinstance(value, str) and PLACEHOLDER_PATTERN.fullmatch(value) is not None
+
+
+def _decimal_string(number: str) -> str:
+    """'1.234,56' / '1,234.56' / "1'234.56" -> '1234.56'"""
+    number = re.sub(r"['\s]", "", number).rstrip(".,")
+    if "," in number and "." in number:
+        decimal = "," if number.rfind(",") > number.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        return number.replace(thousands, "").replace(decimal, ".")
+    if "," in number:
+        head, _, tail = number.rpartition(",")
+        # A single comma before one or two digits is a decimal comma
+        if number.count(",") == 1 and len(tail) in (1, 2):
+            return f"{head}.{tail}"
+        return number.replace(",", "")
+    if number.count(".") > 1:
+        return number.replace(".", "")
+    return number
+
+
+def parse_amount(value) -> Optional[float]:
+    """Read an amount as a float; zero is kept, unreadable values give None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return None if math.isnan(value) else float(value)
+    text = str(value).strip()
+    if not text or is_placeholder(text):
+        return None
+    match = _NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    negative = bool(match.group("sign") or match.group("inner_sign") or (match.group("open") and match.group("close")))
+    try:
+        amount = float(_decimal_string(match.group("number")) + (match.group("exponent") or ""))
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def normalize_value(value, field: Optional[str] = None):
+    """Normalize one value: amounts typed, text stripped, placeholders to None"""
+    if field in AMOUNT_FIELDS:
+        return parse_amount(value)
+    if isinstance(value, str):
+        value = value.strip()
+        return None if not value or is_placeholder(value) else value
+    if isinstance(value, dict):
+        return normalize_record(value)
+    if isinstance(value, list):
+        return [normalize_value(item) for item in value]
+    return value
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize every field of an extracted record (nested line items included)"""
+    return {key: normalize_value(value, key) for key, value in record.items()}
+
+
+def normalize_column(values, field: Optional[str] = None) -> pd.Series:
+    """Normalize a whole column; each distinct value is normalized once"""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype="object")
+    try:
+        codes, uniques = pd.factorize(series)
+    except TypeError:
+        # Unhashable values (e.g. line item lists) are normalized row by row
+        return series.map(lambda value: normalize_value(value, field))
+    normalized = [normalize_value(value, field) for value in uniques]
+    if field in AMOUNT_FIELDS:
+        lookup = np.array([np.nan if v is None else v for v in normalized] + [np.nan], dtype="float64")
+        return pd.Series(lookup[codes], index=series.index, dtype="float64")
+    lookup = np.empty(len(normalized) + 1, dtype="object")
+    lookup[:] = normalized + [None]
+    return pd.Series(lookup[codes], index=series.index, dtype="object")
+
+
+def normalize_frame(frame: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Normalize the given columns (default: all) of a frame of extracted fields"""
+    normalized = frame.copy()
+    for column in (columns if columns is not None else frame.columns):
+        normalized[column] = normalize_column(frame[column], column)
+    return normalized
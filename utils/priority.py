@@ -0,0 +1,101 @@
+"""Priority scheduling - invoices whose discount or due date is closest go to the model first"""
+import itertools
+import logging
+import math
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Invoices with no readable terms are treated as due this many days after arrival
+DEFAULT_HORIZON_DAYS = float(os.getenv("PRIORITY_DEFAULT_HORIZON_DAYS", "30"))
+# Each tenfold increase in money at stake counts as a deadline this many hours sooner
+AMOUNT_WEIGHT_HOURS = float(os.getenv("PRIORITY_AMOUNT_WEIGHT_HOURS", "6"))
+# Seconds of deadline credit per second spent waiting; bounds how long anything can wait
+AGING_RATE = float(os.getenv("PRIORITY_AGING_RATE", "1.0"))
+
+
+def document_hints(path: str) -> Dict[str, Any]:
+    """Cheap pre-extraction from a PDF's text layer: dates, terms and total (empty for scans)"""
+    if not path.lower().endswith(".pdf"):
+        return {}
+    from utils.document_classifier import extract_text_layer
+    from utils.regex_extractor import regex_extractor
+
+    text = extract_text_layer(path)
+    if not text.strip():
+        return {}
+    found = regex_extractor.extract_fields(text)
+    return {
+        field: found.get(field)
+        for field in ("invoice_date", "due_date", "payment_terms", "total_amount")
+        if found.get(field)
+    }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+
+def priority_for(hints: Dict[str, Any], enqueued_at: Optional[float] = None) -> float:
+    """Scheduling key for an invoice; lower runs first.
+
+    The deadline is the discount deadline while a discount is still open,
+    else the due date, else DEFAULT_HORIZON_DAYS after arrival. Money at
+    stake pulls it earlier by AMOUNT_WEIGHT_HOURS per factor of ten.
+
+    Aging: waiting w seconds earns AGING_RATE * w seconds of credit, i.e.
+    key(now) = deadline - boost - AGING_RATE * (now - enqueued_at). The
+    now-term is the same for every waiting item, so ordering only needs
+    the fixed part, deadline - boost + AGING_RATE * enqueued_at. Newcomers
+    arrive with a later enqueued_at, so no item can be overtaken forever.
+    """
+    from utils.date_normalizer import invoice_payment_schedule
+    from utils.normalization import parse_amount
+
+    enqueued_at = time.time() if enqueued_at is None else enqueued_at
+    deadline, at_stake = None, 0.0
+    if hints:
+        schedule = invoice_payment_schedule({**hints, "total_amount": parse_amount(hints.get("total_amount"))})
+        discount_deadline = _timestamp(schedule.get("discount_deadline"))
+        due_date = _timestamp(schedule.get("due_date"))
+        if discount_deadline is not None and discount_deadline >= enqueued_at and schedule.get("discount_amount"):
+            deadline, at_stake = discount_deadline, schedule["discount_amount"]
+        elif due_date is not None:
+            deadline = due_date
+            at_stake = parse_amount(hints.get("total_amount")) or 0.0
+    if deadline is None:
+        deadline = enqueued_at + DEFAULT_HORIZON_DAYS * 86400
+    # Past-due invoices are as urgent as something due right now
+    deadline = max(deadline, enqueued_at)
+    boost = AMOUNT_WEIGHT_HOURS * 3600 * math.log10(1 + max(at_stake, 0.0))
+    return deadline - boost + AGING_RATE * enqueued_at
+
+
+def document_priority(path: str, enqueued_at: Optional[float] = None) -> float:
+    """Scheduling key for a file on disk; unreadable files get the default horizon"""
+    try:
+        hints = document_hints(path)
+    except Exception as e:
+        logger.debug(f"Priority hints failed for {path}: {e}")
+        hints = {}
+    return priority_for(hints, enqueued_at)
+
+
+class PriorityWorkQueue(queue.PriorityQueue):
+    """queue.Queue drop-in that hands out the most urgent item first (FIFO on ties)"""
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._sequence = itertools.count()
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None, priority: float = math.inf):
+        super().put((priority, next(self._sequence), item), block, timeout)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        return super().get(block, timeout)[2]
@@ -0,0 +1,188 @@
+"""Opt-in request profiling - cProfile hotspots and tracemalloc peak memory"""
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# PROFILE_REQUESTS=1 profiles everything; PROFILE_SAMPLE_EVERY=N profiles 1 in N
+PROFILE_ALL = os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "25"))
+# Clients may ask for a profile with X-Profile: <token>; unset, the header is ignored
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+# Self time is attributed to the first area whose markers appear in
+# "<file>:<function>"; builtins show up as "~:<built-in method ...>".
+PROFILE_AREAS = (
+    ("model_call", ("google/generativeai", "google/ai/", "google/api_core", "grpc", "httpx", "httpcore",
+                    "urllib3", "requests/", "ssl", "socket")),
+    ("regex", ("re.Pattern", "_sre", "/re/", "/re.py", "sre_")),
+    ("base64", ("base64", "binascii")),
+    ("excel", ("openpyxl", "pandas/io/excel", "xlsxwriter")),
+    ("document_parsing", ("PyPDF2", "pypdf", "PIL/", "document_classifier")),
+    ("database", ("sqlite3",)),
+    ("file_io", ("_io.", "io.open", "posix.", "/os.py", "mmap", "shutil")),
+)
+
+
+def _area(file_name: str, function: str) -> str:
+    location = f"{file_name}:{function}"
+    for area, markers in PROFILE_AREAS:
+        if any(marker in location for marker in markers):
+            return area
+    return "other"
+
+
+class RequestProfiler:
+    """Profiles selected calls, one at a time.
+
+    A call is profiled when the caller asks for it, when PROFILE_REQUESTS is
+    set, or for every Nth call under PROFILE_SAMPLE_EVERY. Only one call is
+    profiled at a time; a call selected while another is being profiled
+    just runs normally.
+
+    tracemalloc is process-wide, so the memory figures cover every call that
+    overlapped the profiled one. The report names them process_* and counts
+    the overlapping calls in concurrent_calls; only with concurrent_calls 0
+    are they this call's own.
+    """
+
+    def __init__(
+        self,
+        profile_all: bool = PROFILE_ALL,
+        sample_every: int = PROFILE_SAMPLE_EVERY,
+        top_functions: int = PROFILE_TOP_FUNCTIONS,
+        token: str = PROFILE_TOKEN,
+    ):
+        self.profile_all = profile_all
+        self.sample_every = sample_every
+        self.top_functions = top_functions
+        self.token = token
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._running = 0
+        self._profiling = False
+        self._overlapping = 0
+        self.stats = {"profiled": 0, "skipped_busy": 0}
+
+    def requested(self, header_value: Optional[str]) -> bool:
+        """Whether an X-Profile header carries the configured token"""
+        if not self.token or not header_value:
+            return False
+        return hmac.compare_digest(header_value.strip().encode(), self.token.encode())
+
+    def trigger(self, requested: bool = False) -> Optional[str]:
+        """Why this call should be profiled ("request", "env", "sample"), or None"""
+        if requested:
+            return "request"
+        if self.profile_all:
+            return "env"
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return "sample"
+        return None
+
+    def run(self, trigger: Optional[str], fn: Callable, *args, **kwargs) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """Call fn, profiling it if trigger is set; returns (result, report or None)"""
+        with self._stats_lock:
+            self._running += 1
+            if self._profiling:
+                self._overlapping += 1
+        try:
+            if trigger is not None:
+                if self._active.acquire(blocking=False):
+                    try:
+                        return self._profile(trigger, fn, *args, **kwargs)
+                    finally:
+                        self._active.release()
+                with self._stats_lock:
+                    self.stats["skipped_busy"] += 1
+            return fn(*args, **kwargs), None
+        finally:
+            with self._stats_lock:
+                self._running -= 1
+
+    def _profile(self, trigger: str, fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+        with self._stats_lock:
+            self._profiling = True
+            # Calls already running overlap this one too
+            self._overlapping = self._running - 1
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+            profiler = cProfile.Profile()
+            wall_started = time.perf_counter()
+            cpu_started = time.thread_time()
+            profiler.enable()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                wall = time.perf_counter() - wall_started
+                cpu = time.thread_time() - cpu_started
+                current, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+        finally:
+            with self._stats_lock:
+                self._profiling = False
+                concurrent_calls = self._overlapping
+
+        report = {
+            "trigger": trigger,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "process_peak_memory_bytes": max(peak - baseline, 0),
+            "process_retained_memory_bytes": current - baseline,
+            "concurrent_calls": concurrent_calls,
+            **self._summarize(profiler),
+        }
+        with self._stats_lock:
+            self.stats["profiled"] += 1
+        logger.info(
+            f"🔬 Profiled ({trigger}): {report['wall_seconds']}s wall, "
+            f"{report['process_peak_memory_bytes'] / 1e6:.1f} MB process peak, {concurrent_calls} concurrent call(s)"
+        )
+        return result, report
+
+    def _summarize(self, profiler: cProfile.Profile) -> Dict[str, Any]:
+        """Self time per area and the top functions by cumulative time"""
+        entries = pstats.Stats(profiler).stats
+        areas: Dict[str, float] = {}
+        functions: List[Dict[str, Any]] = []
+        for (file_name, line, function), (_, calls, self_time, cumulative, _) in entries.items():
+            area = _area(file_name, function)
+            areas[area] = areas.get(area, 0.0) + self_time
+            functions.append({
+                "function": function,
+                "location": f"{file_name}:{line}",
+                "area": area,
+                "calls": calls,
+                "self_seconds": round(self_time, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            })
+        functions.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+        return {
+            "areas": {area: round(seconds, 4) for area, seconds in sorted(areas.items(), key=lambda a: -a[1])},
+            "top_functions": functions[:self.top_functions],
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self.stats, profile_all=self.profile_all, sample_every=self.sample_every,
+                        header_enabled=bool(self.token))
+
+
+request_profiler = RequestProfiler()
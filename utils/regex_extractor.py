@@ -0,0 +1,126 @@
+"""Precompiled single-scan regex extractor - local fallback and pre-fill for model extraction"""
+import re
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.date_normalizer import DATE_TOKEN
+
+AMOUNT_TOKEN = r"\d[\d,]*(?:\.\d+)?"
+
+# Every pattern starts at a word boundary with a quote or one of these
+# labels. Checking that first lets the scan skip most positions without
+# trying each alternative, and keeps "Subtotal:" from matching "Total:".
+ANCHOR = r"(?<![A-Za-z0-9_])(?=[\"']|inv|bill|from|dat|due|grand|total|amount|tax|vat|gst|payment|terms)"
+
+# A label that starts another field; free-text values end before one, so
+# single-line OCR ("From: Acme Corp  Invoice #: 12345  Date: ...") keeps
+# every field
+NEXT_LABEL = (
+    r"(?:invoice\s*(?:#|no\.?|number|date)|date|dated|due(?:\s*date)?|(?:grand\s*)?total(?:\s*due)?"
+    r"|amount(?:\s*due)?|tax|vat|gst|(?:payment\s*)?terms|bill\s*(?:from|to)|ship\s*to|from)\s*:"
+)
+# Free text up to the end of the line, a column gap or the next label
+FREE_TEXT = r"[^\n]+?(?=[ \t]{2,}|\t|[ \t]+" + NEXT_LABEL + r"|[ \t\r]*$)"
+
+# (field, pattern, confidence); each pattern has one group, the value.
+# Within a field, patterns are listed from most to least specific.
+FIELD_PATTERNS: Tuple[Tuple[str, str, float], ...] = (
+    ("invoice_number", r'["\']invoice[_\s]*number["\']?\s*:?\s*["\']?([A-Z0-9\-]+)["\']?', 0.9),
+    ("invoice_number", r'Invoice\s*(?:#|No\.?|Number)?:?\s*([A-Z0-9\-]*\d[A-Z0-9\-]*)', 0.7),
+    ("invoice_number", r'INV[A-Z]*[-\s]?(\d{4}[-\s]\d{4})', 0.5),
+    ("vendor_name", r'["\']vendor[_\s]*name["\']?\s*:?\s*["\']?([^"\'}\n]+)["\']?', 0.9),
+    ("vendor_name", r'Bill\s*From:\s*(' + FREE_TEXT + r')', 0.7),
+    ("vendor_name", r'From:\s*(' + FREE_TEXT + r')', 0.6),
+    ("invoice_date", r'["\']invoice[_\s]*date["\']?\s*:?\s*["\']?(' + DATE_TOKEN + r')["\']?', 0.9),
+    ("invoice_date", r'(?<!due )(?:Invoice\s*)?Date:\s*(' + DATE_TOKEN + r')', 0.7),
+    ("invoice_date", r'Dated:\s*(' + DATE_TOKEN + r')', 0.7),
+    ("due_date", r'["\']due[_\s]*date["\']?\s*:?\s*["\']?(' + DATE_TOKEN + r')["\']?', 0.9),
+    ("due_date", r'Due\s*Date:\s*(' + DATE_TOKEN + r')', 0.8),
+    ("due_date", r'Due:\s*(' + DATE_TOKEN + r')', 0.7),
+    ("total_amount", r'["\']total[_\s]*amount["\']?\s*:?\s*["\']?(' + AMOUNT_TOKEN + r')["\']?', 0.9),
+    ("total_amount", r'["\']amount["\']?\s*:?\s*["\']?(' + AMOUNT_TOKEN + r')["\']?', 0.8),
+    ("total_amount", r'(?:Grand\s*)?Total(?:\s*Due)?:\s*[$€£]?\s*(' + AMOUNT_TOKEN + r')', 0.7),
+    ("total_amount", r'Amount(?:\s*Due)?:\s*[$€£]?\s*(' + AMOUNT_TOKEN + r')', 0.6),
+    ("tax_amount", r'["\']tax[_\s]*amount["\']?\s*:?\s*["\']?(' + AMOUNT_TOKEN + r')["\']?', 0.9),
+    ("tax_amount", r'(?:Tax|VAT|GST)(?:\s*\(\s*\d+(?:\.\d+)?\s*%\s*\))?:\s*[$€£]?\s*(' + AMOUNT_TOKEN + r')', 0.7),
+    ("currency", r'["\']currency["\']?\s*:?\s*["\']?([A-Z]{3})["\']?', 0.9),
+    ("payment_terms", r'["\']payment[_\s]*terms["\']?\s*:?\s*["\']?([^"\'}\n]+)["\']?', 0.9),
+    ("payment_terms", r'(?:Payment\s*)?Terms:\s*(' + FREE_TEXT + r')', 0.7),
+)
+
+class RegexExtractor:
+    """Extracts all fields in one pass over the text.
+
+    Every pattern is a named alternative of one compiled regex, so the text
+    is scanned once instead of once per pattern. Alternatives sit inside a
+    zero-width lookahead, so a match does not consume its text and labels
+    inside it (e.g. "Terms: Net 30 Due Date: ...") are still tried. For
+    each field the match from its most specific pattern wins, earliest
+    position first; the scan stops as soon as every field has a match from
+    its best pattern.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str, float]] = FIELD_PATTERNS, anchor: str = ANCHOR):
+        self.patterns = list(patterns)
+        self.fields = tuple(dict.fromkeys(field for field, _, _ in self.patterns))
+        alternatives = [f"(?P<p{i}>{pattern})" for i, (_, pattern, _) in enumerate(self.patterns)]
+        self.regex = re.compile(f"{anchor}(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE | re.MULTILINE)
+        # Rank of each pattern within its field (0 = most specific)
+        self._rank = {}
+        seen: Dict[str, int] = {}
+        for i, (field, _, _) in enumerate(self.patterns):
+            self._rank[f"p{i}"] = seen.get(field, 0)
+            seen[field] = seen.get(field, 0) + 1
+        self._index = {f"p{i}": i for i in range(len(self.patterns))}
+        # The value is the only group inside each alternative
+        self._value_group = {name: number + 1 for name, number in self.regex.groupindex.items()}
+
+    def extract(self, text: str) -> Dict[str, Dict[str, Any]]:
+        """Best match per field: {field: {value, start, end, confidence}}"""
+        best: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        if not text:
+            return {}
+        for match in self.regex.finditer(text):
+            name = match.lastgroup
+            i = self._index[name]
+            field, _, confidence = self.patterns[i]
+            rank = self._rank[name]
+            if field in best and best[field][0] <= rank:
+                continue
+            value_group = self._value_group[name]
+            value = match.group(value_group)
+            if value is None or not value.strip():
+                continue
+            best[field] = (rank, {
+                "value": value.strip(),
+                "start": match.start(value_group),
+                "end": match.end(value_group),
+                "confidence": confidence,
+            })
+            if len(best) == len(self.fields) and all(r == 0 for r, _ in best.values()):
+                break
+        return {field: found for field, (_, found) in best.items()}
+
+    def extract_fields(self, text: str) -> Dict[str, Optional[str]]:
+        """Field values only; None where nothing matched"""
+        found = self.extract(text)
+        return {field: found[field]["value"] if field in found else None for field in self.fields}
+
+    def extract_batch(self, texts: Iterable[str]) -> pd.DataFrame:
+        """One row per document: each field's value and a <field>_confidence column"""
+        texts = texts if isinstance(texts, pd.Series) else pd.Series(list(texts), dtype="object")
+        rows: List[Dict[str, Any]] = []
+        for text in texts:
+            found = self.extract(text if isinstance(text, str) else "")
+            row: Dict[str, Any] = {}
+            for field in self.fields:
+                row[field] = found[field]["value"] if field in found else None
+                row[f"{field}_confidence"] = found[field]["confidence"] if field in found else 0.0
+            rows.append(row)
+        return pd.DataFrame(rows, index=texts.index, columns=[
+            column for field in self.fields for column in (field, f"{field}_confidence")
+        ])
+
+
+regex_extractor = RegexExtractor()
@@ -0,0 +1,196 @@
+"""Response format negotiation - JSON, msgpack, NDJSON and Arrow IPC, optionally gzip/zstd compressed"""
+import gzip
+import json
+import logging
+import math
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Media types clients may ask for, mapped to the format that answers them
+MEDIA_TYPES = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/vnd.apache.arrow.stream": ARROW,
+}
+
+# NDJSON and Arrow are one record per line/row, so they only suit list responses
+RECORD_FORMATS = (NDJSON, ARROW)
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def available_formats(records: bool) -> Tuple[str, ...]:
+    formats = [JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if records:
+        formats.append(NDJSON)
+        if pa is not None:
+            formats.append(ARROW)
+    return tuple(formats)
+
+
+def _parse_header(value: Optional[str]) -> List[Tuple[str, float]]:
+    """'a/b;q=0.5, c/d' -> [('a/b', 0.5), ('c/d', 1.0)], best first (ties keep header order)"""
+    entries = []
+    for position, part in enumerate((value or "").split(",")):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, number = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        entries.append((-quality, position, name.lower()))
+    return [(name, -negative) for negative, _, name in sorted(entries)]
+
+
+def negotiate_format(accept: Optional[str], records: bool = False) -> str:
+    """Pick the response format from an Accept header; JSON unless something better is asked for"""
+    formats = available_formats(records)
+    for media_type, quality in _parse_header(accept):
+        if quality <= 0:
+            continue
+        if media_type in ("*/*", "application/*"):
+            return JSON
+        chosen = MEDIA_TYPES.get(media_type)
+        if chosen in formats:
+            return chosen
+    return JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header (None = identity)"""
+    supported = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    for coding, quality in _parse_header(accept_encoding):
+        if quality <= 0:
+            continue
+        if coding in supported:
+            return coding
+        if coding == "*":
+            return supported[0]
+    return None
+
+
+def _default(value):
+    """Encode the values json/msgpack do not know natively"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _json_bytes(payload) -> bytes:
+    return json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _arrow_column(values: List[Any]):
+    """Typed Arrow column; columns whose values do not share a type are sent as JSON text"""
+    cleaned = [None if isinstance(v, float) and math.isnan(v) else v for v in values]
+    try:
+        return pa.array(cleaned)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+        return pa.array([None if v is None else _json_bytes(v).decode("utf-8") for v in cleaned], pa.string())
+
+
+def arrow_table(records: List[Dict[str, Any]]):
+    columns: Dict[str, List[Any]] = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, [])
+    for name, values in columns.items():
+        values.extend(record.get(name) for record in records)
+    return pa.table({name: _arrow_column(values) for name, values in columns.items()})
+
+
+def encode(payload: Dict[str, Any], media_type: str, records_key: Optional[str] = None) -> bytes:
+    """Serialize a response body.
+
+    NDJSON and Arrow carry only payload[records_key] (one record per line
+    or row); the rest of the envelope goes in headers, see
+    envelope_headers().
+    """
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, default=_default, use_bin_type=True)
+    if media_type == NDJSON:
+        records = payload.get(records_key) or []
+        return b"".join(_json_bytes(record) + b"\n" for record in records)
+    if media_type == ARROW:
+        table = arrow_table(payload.get(records_key) or [])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return _json_bytes(payload)
+
+
+def envelope_headers(payload: Dict[str, Any], records_key: str) -> Dict[str, str]:
+    """Scalar envelope fields (status, count, ...) as X-Result-* headers"""
+    headers = {}
+    for key, value in payload.items():
+        if key != records_key and isinstance(value, (str, int, float, bool)):
+            headers[f"X-Result-{key.replace('_', '-').title()}"] = str(value)
+    return headers
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+def render(
+    payload: Dict[str, Any],
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    records_key: Optional[str] = None,
+) -> Tuple[bytes, Dict[str, str]]:
+    """Negotiate, serialize and compress; returns (body, headers incl. Content-Type)"""
+    media_type = negotiate_format(accept, records=records_key is not None)
+    body = encode(payload, media_type, records_key)
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    if media_type in RECORD_FORMATS:
+        headers.update(envelope_headers(payload, records_key))
+    body, content_encoding = compress(body, negotiate_encoding(accept_encoding))
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return body, headers
@@ -0,0 +1,72 @@
+"""In-flight request coalescing and idempotency caching for the API"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as its own task; every caller
+    (the first one included) awaits that task and receives the same result
+    (or exception). The task outlives any single caller, so a caller that is
+    cancelled (e.g. its client disconnected) neither cancels the others nor
+    the run itself.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved in case every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Task, bool]:
+        """Join the run for key, starting fn if there is none; returns (task, shared)"""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+        return task, shared
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn once per key; returns (result, shared)"""
+        task, shared = self.start(key, fn)
+        # shield() so a cancelled caller does not cancel the shared run.
+        return await asyncio.shield(task), shared
+
+
+class IdempotencyCache:
+    """Bounded TTL cache of completed responses keyed by Idempotency-Key"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        """Return (fingerprint, response) for a live key"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, fingerprint, response = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return fingerprint, response
+
+    def put(self, key: str, fingerprint: str, response: Any):
+        self._entries[key] = (time.monotonic(), fingerprint, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
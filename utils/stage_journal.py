@@ -0,0 +1,84 @@
+"""Write-ahead journal of per-stage results, so batch runs can resume mid-document"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CAPTURE = "capture"
+
+
+class StageJournal:
+    """Append-only JSONL journal of completed stages, keyed by document.
+
+    Each record is one line, flushed and fsynced before the stage counts as
+    done, so a crash loses at most the stage that was running. On open the
+    journal is replayed into memory; a torn final line is ignored and that
+    stage simply runs again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"recorded": 0, "replayed": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._entries.setdefault(record["key"], {})[record["stage"]] = record["output"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+        if self._entries:
+            logger.info(f"✅ Journal: {len(self._entries)} document(s) with completed stages")
+
+    def get(self, key: str, stage: str) -> Optional[Any]:
+        """Output of a completed stage, or None if it has not run"""
+        with self._lock:
+            output = self._entries.get(key, {}).get(stage)
+            if output is not None:
+                self.stats["replayed"] += 1
+            return output
+
+    def completed(self, key: str) -> set:
+        with self._lock:
+            return set(self._entries.get(key, {}))
+
+    def record(self, key: str, stage: str, output: Any):
+        """Durably record a stage's output before moving on"""
+        line = json.dumps({"key": key, "stage": stage, "output": output, "at": time.time()}, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries.setdefault(key, {})[stage] = json.loads(line)["output"]
+            self.stats["recorded"] += 1
+
+    def compact(self, drop: Iterable[str] = ()):
+        """Rewrite the journal without the given documents (e.g. already exported)"""
+        drop = set(drop)
+        with self._lock:
+            for key in drop:
+                self._entries.pop(key, None)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                for key, stages in self._entries.items():
+                    for stage, output in stages.items():
+                        f.write(json.dumps({"key": key, "stage": stage, "output": output}, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        logger.info(f"✅ Journal compacted: {len(self._entries)} document(s) kept")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
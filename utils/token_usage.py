@@ -0,0 +1,82 @@
+"""Per-call token accounting for model requests"""
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("token_usage_scope", default=None)
+
+USAGE_FIELDS = (
+    "prompt_token_count",
+    "candidates_token_count",
+    "cached_content_token_count",
+    "total_token_count",
+)
+
+
+class TokenUsageTracker:
+    """Process-wide token totals, broken down by agent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.by_agent: Dict[str, Dict[str, int]] = {}
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.calls += 1
+            totals = self.by_agent.setdefault(record["agent"], {"calls": 0, **{f: 0 for f in USAGE_FIELDS}})
+            totals["calls"] += 1
+            for field in USAGE_FIELDS:
+                totals[field] += record.get(field, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "by_agent": {k: dict(v) for k, v in self.by_agent.items()}}
+
+
+tracker = TokenUsageTracker()
+
+
+def record_usage(agent: str, model_name: str, response, prompt_version: Optional[str] = None) -> Dict[str, Any]:
+    """Record the usage metadata of a model response"""
+    metadata = getattr(response, "usage_metadata", None)
+    record = {"agent": agent, "model": model_name}
+    if prompt_version:
+        record["prompt_version"] = prompt_version
+    for field in USAGE_FIELDS:
+        record[field] = int(getattr(metadata, field, 0) or 0) if metadata is not None else 0
+
+    tracker.add(record)
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.append(record)
+    logger.debug(
+        f"🔢 {agent}: {record['prompt_token_count']} prompt / "
+        f"{record['candidates_token_count']} response tokens"
+    )
+    return record
+
+
+@contextmanager
+def usage_scope():
+    """Collect the usage records of all model calls made inside the block"""
+    records: List[Dict[str, Any]] = []
+    token = _current_scope.set(records)
+    try:
+        yield records
+    finally:
+        _current_scope.reset(token)
+
+
+def summarize_usage(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals for a list of usage records (e.g. one invoice)"""
+    summary = {"calls": len(records), **{field: 0 for field in USAGE_FIELDS}}
+    for record in records:
+        for field in USAGE_FIELDS:
+            summary[field] += record.get(field, 0)
+    summary["per_call"] = records
+    return summary
@@ -0,0 +1,272 @@
+"""Vendor master - canonical vendors, aliases and fast fuzzy name resolution"""
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MASTER_PATH = os.getenv("VENDOR_MASTER_PATH", "vendor_master.json")
+DEFAULT_MATCH_THRESHOLD = float(os.getenv("VENDOR_MATCH_THRESHOLD", "0.8"))
+
+LEGAL_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'llp', 'lp', 'ltd', 'limited', 'corp', 'corporation',
+    'co', 'company', 'plc', 'gmbh', 'ag', 'sa', 'sarl', 'bv', 'nv', 'pty', 'pvt', 'srl', 'oy', 'ab',
+}
+
+FUZZY_CACHE_SIZE = 50000
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_VENDOR_ID = re.compile(r'V(\d+)')
+
+
+def normalize_vendor_name(name: Optional[str]) -> str:
+    """Normalize a vendor name for matching.
+
+    Strips accents, punctuation, a leading "the" and trailing legal suffixes,
+    so "The ACME Corp., Inc." and "Acme" normalize to the same key.
+    """
+    if not name:
+        return ''
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = text.replace('&', ' and ')
+    tokens = _NON_ALNUM.sub(' ', text).split()
+    if tokens and tokens[0] == 'the' and len(tokens) > 1:
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens)
+
+
+def trigrams(key: str) -> set:
+    """Padded character trigrams of a normalized key"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VendorIndex:
+    """In-memory exact + trigram index over normalized vendor names.
+
+    Fuzzy lookups use prefix filtering: any name reaching the Dice threshold
+    must share at least one of the query's rarest trigrams, so only those
+    posting lists are scanned and candidates are verified by set overlap.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, str] = {}
+        self._postings: Dict[str, set] = defaultdict(set)
+        self._grams: Dict[str, frozenset] = {}
+        # Extracted names repeat heavily across invoices, so fuzzy results are memoized
+        self._fuzzy_cache: Dict[tuple, Optional[Dict[str, Any]]] = {}
+
+    def add(self, key: str, vendor_id: str):
+        if not key or key in self._exact:
+            return
+        self._exact[key] = vendor_id
+        self._fuzzy_cache.clear()
+        grams = frozenset(trigrams(key))
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def lookup(self, key: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """Return the best match for a normalized key, or None"""
+        if not key:
+            return None
+        vendor_id = self._exact.get(key)
+        if vendor_id is not None:
+            return {"vendor_id": vendor_id, "matched_key": key, "score": 1.0, "match_type": "exact"}
+
+        cache_key = (key, threshold)
+        if cache_key in self._fuzzy_cache:
+            return self._fuzzy_cache[cache_key]
+        match = self._fuzzy_lookup(key, threshold)
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[cache_key] = match
+        return match
+
+    def _fuzzy_lookup(self, key: str, threshold: float) -> Optional[Dict[str, Any]]:
+        grams = trigrams(key)
+        size = len(grams)
+        # Dice >= t implies overlap >= t*|A|/(2-t) and bounds the candidate size
+        min_overlap = max(1, math.ceil(threshold * size / (2.0 - threshold)))
+        min_size = threshold * size / (2.0 - threshold)
+        max_size = size * (2.0 - threshold) / threshold if threshold > 0 else float('inf')
+
+        ordered = sorted(grams, key=lambda g: len(self._postings.get(g, ())))
+        prefix = ordered[:size - min_overlap + 1]
+
+        best_key, best_score = None, 0.0
+        checked = set()
+        for gram in prefix:
+            for candidate in self._postings.get(gram, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                candidate_grams = self._grams[candidate]
+                if not min_size <= len(candidate_grams) <= max_size:
+                    continue
+                # Dice coefficient over trigram sets
+                score = 2.0 * len(grams & candidate_grams) / (size + len(candidate_grams))
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+        if best_key is None or best_score < threshold:
+            return None
+        return {
+            "vendor_id": self._exact[best_key],
+            "matched_key": best_key,
+            "score": round(best_score, 4),
+            "match_type": "fuzzy",
+        }
+
+
+class VendorMaster:
+    """Persistent vendor master backed by a JSON file"""
+
+    def __init__(self, path: str = DEFAULT_MASTER_PATH, match_threshold: float = DEFAULT_MATCH_THRESHOLD):
+        self.path = path
+        self.match_threshold = match_threshold
+        self.vendors: Dict[str, Dict[str, Any]] = {}
+        self.index = VendorIndex()
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the vendor file and rebuild the index"""
+        self.vendors = {}
+        self.index = VendorIndex()
+        self._last_id = 0
+        if not os.path.exists(self.path):
+            logger.info(f"ℹ️ No vendor master at {self.path}; starting empty")
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        for vendor in data.get("vendors", []):
+            self._index_vendor(vendor)
+        logger.info(f"✅ Loaded {len(self.vendors)} vendor(s) from {self.path}")
+
+    def save(self):
+        """Atomically write the vendor file"""
+        with self._lock:
+            data = {"vendors": list(self.vendors.values())}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _index_vendor(self, vendor: Dict[str, Any]):
+        self.vendors[vendor["vendor_id"]] = vendor
+        numbered = _VENDOR_ID.fullmatch(str(vendor["vendor_id"]))
+        if numbered:
+            self._last_id = max(self._last_id, int(numbered.group(1)))
+        for name in [vendor["name"]] + vendor.get("aliases", []):
+            self.index.add(normalize_vendor_name(name), vendor["vendor_id"])
+
+    def _next_vendor_id(self) -> str:
+        # Numbered after the highest existing ID so gaps and explicit IDs are never reused
+        return f"V{self._last_id + 1:06d}"
+
+    def add_vendor(self, name: str, aliases: Optional[List[str]] = None, vendor_id: Optional[str] = None) -> str:
+        """Register a canonical vendor and return its ID.
+
+        Raises ValueError if an explicit vendor_id is already registered; use
+        add_alias to extend an existing vendor.
+        """
+        with self._lock:
+            if vendor_id is not None and vendor_id in self.vendors:
+                raise ValueError(f"Vendor {vendor_id} already exists ({self.vendors[vendor_id]['name']})")
+            vendor_id = vendor_id or self._next_vendor_id()
+            vendor = {"vendor_id": vendor_id, "name": name, "aliases": list(aliases or [])}
+            self._index_vendor(vendor)
+        return vendor_id
+
+    def add_alias(self, vendor_id: str, alias: str):
+        """Attach an alternative spelling to an existing vendor"""
+        with self._lock:
+            vendor = self.vendors[vendor_id]
+            if alias not in vendor["aliases"]:
+                vendor["aliases"].append(alias)
+            self.index.add(normalize_vendor_name(alias), vendor_id)
+
+    def import_csv(self, csv_path: str) -> Dict[str, int]:
+        """Load vendors from a CSV with columns name, aliases and optional vendor_id.
+
+        Aliases are separated by "|". A row whose vendor_id, or whose name
+        when it has no ID, is already known merges its aliases into that
+        vendor, so importing the same file twice changes nothing.
+        """
+        counts = {"added": 0, "merged": 0}
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("name") or "").strip()
+                if not name:
+                    continue
+                aliases = [alias.strip() for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+                vendor_id = (row.get("vendor_id") or "").strip() or None
+                if vendor_id is None:
+                    vendor_id = self.index.lookup(normalize_vendor_name(name), 1.0)
+                    vendor_id = vendor_id["vendor_id"] if vendor_id else None
+                if vendor_id in self.vendors:
+                    for alias in [name] + aliases:
+                        if alias != self.vendors[vendor_id]["name"]:
+                            self.add_alias(vendor_id, alias)
+                    counts["merged"] += 1
+                else:
+                    self.add_vendor(name, aliases=aliases, vendor_id=vendor_id)
+                    counts["added"] += 1
+        logger.info(f"✅ Imported {csv_path}: {counts['added']} added, {counts['merged']} merged")
+        return counts
+
+    def resolve(self, vendor_name: Optional[str]) -> Dict[str, Any]:
+        """Resolve an extracted vendor name to a canonical vendor.
+
+        Returns vendor_id/canonical_name (None when unmatched), the match
+        score and type, and is_new_vendor for exception handling.
+        """
+        key = normalize_vendor_name(vendor_name)
+        match = self.index.lookup(key, self.match_threshold)
+        if match is None:
+            return {
+                "vendor_id": None,
+                "canonical_name": None,
+                "normalized_name": key,
+                "score": 0.0,
+                "match_type": "none",
+                "is_new_vendor": bool(key),
+            }
+        return {
+            "vendor_id": match["vendor_id"],
+            "canonical_name": self.vendors[match["vendor_id"]]["name"],
+            "normalized_name": key,
+            "score": match["score"],
+            "match_type": match["match_type"],
+            "is_new_vendor": False,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Populate the vendor master from a CSV export")
+    parser.add_argument("csv_path", help="CSV with columns name, aliases (| separated), vendor_id (optional)")
+    parser.add_argument("--master", default=DEFAULT_MASTER_PATH, help="Vendor master JSON file")
+    args = parser.parse_args()
+
+    master = VendorMaster(args.master)
+    counts = master.import_csv(args.csv_path)
+    master.save()
+    print(dict(counts, vendors=len(master.vendors)))
@@ -0,0 +1,393 @@
+"""Lease-based work queue - spreads invoices across worker machines via a shared SQLite store"""
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from utils.file_hash import compute_file_hash
+from utils.priority import document_priority
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "120"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("WORK_QUEUE_RETRY_BACKOFF_SECONDS", "30"))
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    vendor_name TEXT,
+    status TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    invoice_id INTEGER,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_claim ON work_items (status, priority, available_at);
+CREATE INDEX IF NOT EXISTS idx_work_items_lease ON work_items (status, lease_expires);
+"""
+
+
+class LeaseLostError(Exception):
+    """The lease expired and the item was claimed by another worker"""
+
+
+class WorkQueue:
+    """Work queue stored next to the results, in the invoice store's database.
+
+    Workers claim an item with a time-limited lease and renew it while the
+    model runs. A worker that dies simply stops renewing, and the item is
+    claimed again once the lease expires. Items are claimed most urgent
+    first (see utils.priority), with aging so nothing waits forever. Completing an item checks the lease
+    and inserts the result in the same transaction, so each invoice's result
+    is recorded exactly once even if a slow worker loses its lease.
+
+    The database is meant to sit on a volume shared by several machines,
+    so it must use a rollback journal: WAL keeps its index in shared
+    memory, which only works between processes on one host, and over a
+    network filesystem the BEGIN IMMEDIATE locking behind the lease and
+    exactly-once guarantees can break and corrupt the file. Pass an
+    InvoiceStore opened with journal_mode="DELETE" (or set
+    INVOICE_DB_JOURNAL_MODE=DELETE for every process using the file).
+    """
+
+    def __init__(self, invoice_store, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        if invoice_store.journal_mode == "WAL":
+            logger.warning(
+                f"⚠️ {invoice_store.path} uses WAL, which is unsafe on shared volumes; "
+                "open the store with journal_mode='DELETE' for multi-machine queues"
+            )
+        self.invoice_store = invoice_store
+        self.path = invoice_store.path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(work_items)")}
+            if columns and "priority" not in columns:
+                # Queues created before priority scheduling
+                conn.execute("ALTER TABLE work_items ADD COLUMN priority REAL NOT NULL DEFAULT 0")
+                conn.execute("DROP INDEX IF EXISTS idx_work_items_claim")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _now(self) -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def enqueue(
+        self,
+        path: str,
+        content_hash: Optional[str] = None,
+        vendor_name: Optional[str] = None,
+        priority: Optional[float] = None,
+    ) -> Optional[int]:
+        """Queue a document; returns its item ID, or None if that content is already queued.
+
+        priority defaults to the document's urgency from its text-layer hints.
+        """
+        content_hash = content_hash or compute_file_hash(path)
+        enqueued_at = time.time()
+        if priority is None:
+            priority = document_priority(path, enqueued_at)
+        now = self._now()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO work_items (content_hash, path, vendor_name, status, priority, max_attempts, "
+                "available_at, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (content_hash, path, vendor_name, priority, self.max_attempts, enqueued_at, now, now),
+            )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Lease the most urgent available item (or one whose lease expired); None if idle"""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._connect() as conn:
+            # Take the write lock first so two workers cannot pick the same row
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE work_items SET status = 'failed', error = COALESCE(error, 'lease expired'), "
+                "lease_owner = NULL, lease_token = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (self._now(), now),
+            )
+            row = conn.execute(
+                "SELECT id FROM work_items WHERE (status = 'queued' AND available_at <= ?) "
+                "OR (status = 'leased' AND lease_expires < ?) ORDER BY priority, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_token = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, token, now + lease_seconds, self._now(), row["id"]),
+            )
+            item = conn.execute("SELECT * FROM work_items WHERE id = ?", (row["id"],)).fetchone()
+        return dict(item)
+
+    def renew(self, item_id: int, lease_token: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend a lease; False if it was lost to another worker"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                (time.time() + lease_seconds, self._now(), item_id, lease_token),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, item_id: int, lease_token: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the result and close the item in one transaction.
+
+        Raises LeaseLostError if the lease is no longer held, in which case
+        nothing is recorded.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            held = conn.execute(
+                "SELECT 1 FROM work_items WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                (item_id, lease_token),
+            ).fetchone()
+            if held is None:
+                raise LeaseLostError(f"Lease on work item {item_id} was lost")
+            record = self.invoice_store.insert_result(conn, result)
+            conn.execute(
+                "UPDATE work_items SET status = 'done', invoice_id = ?, error = ?, lease_owner = NULL, "
+                "lease_token = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (record["invoice_id"], result.get("error"), self._now(), item_id),
+            )
+        if record["duplicates"]:
+            logger.warning(f"⚠️ Invoice {record['invoice_id']} looks like a duplicate of {record['duplicates']}")
+        return record
+
+    def fail(self, item_id: int, lease_token: str, error: str) -> str:
+        """Give up a lease after an error: requeue with backoff, or fail after max attempts"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM work_items WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                (item_id, lease_token),
+            ).fetchone()
+            if row is None:
+                return "lost"
+            status = "failed" if row["attempts"] >= row["max_attempts"] else "queued"
+            conn.execute(
+                "UPDATE work_items SET status = ?, error = ?, available_at = ?, lease_owner = NULL, "
+                "lease_token = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (status, error, time.time() + RETRY_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1),
+                 self._now(), item_id),
+            )
+        return status
+
+    def release(self, item_id: int, lease_token: str) -> bool:
+        """Hand an item back untouched (e.g. on shutdown) without counting an attempt"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, "
+                "lease_token = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                (self._now(), item_id, lease_token),
+            )
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, int]:
+        """Item counts by status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM work_items GROUP BY status").fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class _LeaseKeeper:
+    """Renews a lease in the background while an item is processed"""
+
+    def __init__(self, queue: WorkQueue, item: Dict[str, Any], lease_seconds: float):
+        self.queue = queue
+        self.item = item
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.renew(self.item["id"], self.item["lease_token"], self.lease_seconds):
+                    self.lost = True
+                    logger.warning(f"⚠️ Lost lease on work item {self.item['id']}")
+                    return
+            except sqlite3.Error as e:
+                # A busy database is retried on the next tick
+                logger.warning(f"⚠️ Lease renewal failed for work item {self.item['id']}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class QueueWorker:
+    """Claims and processes work items until stopped (or until the queue is empty)"""
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        orchestrator=None,
+        threads: int = 1,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        poll_seconds: float = 2.0,
+        worker_id: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.orchestrator = orchestrator
+        self.threads = threads
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stats = {"completed": 0, "failed": 0, "lost": 0}
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def process_item(self, item: Dict[str, Any]):
+        logger.info(f"📥 [{self.worker_id}] Work item {item['id']}: {os.path.basename(item['path'])}")
+        with _LeaseKeeper(self.queue, item, self.lease_seconds) as keeper:
+            try:
+                result = self.orchestrator.process_invoice(item["path"], item["vendor_name"] or "Unknown")
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+
+        if keeper.lost:
+            self._count("lost")
+            return
+        if result.get("status") != "success":
+            status = self.queue.fail(item["id"], item["lease_token"], result.get("error") or "processing failed")
+            self._count("lost" if status == "lost" else "failed")
+            logger.warning(f"⚠️ Work item {item['id']} failed ({status}): {result.get('error')}")
+            return
+
+        result.update({"invoice_path": item["path"], "content_hash": item["content_hash"]})
+        try:
+            record = self.queue.complete(item["id"], item["lease_token"], result)
+        except LeaseLostError as e:
+            self._count("lost")
+            logger.warning(f"⚠️ {e}; result discarded")
+            return
+        self._count("completed")
+        logger.info(f"✅ Work item {item['id']} recorded as invoice {record['invoice_id']}")
+
+    def _loop(self, drain: bool):
+        while not self._stop.is_set():
+            item = self.queue.claim(self.worker_id, self.lease_seconds)
+            if item is not None and self._stop.is_set():
+                # Stopped between claim and start: hand it back for another worker now
+                self.queue.release(item["id"], item["lease_token"])
+                return
+            if item is None:
+                if drain:
+                    counts = self.queue.stats()
+                    # Items waiting out a retry backoff or held by other workers may still come back
+                    if counts["queued"] == 0 and counts["leased"] == 0:
+                        return
+                self._stop.wait(self.poll_seconds)
+                continue
+            self.process_item(item)
+
+    def run(self, drain: bool = False) -> Dict[str, Any]:
+        """Process items on `threads` threads; with drain, return once nothing is left"""
+        if self.orchestrator is None:
+            from agents.orchestrator import InvoiceOrchestrator
+            self.orchestrator = InvoiceOrchestrator()
+        workers = [threading.Thread(target=self._loop, args=(drain,), daemon=True) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        try:
+            for thread in workers:
+                while thread.is_alive():
+                    thread.join(timeout=1.0)
+        except KeyboardInterrupt:
+            logger.info("🛑 Stopping after in-flight items finish")
+            self.stop()
+            for thread in workers:
+                thread.join()
+        logger.info(f"📊 Worker {self.worker_id}: {self.stats}")
+        return dict(self.stats)
+
+    def stop(self):
+        self._stop.set()
+
+
+def enqueue_directory(queue: WorkQueue, input_dir: str) -> List[int]:
+    """Queue every supported file under a directory (already queued content is skipped)"""
+    queued = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in sorted(files):
+            if not name.startswith('.') and name.lower().endswith(SUPPORTED_EXTENSIONS):
+                item_id = queue.enqueue(os.path.abspath(os.path.join(root, name)))
+                if item_id is not None:
+                    queued.append(item_id)
+    logger.info(f"✅ Queued {len(queued)} invoice(s) from {input_dir}")
+    return queued
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from utils.invoice_store import InvoiceStore, DEFAULT_INVOICE_DB_PATH
+    load_dotenv()
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Shared invoice work queue")
+    parser.add_argument("--db", default=DEFAULT_INVOICE_DB_PATH, help="Invoice store on a shared volume")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = commands.add_parser("enqueue", help="Queue every invoice under a directory")
+    enqueue_parser.add_argument("input_dir")
+    work_parser = commands.add_parser("work", help="Claim and process queued invoices")
+    work_parser.add_argument("--threads", type=int, default=int(os.getenv("WORK_QUEUE_THREADS", "4")))
+    work_parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="Lease length in seconds")
+    work_parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    commands.add_parser("status", help="Show item counts by status")
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(InvoiceStore(args.db, journal_mode="DELETE"))
+    if args.command == "enqueue":
+        enqueue_directory(work_queue, args.input_dir)
+    elif args.command == "work":
+        QueueWorker(work_queue, threads=args.threads, lease_seconds=args.lease).run(drain=args.drain)
+    print(work_queue.stats())